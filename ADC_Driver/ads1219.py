@@ -1,7 +1,6 @@
 import struct
 import time
-import busio
-import board
+from i2c_bus import get_bus
 
 _CHANNEL_MASK = 0xE0
 _GAIN_MASK = 0x10
@@ -21,6 +20,16 @@ _DRDY_MASK = 0x80
 _DRDY_NO_NEW_RESULT = 0x0     # No new conversion result available
 _DRDY_NEW_RESULT_READY = 0x80 # New conversion result ready
 
+# Conversions are ready no sooner than one conversion period after START/SYNC, plus this
+# fraction of a period to allow for the tolerance of the internal oscillator
+_READY_MARGIN = 0.1
+# Conversion periods to poll DRDY for before giving up on a conversion
+_READY_TIMEOUT_PERIODS = 4
+
+# Shadow copy of each chip's config register by (bus, address), shared by the two channels on the
+# chip. A chip with no entry has no channel constructed yet.
+_shadow_config = {}
+
 
 class ADS1219: 
 
@@ -51,6 +60,18 @@ class ADS1219:
     VREF_EXTERNAL_MV = 5000
     POSITIVE_CODE_RANGE = 0x7FFFFF # 23 bits of positive range 
 
+    # Address and mux setting of channels 1-8
+    CHANNELS = {
+        1: (0x40, CHANNEL_AIN0_AIN1), 2: (0x40, CHANNEL_AIN2_AIN3),
+        3: (0x41, CHANNEL_AIN0_AIN1), 4: (0x41, CHANNEL_AIN2_AIN3),
+        5: (0x42, CHANNEL_AIN0_AIN1), 6: (0x42, CHANNEL_AIN2_AIN3),
+        7: (0x43, CHANNEL_AIN0_AIN1), 8: (0x43, CHANNEL_AIN2_AIN3)
+    }
+    GAINS = {1: GAIN_1X, 4: GAIN_4X}
+    DATA_RATES = {20: DR_20_SPS, 90: DR_90_SPS, 330: DR_330_SPS, 1000: DR_1000_SPS}
+    # Conversion period in seconds of each data rate setting
+    PERIODS = {DR_20_SPS: 1 / 20, DR_90_SPS: 1 / 90, DR_330_SPS: 1 / 330, DR_1000_SPS: 1 / 1000}
+
     '''
     ADS1219 is the device driver for the embedded ADC's on SARP's Fill Controller.
     There are four ADC's with two differential channels each for a total of 8 
@@ -64,22 +85,44 @@ class ADS1219:
         input (int): ADC Channels 1-8
         gain (int) : Gain can be 1 or 4
         data_rate  : How many samples per second are performed.
+        i2c        : Bus to use, by default the board's shared I2C bus
+
+    Note:
+        The driver keeps a shadow copy of the config register, so
+        settings cost a single write, or none if nothing changes, and
+        samples need no config reads. transactions counts the I2C
+        transactions made by a channel.
+
+        In continuous mode (start_continuous) each read waits for DRDY
+        instead of starting a conversion, so a channel is read at the
+        data rate. Reading the other channel of a chip switches its mux
+        and restarts the conversion.
 
     ''' 
-    def __init__(self, input=1, gain=1, data_rate=20):
+    def __init__(self, input=1, gain=1, data_rate=20, i2c=None):
         self._ID = input
-        self._i2c = busio.I2C(board.SCL, board.SDA)
-        self._address = 0x40
+        self._i2c = get_bus(i2c)
+        self._address, self._mux = ADS1219.CHANNELS.get(input, (0x40, ADS1219.CHANNEL_AIN0_AIN1))
+        # the chip's key in _shadow_config
+        self._chip = (self._i2c, self._address)
         self._gain = 1
-        if self.set_channel(input) is False:
+        # when the last result was found ready
+        self._last_ready = None
+        # when the conversion started by start_conversion is due
+        self._ready_at = None
+        # I2C transactions made by this channel
+        self.transactions = 0
+        if input not in ADS1219.CHANNELS:
             print('Channel {} must be 1-8'.format(input))
-        if self.set_gain(gain) is False:
+        if gain not in ADS1219.GAINS:
             print('A gain of {} must be 1 or 4'.format(gain))
-        if self.set_data_rate(data_rate) is False:
+        if data_rate not in ADS1219.DATA_RATES:
             print('Data rate {} must be 20, 90, 330, or 1000'.format(data_rate))
-        self.set_vref(ADS1219.VREF_INTERNAL)
-        self.set_conversion_mode(ADS1219.CM_SINGLE)
-        self.reset()
+        # reset before configuring the first channel of a chip, since it restores the default
+        # config, but not the second, which would lose the first channel's settings
+        if self._chip not in _shadow_config:
+            self.reset()
+        self.configure(input, gain, data_rate, ADS1219.VREF_INTERNAL, ADS1219.CM_SINGLE)
 
     ''' @ Broadcasts I2C scan for all ADS1219's alive.
       ' @ Note: Useful for debugging
@@ -93,24 +136,75 @@ class ADS1219:
       ' @ Return: Unconverted Data
     ''' 
     def read_raw_data(self):
-        if ((self.read_config() & _CM_MASK) == 0x0):
+        # the other channel of the chip must not switch the mux until we have our result
+        with self._i2c.device_lock(self._address):
+            config = self._config()
+            if ((config & _CM_MASK) == ADS1219.CM_SINGLE or (config & _CHANNEL_MASK) != self._mux
+                    or self._last_ready is None):
+                self._select()
+                self.start_sync()
+                self.wait_ready(time.monotonic() + (1 + _READY_MARGIN) * self._period())
+            else:
+                # the next result of a continuous conversion is due a period after the last
+                self.wait_ready(self._last_ready + self._period())
+            return self.read_data_irq()
+
+    ''' @ Starts a single-shot conversion of this channel and returns
+      '   without waiting for it, so other chips can be started or read
+      '   while this one converts. The chip is held for this channel
+      '   until read_conversion.
+      ' @ Return: The time.monotonic time the result is due
+    ''' 
+    def start_conversion(self):
+        lock = self._i2c.device_lock(self._address)
+        lock.acquire()
+        try:
+            self._write_config(_CHANNEL_MASK | _CM_MASK, self._mux | ADS1219.CM_SINGLE)
             self.start_sync()
-            # loop until conversion is completed
-            while((self.read_status() & _DRDY_MASK) == _DRDY_NO_NEW_RESULT):
-                time.sleep(.1)        
-            
-        rreg = struct.pack('B', _COMMAND_RDATA) 
-        self._i2c.writeto(self._address, rreg)
-        data = bytearray(3)
-        self._i2c.readfrom_into(self._address, data)
-        return struct.unpack('>I', b'\x00' + data)[0]
+        except:
+            lock.release()
+            raise
+        self._ready_at = time.monotonic() + (1 + _READY_MARGIN) * self._period()
+        return self._ready_at
+
+    ''' @ Waits for the conversion started by start_conversion.
+      ' @ Return: Unconverted Data
+    ''' 
+    def read_conversion(self):
+        try:
+            self.wait_ready(self._ready_at)
+            return self.read_data_irq()
+        finally:
+            self._i2c.device_lock(self._address).release()
+
+    ''' @ Sleeps until a conversion is due at time ready_at on the
+      '   time.monotonic clock, then polls DRDY until it is done.
+      ' @ Raises TimeoutError if no conversion is ready after
+      '   _READY_TIMEOUT_PERIODS conversion periods.
+    ''' 
+    def wait_ready(self, ready_at):
+        remaining = ready_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        timeout = time.monotonic() + _READY_TIMEOUT_PERIODS * self._period()
+        while((self.read_status() & _DRDY_MASK) == _DRDY_NO_NEW_RESULT):
+            if time.monotonic() > timeout:
+                raise TimeoutError('ADS1219 at 0x{:x} has no conversion ready'.format(self._address))
+        self._last_ready = time.monotonic()
 
     ''' @ Converts raw data from ADC to actual voltage. It divides out 
       '   the gain.
       ' @ Return: Voltage in milli-volts
     ''' 
     def read_voltage(self):
-        result = 16777057 - self.read_raw_data()
+        return self.to_millivolts(self.read_raw_data())
+
+    ''' @ Converts raw data, from read_raw_data or read_conversion, to
+      '   voltage.
+      ' @ Return: Voltage in milli-volts
+    ''' 
+    def to_millivolts(self, raw):
+        result = 16777057 - raw
         return ( result * ADS1219.VREF_INTERNAL_MV  / 
                  ADS1219.POSITIVE_CODE_RANGE) #/ self._gain
 
@@ -126,109 +220,136 @@ class ADS1219:
     def get_ID(self):
         return self._ID
 
-    def _read_modify_write_config(self, mask, value):
-        as_is = self.read_config()
+    def get_address(self):
+        return self._address
+
+    def get_data_rate(self):
+        return round(1 / self._period())
+
+    def _write(self, data):
+        self.transactions += 1
+        self._i2c.writeto(self._address, data)
+
+    def _read_into(self, buffer):
+        self.transactions += 1
+        self._i2c.readfrom_into(self._address, buffer)
+
+    def _config(self):
+        # the shadow copy of the config register, read from the chip the first time
+        if self._chip not in _shadow_config:
+            self.read_config()
+        return _shadow_config[self._chip]
+
+    def _period(self):
+        return ADS1219.PERIODS[self._config() & _DR_MASK]
+
+    def _write_config(self, mask, value):
+        as_is = self._config()
         to_be = (as_is & ~mask) | value 
+        if to_be == as_is:
+            return
         wreg = struct.pack('BB', _COMMAND_WREG_CONFIG, to_be)
-        self._i2c.writeto(self._address, wreg)
+        self._write(wreg)
+        _shadow_config[self._chip] = to_be
         
     def read_config(self):
         rreg = struct.pack('B', _COMMAND_RREG_CONFIG) 
-        self._i2c.writeto(self._address, rreg)
+        self._write(rreg)
         config = bytearray(1)
-        self._i2c.readfrom_into(self._address, config)
+        self._read_into(config)
+        _shadow_config[self._chip] = config[0]
         return config[0]
     
     def read_status(self):
         rreg = struct.pack('B', _COMMAND_RREG_STATUS) 
-        self._i2c.writeto(self._address, rreg)
+        self._write(rreg)
         status = bytearray(1)
-        self._i2c.readfrom_into(self._address, status)
+        self._read_into(status)
         return status[0]
 
+    ''' @ Sets any of the channel, gain, data rate, reference and
+      '   conversion mode in one config write, which is skipped if none
+      '   of them change. Invalid values are left as they are.
+      ' @ Return: False if any value was invalid
+    ''' 
+    def configure(self, input=None, gain=None, data_rate=None, vref=None, cm=None):
+        mask = 0
+        value = 0
+        valid = True
+        if input is not None:
+            if input in ADS1219.CHANNELS:
+                self._address, self._mux = ADS1219.CHANNELS[input]
+                mask |= _CHANNEL_MASK
+                value |= self._mux
+            else:
+                valid = False
+        if gain is not None:
+            if gain in ADS1219.GAINS:
+                self._gain = gain
+                mask |= _GAIN_MASK
+                value |= ADS1219.GAINS[gain]
+            else:
+                valid = False
+        if data_rate is not None:
+            if data_rate in ADS1219.DATA_RATES:
+                mask |= _DR_MASK
+                value |= ADS1219.DATA_RATES[data_rate]
+            else:
+                valid = False
+        if vref is not None:
+            mask |= _VREF_MASK
+            value |= vref & _VREF_MASK
+        if cm is not None:
+            mask |= _CM_MASK
+            value |= cm & _CM_MASK
+        self._write_config(mask, value)
+        return valid
+
     def set_channel(self, input):
-        if (input==1):
-            self._address = 0x40
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN0_AIN1)
-            return True
-        elif(input==2):
-            self._address = 0x40
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN2_AIN3)
-            return True
-        elif(input==3):
-            self._address = 0x41
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN0_AIN1)
-            return True
-        elif(input==4):
-            self._address = 0x41
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN2_AIN3)
-            return True
-        elif(input==5):
-            self._address = 0x42
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN0_AIN1)
-            return True
-        elif(input==6):
-            self._address = 0x42
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN2_AIN3)
-            return True
-        elif(input==7):
-            self._address = 0x43
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN0_AIN1)  
-            return True        
-        elif(input==8):
-            self._address = 0x43
-            self._read_modify_write_config(_CHANNEL_MASK, ADS1219.CHANNEL_AIN2_AIN3)
-            return True
-        else :
-            return False
+        return self.configure(input=input)
+
+    def _select(self):
+        # switch the chip's mux to this channel if the other channel has it
+        self._write_config(_CHANNEL_MASK, self._mux)
         
     def set_gain(self, gain):
-        if gain is 1:
-            self._gain = 1
-            self._read_modify_write_config(_GAIN_MASK, ADS1219.GAIN_1X)
-        elif gain is 4:
-            self._gain = 4
-            self._read_modify_write_config(_GAIN_MASK, ADS1219.GAIN_4X)
-        else:
-            return False
+        return self.configure(gain=gain)
         
     def set_data_rate(self, data_rate):
-        if data_rate is 20:
-            self._read_modify_write_config(_DR_MASK, ADS1219.DR_20_SPS)
-            return True
-        elif data_rate is 90:
-            self._read_modify_write_config(_DR_MASK, ADS1219.DR_90_SPS)
-            return True
-        elif data_rate is 330:
-            self._read_modify_write_config(_DR_MASK, ADS1219.DR_330_SPS)
-            return True
-        elif data_rate is 1000:
-            self._read_modify_write_config(_DR_MASK, ADS1219.DR_1000_SPS)
-            return True
-        else :
-            return False
+        return self.configure(data_rate=data_rate)
 
     def set_conversion_mode(self, cm):
-        self._read_modify_write_config(_CM_MASK, cm)
+        self.configure(cm=cm)
+
+    ''' @ Puts the chip in continuous conversion mode and starts
+      '   converting this channel.
+    ''' 
+    def start_continuous(self):
+        with self._i2c.device_lock(self._address):
+            self._write_config(_CHANNEL_MASK | _CM_MASK, self._mux | ADS1219.CM_CONTINUOUS)
+            self.start_sync()
+            self._last_ready = time.monotonic()
         
     def set_vref(self, vref):
-        self._read_modify_write_config(_VREF_MASK, vref)
+        self.configure(vref=vref)
 
     def read_data_irq(self):
         rreg = struct.pack('B', _COMMAND_RDATA) 
-        self._i2c.writeto(self._address, rreg)
+        self._write(rreg)
         data = bytearray(3)
-        self._i2c.readfrom_into(self._address, data)
+        self._read_into(data)
         return struct.unpack('>I', b'\x00' + data)[0]
         
     def reset(self):
         data = struct.pack('B', _COMMAND_RESET)
-        self._i2c.writeto(self._address, data)  
+        self._write(data)
+        # the config register is all defaults after a reset
+        _shadow_config[self._chip] = 0x0
 
     def start_sync(self):
         data = struct.pack('B', _COMMAND_START_SYNC)
-        self._i2c.writeto(self._address, data)        
+        self._write(data)
 
     def powerdown(self):
         data = struct.pack('B', _COMMAND_POWERDOWN)
-        self._i2c.writeto(self._address, data)
\ No newline at end of file
+        self._write(data)
\ No newline at end of file
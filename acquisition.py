@@ -0,0 +1,155 @@
+import threading
+import time
+import logging
+import numpy as np
+logging.basicConfig(level=logging.DEBUG)
+
+# seconds between overrun and error warnings from an acquisition thread
+WARNING_PERIOD = 1
+
+
+class SampleRing:
+    """
+    A preallocated ring buffer of timestamped samples, each a row of one value per channel.
+    Timestamps are on the time.monotonic clock. Written by one thread and read by any; readers get
+    copies, so they never see a row being overwritten.
+    """
+    def __init__(self, length, channels):
+        self.length = length
+        self.times = np.zeros(length)
+        self.values = np.zeros((length, channels))
+        # number of samples ever written
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, t, values):
+        with self._lock:
+            i = self.count % self.length
+            self.times[i] = t
+            self.values[i] = values
+            self.count += 1
+
+    def latest(self):
+        """
+        (time, values) of the newest sample, or None if there are none yet.
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            i = (self.count - 1) % self.length
+            return self.times[i], self.values[i].copy()
+
+    def last(self, n):
+        """
+        (times, values) of the newest n samples, oldest first.
+        """
+        with self._lock:
+            n = min(n, self.count, self.length)
+            idx = np.arange(self.count - n, self.count) % self.length
+            return self.times[idx], self.values[idx]
+
+    def since(self, t):
+        """
+        (times, values) of the samples taken after time t, oldest first.
+        """
+        times, values = self.last(self.length)
+        start = np.searchsorted(times, t, side="right")
+        return times[start:], values[start:]
+
+
+class Acquisition:
+    """
+    Calls read_fn, which returns one value per channel, at rate_hz in a dedicated thread and keeps
+    the samples in a SampleRing, so the event loop never waits on the ADCs. Deadlines are absolute,
+    and missed ones are skipped rather than caught up.
+
+    The ring keeps the raw samples. If filters, a FilterBank, is given each sample is also passed
+    through it, and (time, latest filtered values) kept in filtered. on_sample(t, values), if given,
+    is called from the acquisition thread with each sample, filtered if there are filters.
+
+    read_fn may return NaN for a channel it did not convert this time, such as one sampled at a
+    lower rate by a ConversionPlan. The ring keeps the NaN, so nothing reads a repeat as a new
+    sample, while latest() and on_sample hold the channel's last conversion, taken at
+    held_times[channel]. held_times is replaced rather than updated with each sample, so on_sample
+    can hand it on with the values.
+    """
+    def __init__(self, read_fn, channels, rate_hz, length, on_sample=None, name="acquisition", filters=None):
+        self.read_fn = read_fn
+        self.period = 1 / rate_hz
+        self.ring = SampleRing(length, channels)
+        self.on_sample = on_sample
+        self.name = name
+        self.filters = filters
+        self.filtered = None
+        # (time, last conversion of each channel), and the time of each channel's conversion
+        self.held = None
+        self.held_times = np.full(channels, np.nan)
+        self._held_values = np.full(channels, np.nan)
+        self.overruns = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_warning = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self):
+        """
+        (time, values) of the latest sample, filtered if there are filters, or None if there is none
+        yet.
+        """
+        if self.filters is not None:
+            return self.filtered
+        return self.held
+
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                raw = np.asarray(self.read_fn(), dtype=float)
+                t = time.monotonic()
+                self.ring.append(t, raw)
+                converted = ~np.isnan(raw)
+                values = self._held_values.copy()
+                values[converted] = raw[converted]
+                times = self.held_times.copy()
+                times[converted] = t
+                # published whole, so readers in other threads never see a half updated sample
+                self._held_values = values
+                self.held_times = times
+                self.held = (t, values)
+                if self.filters is not None:
+                    self.filters.process_sample(t, raw)
+                    values = self.filters.latest
+                    self.filtered = (t, values)
+                if self.on_sample is not None:
+                    self.on_sample(t, values)
+            except Exception as e:
+                self.errors += 1
+                self._warn("Acquisition '{}' read failed ({} errors): {}".format(self.name, self.errors, e))
+            deadline += self.period
+            now = time.monotonic()
+            if now > deadline:
+                self.overruns += 1
+                deadline += (int((now - deadline) / self.period) + 1) * self.period
+                self._warn("Acquisition '{}' overran its {:.1f} ms period ({} overruns)".format(
+                    self.name, self.period * 1000, self.overruns))
+            self._stop.wait(deadline - now)
+
+    def _warn(self, message):
+        now = time.monotonic()
+        if self._last_warning is None or now - self._last_warning > WARNING_PERIOD:
+            self._last_warning = now
+            logging.warning(message)
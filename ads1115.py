@@ -1,8 +1,27 @@
 import Adafruit_ADS1x15
-import busio
-import board
+from i2c_bus import get_bus
 from adafruit_ads1x15.analog_in import AnalogIn
 import adafruit_ads1x15.ads1115 as ADS
+from adafruit_ads1x15.ads1x15 import Mode
+import time
+
+
+class _ADS1115(ADS.ADS1115):
+    # The library polls the conversion ready bit back to back from the start of a single-shot
+    # conversion, which keeps the shared bus busy for the whole conversion. Sleep through the
+    # conversion period first, as the ADS1219 driver does.
+    _due = 0.0
+
+    def _write_config(self, pin_config=None):
+        super()._write_config(pin_config)
+        self._due = time.monotonic() + 1 / self.data_rate
+
+    def _conversion_complete(self):
+        remaining = self._due - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return super()._conversion_complete()
+
 
 class ADS1115:
     # Pressure transducer specs
@@ -23,30 +42,61 @@ class ADS1115:
     min_v = 0.5
     max_v = 4.5
 
-    def __init__(self, gain, addr):
+    # Samples per second the ADS1115 can convert at; 128 is its default
+    data_rates = (8, 16, 32, 64, 128, 250, 475, 860)
+
+    # In continuous mode the chip converts its last channel over and over, so reading that channel
+    # again costs a single I2C read of the last result. Changing channel waits out two conversions.
+    def __init__(self, gain, addr, i2c=None, data_rate=None, continuous=False):
         #self.adc = Adafruit_ADS1x15.ADS1115(address=addr, i2c=busio.I2C(board.SCL, board.SDA))
         # self.adc = i2c.readfrom_into(addr, result)
-        i2c = busio.I2C(board.SCL, board.SDA)
-        result = bytearray(1)
-        self.adc = ADS.ADS1115(i2c, address=addr)
-        print("info from addresss")
-        print(int.from_bytes(result, "big"))
+        # every ADS1115 shares the one bus
+        i2c = get_bus(i2c)
+        self._i2c = i2c
+        self.addr = addr
+        if data_rate is not None and data_rate not in ADS1115.data_rates:
+            raise ValueError(f"Data rate {data_rate} must be one of {ADS1115.data_rates}")
+        self.adc = _ADS1115(i2c, gain=gain, address=addr, data_rate=data_rate,
+                            mode=Mode.CONTINUOUS if continuous else Mode.SINGLE)
+        # channel objects are built once rather than on every read
+        self.channels = [AnalogIn(self.adc, channel) for channel in (ADS.P0, ADS.P1, ADS.P2, ADS.P3)]
+        # channel being converted by start_conversion
+        self._converting = None
         self.gain = gain
 
-    # Returns voltage
+    # Returns voltage, from a single conversion
     def read_voltage(self, channel):
-        print("reading from adc")
-        chan = AnalogIn(self.adc, channel)
-        print(chan.value, chan.voltage)
-        bit_value = chan.value
-        #bit_value = self.adc.read_adc(channel, gain=self.gain)
-        
-        # OLD VOLTAGE CODE
-        #voltage = ADS1115.gain_ranges[self.gain] / (2 ** ADS1115.bits - 1) * bit_value
-
-        # NEW VOLTAGE CODE
-        voltage = chan.voltage
-        return voltage
+        chan = self.channels[channel]
+        with self._i2c.device_lock(self.addr):
+            return chan.convert_to_voltage(chan.value)
+
+    # Starts a single-shot conversion of a channel and returns without waiting for it, so other
+    # chips can be started or read while this one converts. The chip is held for this conversion
+    # until read_conversion. Returns the time.monotonic time the result is due.
+    def start_conversion(self, channel):
+        lock = self._i2c.device_lock(self.addr)
+        lock.acquire()
+        try:
+            self.adc._write_config(self.channels[channel]._pin_setting + 0x04)
+        except:
+            lock.release()
+            raise
+        self._converting = channel
+        return self.adc._due
+
+    # Waits for the conversion started by start_conversion and returns its voltage
+    def read_conversion(self):
+        try:
+            while not self.adc._conversion_complete():
+                pass
+            chan = self.channels[self._converting]
+            return chan.convert_to_voltage(self.adc._conversion_value(self.adc.get_last_result(False)))
+        finally:
+            self._i2c.device_lock(self.addr).release()
+
+    # Returns the voltages of all four channels
+    def read_voltages(self):
+        return [chan.convert_to_voltage(chan.value) for chan in self.channels]
 
     # Returns pressure
     # If channel_pos or channel_neg is None, uses non-differential voltage
@@ -0,0 +1,87 @@
+"""
+Batched telemetry: many timestamped samples of a group of channels in one datagram.
+"""
+import struct
+import numpy as np
+from codec import compiled, SchemaMismatch
+
+# Largest datagram sent, and the IP and UDP headers within it
+DEFAULT_MTU = 1500
+UDP_IP_OVERHEAD = 28
+# schema id and number of samples, ahead of the samples
+BATCH_HEADER = struct.Struct("!IH")
+# name of the timestamp of each sample: the sender's time.monotonic_ns when it was taken
+TIME_CHANNEL = "t_ns"
+
+
+class BatchCodec:
+    """
+    Packs samples of channels as a schema id, a sample count, and then per sample its timestamp
+    (u64 ns) followed by a float per channel. Encoding writes the samples into the buffer through
+    a NumPy view of it, and the ground side decodes a whole batch with one np.frombuffer, or
+    sample by sample with struct.iter_unpack. As in the acquisition ring, a value is NaN where its
+    channel was not converted in that sample.
+    """
+    def __init__(self, msg_schema, schema_id, header_size=0, mtu=DEFAULT_MTU):
+        """
+        msg_schema is TIME_CHANNEL then the channels, each "f". header_size bytes ahead of the batch
+        in each datagram, such as the network header, count against the mtu.
+        """
+        self.msg_schema = msg_schema
+        self.schema_id = schema_id
+        self.channels = [name for name in msg_schema if name != TIME_CHANNEL]
+        self.sample = compiled("!Q" + "f" * len(self.channels))
+        self.dtype = np.dtype([(TIME_CHANNEL, ">u8")] + [(name, ">f4") for name in self.channels])
+        self.max_samples = (mtu - UDP_IP_OVERHEAD - header_size - BATCH_HEADER.size) // self.sample.size
+        if self.max_samples < 1:
+            raise ValueError(f"A {mtu} byte MTU cannot hold one sample of {len(self.channels)} channels")
+
+    def size(self, count):
+        return BATCH_HEADER.size + count * self.sample.size
+
+    def encode_into(self, times_ns, values, buffer, offset=0):
+        """
+        Pack up to max_samples samples, times_ns one per sample and values a row per sample, into
+        buffer at offset.
+        Returns: the number of bytes packed
+        """
+        count = len(times_ns)
+        if count > self.max_samples:
+            raise ValueError(f"{count} samples do not fit in one batch of {self.max_samples}")
+        BATCH_HEADER.pack_into(buffer, offset, self.schema_id, count)
+        samples = np.frombuffer(buffer, self.dtype, count, offset + BATCH_HEADER.size)
+        samples[TIME_CHANNEL] = times_ns
+        values = np.asarray(values)
+        for idx, name in enumerate(self.channels):
+            samples[name] = values[:, idx]
+        return self.size(count)
+
+    def encode(self, times_ns, values):
+        buffer = bytearray(self.size(len(times_ns)))
+        self.encode_into(times_ns, values, buffer)
+        return bytes(buffer)
+
+    def _count(self, packet, offset):
+        schema_id, count = BATCH_HEADER.unpack_from(packet, offset)
+        if schema_id != self.schema_id:
+            raise SchemaMismatch(f"Packet schema {schema_id:08x} is not {self.schema_id:08x}")
+        return count
+
+    def decode(self, packet, offset=0):
+        """
+        Returns: (times_ns, values), int64 nanoseconds and a float row per sample
+        """
+        count = self._count(packet, offset)
+        samples = np.frombuffer(packet, self.dtype, count, offset + BATCH_HEADER.size)
+        values = np.empty((count, len(self.channels)), dtype=np.float32)
+        for idx, name in enumerate(self.channels):
+            values[:, idx] = samples[name]
+        return samples[TIME_CHANNEL].astype(np.int64), values
+
+    def iter_decode(self, packet, offset=0):
+        """
+        Returns: an iterator of (t_ns, value, value, ...) tuples, one per sample
+        """
+        count = self._count(packet, offset)
+        start = offset + BATCH_HEADER.size
+        return self.sample.iter_unpack(memoryview(packet)[start:start + count * self.sample.size])
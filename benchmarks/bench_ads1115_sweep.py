@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+#-----------------------------------------------------------------
+# Measures the cost of reading the 4 channels of an ADS1115 against a simulated device, the way
+# read_voltage used to (a new AnalogIn and two conversions per sample) and with cached channels
+# at the default and highest data rates, and how fast one channel is read in continuous mode.
+#
+# Usage: python benchmarks/bench_ads1115_sweep.py [--frequency HZ] [--count N]
+#-----------------------------------------------------------------
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+import argparse
+import statistics
+import time
+from adafruit_ads1x15.analog_in import AnalogIn
+from ads1115 import ADS1115
+from i2c_bus import get_bus
+from fake_i2c import FakeI2C, FakeADS1115
+
+CODES = {4: 8000, 5: 16000, 6: 24000, 7: 32000}
+
+
+def legacy_read_voltage(adc, channel):
+    chan = AnalogIn(adc.adc, channel)
+    bit_value = chan.value
+    return chan.voltage
+
+
+def make_adc(frequency, **kwargs):
+    fake = FakeI2C(frequency=frequency)
+    fake.add(0x48, FakeADS1115(dict(CODES)))
+    return get_bus(fake), ADS1115(gain=1, addr=0x48, i2c=fake, **kwargs)
+
+
+def time_sweeps(bus, sweep, count):
+    sweeps = []
+    transactions = bus.transactions()
+    for i in range(count):
+        start = time.perf_counter()
+        sweep()
+        sweeps.append(time.perf_counter() - start)
+    return sweeps, (bus.transactions() - transactions) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADS1115 4 channel sweep cost on a simulated I2C bus.")
+    parser.add_argument("--frequency", type=int, default=400000)
+    parser.add_argument("--count", type=int, default=100)
+    args = parser.parse_args()
+    print("bus: {} kHz".format(args.frequency // 1000))
+    for name, data_rate, read in (("legacy", 128, "legacy"), ("cached", 128, "cached"), ("cached", 860, "cached")):
+        bus, adc = make_adc(args.frequency, data_rate=data_rate)
+        if read == "legacy":
+            sweep = lambda: [legacy_read_voltage(adc, channel) for channel in range(4)]
+        else:
+            sweep = adc.read_voltages
+        sweeps, transactions = time_sweeps(bus, sweep, args.count)
+        sweeps_ms = sorted(s * 1000 for s in sweeps)
+        print("{:>10} {:>3} SPS: sweep median {:.2f} ms, max {:.2f} ms, {:.1f} I2C transactions".format(
+            name, data_rate, statistics.median(sweeps_ms), sweeps_ms[-1], transactions))
+    bus, adc = make_adc(args.frequency, data_rate=860, continuous=True)
+    adc.read_voltage(0)
+    start = time.perf_counter()
+    for i in range(args.count * 4):
+        adc.read_voltage(0)
+    # most of these reads return the same conversion, which only changes 860 times a second
+    print("continuous 860 SPS: one channel {:.0f} reads/s".format(args.count * 4 / (time.perf_counter() - start)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+
+#-----------------------------------------------------------------
+# Measures how long a sweep of the 8 ADS1219 channels takes on a simulated I2C bus, and how fast
+# a single channel can be read, with single-shot conversions polled every 100 ms as the driver
+# used to, single-shot conversions waited on by DRDY, and continuous conversion, along with the I2C
+# transactions each sweep takes.
+#
+# Usage: python benchmarks/bench_ads1219_sweep.py [--data-rate SPS] [--frequency HZ] [--count N]
+#-----------------------------------------------------------------
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+import argparse
+import statistics
+import time
+from ADC_Driver import ADS1219
+from fake_i2c import FakeI2C, FakeADS1219
+
+SLEEP_POLL_PERIOD = .1
+
+
+class SleepPollADS1219(ADS1219):
+    """
+    Polls DRDY with a 100 ms sleep, as read_raw_data used to.
+    """
+    def wait_ready(self, ready_at):
+        while (self.read_status() & 0x80) == 0:
+            time.sleep(SLEEP_POLL_PERIOD)
+
+
+def make_adcs(cls, data_rate, frequency):
+    bus = FakeI2C(frequency=frequency)
+    for address in range(0x40, 0x44):
+        bus.add(address, FakeADS1219())
+    return bus, [cls(i, data_rate=data_rate, i2c=bus) for i in range(1, 9)]
+
+
+def run(mode, data_rate, frequency, count):
+    bus, adcs = make_adcs(SleepPollADS1219 if mode == "sleep" else ADS1219, data_rate, frequency)
+    if mode == "continuous":
+        for adc in adcs:
+            adc.start_continuous()
+    sweeps = []
+    transactions = sum(adc.transactions for adc in adcs)
+    for i in range(count):
+        start = time.perf_counter()
+        for adc in adcs:
+            adc.read_raw_data()
+        sweeps.append(time.perf_counter() - start)
+    transactions = (sum(adc.transactions for adc in adcs) - transactions) / count
+    start = time.perf_counter()
+    for i in range(count * 8):
+        adcs[0].read_raw_data()
+    channel_rate = count * 8 / (time.perf_counter() - start)
+    return sweeps, transactions, channel_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADS1219 8 channel sweep time on a simulated I2C bus.")
+    parser.add_argument("--data-rate", type=int, choices=[20, 90, 330, 1000], default=1000)
+    parser.add_argument("--frequency", type=int, default=400000)
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+    print("data rate: {} SPS, bus: {} kHz".format(args.data_rate, args.frequency // 1000))
+    for mode in ("sleep", "single", "continuous"):
+        count = 1 if mode == "sleep" else args.count
+        sweeps, transactions, channel_rate = run(mode, args.data_rate, args.frequency, count)
+        sweeps_ms = sorted(s * 1000 for s in sweeps)
+        print("{:>10}: sweep median {:.2f} ms, max {:.2f} ms, {:.1f} I2C transactions, one channel {:.0f} reads/s".format(
+            mode, statistics.median(sweeps_ms), sweeps_ms[-1], transactions, channel_rate))
+
+
+if __name__ == "__main__":
+    main()
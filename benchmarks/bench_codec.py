@@ -0,0 +1,69 @@
+#!/usr/bin/python
+
+#-----------------------------------------------------------------
+# Measures packets/s encoded and decoded by the fill and prop telemetry codecs, the way Codec used
+# to (a list built by dict lookups and a new bytes per packet, a dict built per decode) and with
+# the fast path (pack_into a reused buffer, unpack into a reused record).
+#
+# Usage: python benchmarks/bench_codec.py [--count N]
+#-----------------------------------------------------------------
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+import argparse
+import time
+from fill_telem_codec import FillTelemCodec
+from prop_telem_codec import PropTelemCodec
+
+# struct formats of integer and bool channels; every other channel is a float
+INTEGER_FORMATS = "bBhHiIlLqQnN?"
+
+
+def sample_value(fmt):
+    """
+    A value packable by a channel of struct format fmt.
+    """
+    return 1 if fmt[-1] in INTEGER_FORMATS else 1.5
+
+
+def legacy_encode(codec, msg):
+    msg_vals = [msg[channel] for channel in codec.msg_schema]
+    return codec.fields.pack(*msg_vals)
+
+
+def legacy_decode(codec, packet):
+    msg_vals = codec.fields.unpack(packet[4:])
+    msg = {}
+    for name, value in zip(codec.msg_schema, msg_vals):
+        msg[name] = value
+    return msg
+
+
+def rate(fn, arg, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(arg)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry codec encode and decode rates.")
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+    for codec in (FillTelemCodec(), PropTelemCodec()):
+        msg = {name: sample_value(fmt) for name, fmt in codec.msg_schema.items()}
+        packet = codec.encode(msg)
+        record = codec.record()
+        name = type(codec).__name__
+        print("{}: {} byte packets".format(name, len(packet)))
+        for label, fn, arg in (("encode legacy", lambda m: legacy_encode(codec, m), msg),
+                               ("encode", codec.encode, msg),
+                               ("encode_into", codec.encode_into, msg),
+                               ("decode legacy", lambda p: legacy_decode(codec, p), packet),
+                               ("decode", codec.decode, packet),
+                               ("decode_into", lambda p: codec.decode_into(p, record), packet)):
+            print("  {:>14}: {:>9.0f} packets/s".format(label, rate(fn, arg, args.count)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+#-----------------------------------------------------------------
+# Measures the time from a command datagram arriving on the command port to the matching
+# GPIO.output call, using the fake RPi.GPIO package.
+#
+# Usage: python benchmarks/bench_command_latency.py [--mode async|poll] [--count N]
+#-----------------------------------------------------------------
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+import argparse
+import asyncio
+import logging
+import socket
+import statistics
+import time
+try:
+    import RPi.GPIO as GPIO
+except (RuntimeError, ModuleNotFoundError):
+    print("Spoofing GPIO.")
+    import fake_rpigpio.utils
+    fake_rpigpio.utils.install()
+    import RPi.GPIO as GPIO
+from relays import Relays
+from fill_command_codec import FillCommandCodec
+from network_node import ReceiveNode, pack_packet
+from bitfield_utils import Utils
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+# two interlock-safe states to toggle between
+STATES = [[0, 0, 0, 0, 1, 0, 1, 0, 0, 0], [0, 0, 0, 0, 0, 1, 0, 1, 1, 0]]
+POLL_PERIOD = .5
+
+
+class OutputProbe:
+    """
+    Wraps GPIO.output and records the time of the first write after each command is sent.
+    """
+    def __init__(self, gpio):
+        self._output = gpio.output
+        self.sent_at = None
+        self.latencies = []
+        gpio.output = self.output
+
+    def output(self, channel, value):
+        if self.sent_at is not None:
+            self.latencies.append(time.perf_counter() - self.sent_at)
+            self.sent_at = None
+        self._output(channel, value)
+
+
+async def run(mode, count):
+    logging.disable(logging.INFO)
+    GPIO.setmode(GPIO.BCM)
+    relays = Relays(GPIO, control="fill", config_dir=CONFIG_DIR)
+    probe = OutputProbe(GPIO)
+    codec = FillCommandCodec()
+    node = ReceiveNode(("127.0.0.1", 0), codec)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def apply(received):
+        command, addr = received[-1]
+        relays.request_state(Utils.bitfield(command["fc_state"]), 0)
+        relays.update(GPIO)
+
+    loop = asyncio.get_event_loop()
+    if mode == "async":
+        transport, _ = await node.listen(loop, apply)
+    else:
+        async def poll():
+            while True:
+                received = node.receive_all()
+                if received:
+                    apply(received)
+                node.recycle()
+                await asyncio.sleep(POLL_PERIOD)
+        poller = loop.create_task(poll())
+
+    for i in range(count):
+        packet = pack_packet(codec, {
+            "fc_state": Utils.num(STATES[i % 2]),
+            "fc_soft_armed": True,
+            "fc_redlines_armed": False,
+            "fc_pulse": -1,
+            "fc_pdelay": 0
+        }, i)
+        probe.sent_at = time.perf_counter()
+        sender.sendto(packet, node.sock.getsockname())
+        while probe.sent_at is not None:
+            await asyncio.sleep(0)
+        # let the poller drift relative to the next send
+        await asyncio.sleep(0.013)
+
+    if mode == "async":
+        transport.close()
+    else:
+        poller.cancel()
+    sender.close()
+    return probe.latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Command arrival to GPIO.output latency.")
+    parser.add_argument("--mode", choices=["async", "poll"], default="async")
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args()
+    count = args.count if args.mode == "async" else min(args.count, 20)
+    latencies = asyncio.run(run(args.mode, count))
+    latencies_us = sorted(l * 1e6 for l in latencies)
+    print("mode: {}, commands: {}".format(args.mode, len(latencies_us)))
+    print("median: {:.1f} us".format(statistics.median(latencies_us)))
+    print("p99:    {:.1f} us".format(latencies_us[int(len(latencies_us) * .99) - 1]))
+    print("max:    {:.1f} us".format(latencies_us[-1]))
+
+
+if __name__ == "__main__":
+    main()
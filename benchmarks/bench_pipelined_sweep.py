@@ -0,0 +1,71 @@
+#!/usr/bin/python
+
+#-----------------------------------------------------------------
+# Compares full sweeps of the two ADS1115s (4 channels each) and the four ADS1219s (2 channels
+# each) against a simulated I2C bus, reading one channel after another as the sensors used to and
+# pipelined with sweep, which starts a conversion on one chip while reading another.
+#
+# Usage: python benchmarks/bench_pipelined_sweep.py [--frequency HZ] [--count N]
+#-----------------------------------------------------------------
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+import argparse
+import functools
+import statistics
+import time
+from sweep import sweep
+from ads1115 import ADS1115
+from ADC_Driver import ADS1219
+from fake_i2c import FakeI2C, FakeADS1115, FakeADS1219
+
+ADS1115_CODES = {4: 8000, 5: 16000, 6: 24000, 7: 32000}
+ADS1219_CODES = {ADS1219.CHANNEL_AIN0_AIN1: 0x123456, ADS1219.CHANNEL_AIN2_AIN3: 0x654321}
+
+
+def make_bus(frequency):
+    bus = FakeI2C(frequency=frequency)
+    for address in (0x48, 0x49):
+        bus.add(address, FakeADS1115(dict(ADS1115_CODES)))
+    for address in range(0x40, 0x44):
+        bus.add(address, FakeADS1219(dict(ADS1219_CODES)))
+    return bus
+
+
+def time_sweeps(read, count):
+    sweeps = []
+    for i in range(count):
+        start = time.perf_counter()
+        read()
+        sweeps.append((time.perf_counter() - start) * 1000)
+    return sorted(sweeps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential and pipelined 8 channel sweeps on a simulated I2C bus.")
+    parser.add_argument("--frequency", type=int, default=400000)
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+    bus = make_bus(args.frequency)
+    print("bus: {} kHz".format(args.frequency // 1000))
+    for data_rate in (128, 860):
+        adcs = [ADS1115(gain=1, addr=addr, i2c=bus, data_rate=data_rate) for addr in (0x48, 0x49)]
+        conversions = [(adc.addr, functools.partial(adc.start_conversion, channel), adc.read_conversion)
+                       for adc in adcs for channel in range(4)]
+        for name, read in (("sequential", lambda: [adc.read_voltage(c) for adc in adcs for c in range(4)]),
+                           ("pipelined", lambda: sweep(conversions))):
+            sweeps = time_sweeps(read, args.count)
+            print("ADS1115 x2 {:>4} SPS {:>10}: sweep median {:.2f} ms, max {:.2f} ms ({:.2f} ms a conversion)".format(
+                data_rate, name, statistics.median(sweeps), sweeps[-1], 1000 / data_rate))
+    for data_rate in (90, 330, 1000):
+        adcs = [ADS1219(i, data_rate=data_rate, i2c=bus) for i in range(1, 9)]
+        conversions = [(adc._address, adc.start_conversion, adc.read_conversion) for adc in adcs]
+        for name, read in (("sequential", lambda: [adc.read_raw_data() for adc in adcs]),
+                           ("pipelined", lambda: sweep(conversions))):
+            sweeps = time_sweeps(read, args.count)
+            print("ADS1219 x4 {:>4} SPS {:>10}: sweep median {:.2f} ms, max {:.2f} ms ({:.2f} ms a conversion)".format(
+                data_rate, name, statistics.median(sweeps), sweeps[-1], 1000 / data_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+#-----------------------------------------------------------------
+# Measures the cost of evaluating the redlines on one PT sample, and the time from a sample which
+# trips a redline to the GPIO.output call commanding the safe state, using the fake RPi.GPIO
+# package.
+#
+# Usage: python benchmarks/bench_redline_latency.py [--rules N] [--count N]
+#-----------------------------------------------------------------
+
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+import argparse
+import logging
+import statistics
+import time
+try:
+    import RPi.GPIO as GPIO
+except (RuntimeError, ModuleNotFoundError):
+    print("Spoofing GPIO.")
+    import fake_rpigpio.utils
+    fake_rpigpio.utils.install()
+    import RPi.GPIO as GPIO
+from relays import Relays
+from redlines import RedlineEngine, REDLINE_TAG
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+CHANNELS = [f"pc_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+
+
+class OutputProbe:
+    """
+    Wraps GPIO.output and records the time of the first write after each trip.
+    """
+    def __init__(self, gpio):
+        self._output = gpio.output
+        self.tripped_at = None
+        self.latencies = []
+        gpio.output = self.output
+
+    def output(self, channel, value):
+        if self.tripped_at is not None:
+            self.latencies.append(time.perf_counter() - self.tripped_at)
+            self.tripped_at = None
+        self._output(channel, value)
+
+
+def run(num_rules, count):
+    logging.disable(logging.INFO)
+    GPIO.setmode(GPIO.BCM)
+    relays = Relays(GPIO, control="prop", config_dir=CONFIG_DIR)
+    probe = OutputProbe(GPIO)
+    rules = [{"channel": CHANNELS[i % len(CHANNELS)], "max": 900, "min": -50, "hysteresis": 25,
+              "persistence": 1, "max_rate": 1e6} for i in range(num_rules)]
+    engine = RedlineEngine(rules, CHANNELS)
+    nominal = [500.0] * len(CHANNELS)
+    over = [1000.0] * len(CHANNELS)
+
+    evaluations = []
+    t = 0.0
+    for i in range(count):
+        t += 0.01
+        start = time.perf_counter()
+        engine.evaluate(nominal, t)
+        evaluations.append(time.perf_counter() - start)
+
+    for i in range(count):
+        # leave the safe state and clear the trip, then trip again
+        relays.request_state(relays.safe_state("closed"), 0)
+        relays.update(GPIO)
+        t += 0.01
+        engine.evaluate(nominal, t)
+        t += 0.01
+        probe.tripped_at = time.perf_counter()
+        tripped = engine.evaluate(over, t)
+        relays.request_state(relays.safe_state(engine.actions[tripped[0]]), REDLINE_TAG)
+        relays.update(GPIO)
+    return evaluations, probe.latencies
+
+
+def report(name, samples):
+    samples_us = sorted(s * 1e6 for s in samples)
+    print("{}: median {:.1f} us, p99 {:.1f} us, max {:.1f} us".format(
+        name, statistics.median(samples_us), samples_us[int(len(samples_us) * .99) - 1], samples_us[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redline evaluation cost and trip to GPIO.output latency.")
+    parser.add_argument("--rules", type=int, default=16)
+    parser.add_argument("--count", type=int, default=1000)
+    args = parser.parse_args()
+    evaluations, latencies = run(args.rules, args.count)
+    print("rules: {}, samples: {}".format(args.rules, args.count))
+    report("evaluate", evaluations)
+    report("trip to GPIO.output", latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,56 @@
-from bitarray import bitarray
+NUM_RELAYS = 10
+# leading one sent ahead of the relay bits to preserve leading zeros
+STATE_SENTINEL = 1 << NUM_RELAYS
+STATE_MASK = STATE_SENTINEL - 1
+
+
+class RelayState:
+	"""
+	Relay states packed into the bits of an int. Relay 1 is the most significant of the 10 bits,
+	the order states are sent over the network in. Indexing, iteration and comparison with lists
+	behave as they did for the state arrays this replaces.
+	"""
+	__slots__ = ("bits",)
+
+	def __init__(self, bits=0):
+		self.bits = bits
+
+	@classmethod
+	def from_list(cls, state):
+		bits = 0
+		for relay_state in state:
+			bits = (bits << 1) | relay_state
+		return cls(bits)
+
+	def to_list(self):
+		return [(self.bits >> (NUM_RELAYS - 1 - idx)) & 1 for idx in range(NUM_RELAYS)]
+
+	def copy(self):
+		return RelayState(self.bits)
+
+	def __getitem__(self, idx):
+		return (self.bits >> (NUM_RELAYS - 1 - idx)) & 1
+
+	def __setitem__(self, idx, level):
+		bit = 1 << (NUM_RELAYS - 1 - idx)
+		self.bits = (self.bits | bit) if level else (self.bits & ~bit)
+
+	def __len__(self):
+		return NUM_RELAYS
+
+	def __iter__(self):
+		return iter(self.to_list())
+
+	def __eq__(self, other):
+		if isinstance(other, RelayState):
+			return self.bits == other.bits
+		return self.to_list() == list(other)
+
+	__hash__ = None
+
+	def __repr__(self):
+		return str(self.to_list())
+
 
 class Utils:
 	"""
@@ -6,23 +58,17 @@ class Utils:
 	"""
 	def bitfield(n):
 		"""
-		Convert input integer into bit array. All integers sent are with leading to allow for zero
-		padding.
+		Convert input integer into a relay state. All integers sent are with a leading one to allow
+		for zero padding, which is dropped here.
 		"""
-		b = [1 if digit=='1' else 0 for digit in bin(n)[2:]]
-		# remove leading one used to preserve leading 0's
-		del b[0]
-		# pad right side of list with zeroes
-		if len(b) < 10:
-			b += [0] * (10 - len(b))
-		return b
+		return RelayState(n & STATE_MASK)
 
 	def num(b):
 		"""
-		Convert bitfield array to integer.
+		Convert relay state, or a state array, to integer.
 		"""
-		assert(len(b) == 10), "Invalid state array length."
-		c = b.copy()
+		if not isinstance(b, RelayState):
+			assert(len(b) == 10), "Invalid state array length."
+			b = RelayState.from_list(b)
 		# insert a leading one to preserve leading zeros (THIS MUST BE REMOVED BY bitfield())
-		c.insert(0, 1)
-		return int(bitarray(c).to01(), 2)
+		return b.bits | STATE_SENTINEL
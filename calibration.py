@@ -0,0 +1,96 @@
+import numpy as np
+
+# Defaults of the pressure transducers: 0.5 V at zero and 4.5 V at full scale
+DEFAULT_MIN_V = 0.5
+DEFAULT_MAX_V = 4.5
+DEFAULT_UNITS = "psi"
+
+
+def linear_coefficients(min_v, max_v, max_p):
+    """
+    Coefficients, lowest order first, of a transducer reading 0 at min_v and max_p at max_v.
+    """
+    slope = max_p / (max_v - min_v)
+    return [-min_v * slope, slope]
+
+
+class Calibration:
+    """
+    Per-channel conversions from volts to engineering units, each a polynomial in volts plus an
+    offset. All channels are converted in one NumPy operation on a block of samples, one column
+    per channel, so a whole capture costs no more Python than a single sample.
+
+    Built from a board's pt_scale config by from_config. Channels are linear between min_v and
+    max_v by default, and any of them may be given its own calibration by channel name:
+
+    "calibrations": {
+        "pc_adc1_c2": {"type": "linear", "min_v": 0.5, "max_v": 4.5, "max_p": 1500, "offset": -3.2},
+        "pc_adc2_c4": {"type": "polynomial", "coefficients": [-128.1, 255.9, 0.42], "units": "lbf"}
+    }
+
+    Polynomial coefficients are lowest order first. offset is added to the result.
+    """
+    def __init__(self, coefficients, offsets=None, units=None):
+        """
+        coefficients is a list per channel of polynomial coefficients, lowest order first.
+        """
+        num_channels = len(coefficients)
+        degree = max(len(c) for c in coefficients)
+        # one row per power of volts, one column per channel
+        self.coefficients = np.zeros((degree, num_channels))
+        for channel, c in enumerate(coefficients):
+            self.coefficients[:len(c), channel] = c
+        if offsets is not None:
+            self.coefficients[0] += offsets
+        self.units = units if units is not None else [DEFAULT_UNITS] * num_channels
+
+    @classmethod
+    def from_config(cls, pt_scale, channels):
+        """
+        Calibration of channels, a list of channel names, from the "pt_scale" block of a board's
+        pt_scale file.
+        """
+        min_v = pt_scale.get("min_v", DEFAULT_MIN_V)
+        max_v = pt_scale.get("max_v", DEFAULT_MAX_V)
+        overrides = pt_scale.get("calibrations", {})
+        coefficients = []
+        offsets = []
+        units = []
+        for channel, max_p in zip(channels, pt_scale["max_p"]):
+            spec = overrides.get(channel, {"type": "linear"})
+            if spec["type"] == "linear":
+                coefficients.append(linear_coefficients(spec.get("min_v", min_v), spec.get("max_v", max_v),
+                                                        spec.get("max_p", max_p)))
+            elif spec["type"] == "polynomial":
+                coefficients.append(spec["coefficients"])
+            else:
+                raise ValueError(f"Unknown calibration type '{spec['type']}' for {channel}")
+            offsets.append(spec.get("offset", 0.0))
+            units.append(spec.get("units", DEFAULT_UNITS))
+        return cls(coefficients, offsets, units)
+
+    @classmethod
+    def linear(cls, max_p, min_v=DEFAULT_MIN_V, max_v=DEFAULT_MAX_V):
+        """
+        Linear calibration of transducers with full scales max_p, one per channel.
+        """
+        return cls([linear_coefficients(min_v, max_v, p) for p in max_p])
+
+    def convert(self, volts):
+        """
+        Convert volts, a sample of every channel or a block of samples with one column per channel,
+        to engineering units.
+        """
+        volts = np.asarray(volts, dtype=float)
+        result = np.broadcast_to(self.coefficients[-1], volts.shape).copy()
+        for c in self.coefficients[-2::-1]:
+            result *= volts
+            result += c
+        return result
+
+    def convert_codes(self, codes, volts_per_code, volts_at_zero=0.0):
+        """
+        Convert raw ADC codes, as for convert, where a code is volts_at_zero + code * volts_per_code.
+        Both may be per channel.
+        """
+        return self.convert(volts_at_zero + np.asarray(codes, dtype=float) * volts_per_code)
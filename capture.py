@@ -0,0 +1,158 @@
+import os
+import struct
+import threading
+import time
+import logging
+import numpy as np
+logging.basicConfig(level=logging.DEBUG)
+
+# Capture file: a header, the name of each channel, then the sample times and a row of values per
+# sample, all little-endian float64. Times are on the time.monotonic clock of the controller. A value
+# is NaN where its channel was not converted in that sample.
+CAPTURE_MAGIC = b"SARPCAP\0"
+CAPTURE_VERSION = 1
+# magic, version, channels, samples, trigger monotonic time, trigger wall clock time, pre_s, post_s,
+# reasons
+CAPTURE_HEADER = struct.Struct("<8sHHIdddd64s")
+CHANNEL_NAME = struct.Struct("<16s")
+# seconds of history beyond a capture window the ring must hold, so the window is still there
+# when the writer gets to it
+WRITE_SLACK = 1
+
+
+def write_capture(path, channels, times, values, trigger_t, trigger_wall, pre_s, post_s, reasons):
+    """
+    Write a capture file. It is written alongside and renamed into place, so a capture file is
+    never seen half written.
+    """
+    header = CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(channels), len(times), trigger_t,
+                                 trigger_wall, pre_s, post_s, ",".join(reasons).encode()[:64])
+    with open(path + ".part", "wb") as capture_f:
+        capture_f.write(header)
+        for channel in channels:
+            capture_f.write(CHANNEL_NAME.pack(channel.encode()))
+        capture_f.write(np.ascontiguousarray(times, dtype="<f8").tobytes())
+        capture_f.write(np.ascontiguousarray(values, dtype="<f8").tobytes())
+    os.replace(path + ".part", path)
+
+
+def read_capture(path):
+    """
+    Read a capture file. Returns (header, times, values), header a dict of its fields and values
+    one row per sample.
+    """
+    with open(path, "rb") as capture_f:
+        data = capture_f.read()
+    magic, version, num_channels, num_samples, trigger_t, trigger_wall, pre_s, post_s, reasons = \
+        CAPTURE_HEADER.unpack_from(data)
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        raise ValueError(f"{path} is not a version {CAPTURE_VERSION} capture file")
+    offset = CAPTURE_HEADER.size
+    channels = []
+    for _ in range(num_channels):
+        channels.append(CHANNEL_NAME.unpack_from(data, offset)[0].rstrip(b"\0").decode())
+        offset += CHANNEL_NAME.size
+    times = np.frombuffer(data, "<f8", num_samples, offset)
+    offset += times.nbytes
+    values = np.frombuffer(data, "<f8", num_samples * num_channels, offset).reshape(num_samples, num_channels)
+    header = {"channels": channels, "trigger_t": trigger_t, "trigger_wall": trigger_wall, "pre_s": pre_s,
+              "post_s": post_s, "reasons": reasons.rstrip(b"\0").decode().split(",")}
+    return header, times, values
+
+
+class BurstCapture:
+    """
+    Saves the samples of an Acquisition from pre_s before to post_s after a trigger, such as a fire
+    command or redline trip, to a capture file in directory. The acquisition's ring already holds
+    the history at the full acquisition rate, so triggering only notes the time; the window is
+    copied out and written by a thread of its own once post_s has passed, and the control loop
+    never waits on the disk.
+
+    A trigger while a capture is waiting for its window to pass is added to its reasons and extends
+    the window to post_s after it. If the ring cannot hold the extended window, the trigger starts
+    a capture of its own, queued behind the first.
+    """
+    def __init__(self, acquisition, channels, pre_s, post_s, directory, name="capture"):
+        needed = (pre_s + post_s + WRITE_SLACK) / acquisition.period
+        if acquisition.ring.length < needed:
+            raise ValueError(f"Acquisition history of {acquisition.ring.length} samples is shorter than the "
+                             f"{needed:.0f} a {pre_s} + {post_s} s capture needs")
+        self.acquisition = acquisition
+        self.channels = channels
+        self.pre_s = pre_s
+        self.post_s = post_s
+        # longest a capture window may grow to and still be in the ring when it is written
+        self.max_window_s = acquisition.ring.length * acquisition.period - WRITE_SLACK
+        self.directory = directory
+        self.name = name
+        # paths of the capture files written
+        self.captures = []
+        # [monotonic time, wall clock time, reasons, end of window] of each capture waiting to be
+        # written, oldest first
+        self._pending = []
+        self._wake = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the writer, first writing any pending captures with the samples so far.
+        """
+        with self._wake:
+            self._stop = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def trigger(self, reason, t=None):
+        """
+        Capture around monotonic time t, now by default. Safe to call from any thread.
+        """
+        if t is None:
+            t = time.monotonic()
+        with self._wake:
+            if self._pending and t <= self._pending[-1][3]:
+                capture = self._pending[-1]
+                if t + self.post_s - (capture[0] - self.pre_s) <= self.max_window_s:
+                    if reason not in capture[2]:
+                        capture[2].append(reason)
+                    capture[3] = max(capture[3], t + self.post_s)
+                    return
+            self._pending.append([t, time.time() - (time.monotonic() - t), [reason], t + self.post_s])
+            self._wake.notify()
+
+    def pending(self):
+        return bool(self._pending)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._stop and (not self._pending or time.monotonic() < self._pending[0][3]):
+                    timeout = None if not self._pending else self._pending[0][3] - time.monotonic()
+                    self._wake.wait(timeout)
+                if not self._pending:
+                    return
+                # taken off the queue first, so a later trigger starts a capture of its own
+                t, wall, reasons, end = self._pending.pop(0)
+            try:
+                self._write(t, wall, reasons, end)
+            except Exception as e:
+                logging.error(f"Capture '{self.name}' could not be written: {e}")
+
+    def _write(self, t, wall, reasons, end_t):
+        times, values = self.acquisition.ring.since(t - self.pre_s)
+        end = np.searchsorted(times, end_t, side="right")
+        path = os.path.join(self.directory, "{}_{}_{}.bin".format(
+            self.name, time.strftime("%Y%m%d_%H%M%S", time.localtime(wall)), reasons[0]))
+        if os.path.exists(path):
+            path = path[:-len(".bin")] + f"_{len(self.captures)}.bin"
+        write_capture(path, self.channels, times[:end], values[:end], t, wall, self.pre_s, end_t - t, reasons)
+        self.captures.append(path)
+        logging.info(f"Captured {end} samples around {','.join(reasons)} to {path}")
@@ -1,13 +1,104 @@
 import struct
+from operator import itemgetter
+
+
+class Record(object):
+    """
+    A decoded packet, one slot holding the tuple of values, read by channel name as an attribute
+    or key. Decoding into a record is a single unpack with no dict built per packet.
+    """
+    __slots__ = ("_values",)
+    # channel name -> index into _values, set per codec
+    _index = {}
+
+    def __init__(self, values=None):
+        self._values = values
+
+    def __getitem__(self, name):
+        return self._values[self._index[name]]
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return self._values
+
+    def items(self):
+        return zip(self._index, self._values)
+
+    def to_dict(self):
+        return dict(zip(self._index, self._values))
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self._index is other._index and self._values == other._values
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.to_dict())
+
+
+# Schema id carried at the start of a packet whose codec has one
+SCHEMA_ID = struct.Struct("!I")
+
+# struct.Struct of each format compiled so far, shared by every codec using it
+_structs = {}
+
+
+def compiled(fmt):
+    """
+    The struct.Struct of fmt, compiled the first time it is asked for.
+    """
+    compiled_struct = _structs.get(fmt)
+    if compiled_struct is None:
+        compiled_struct = _structs.setdefault(fmt, struct.Struct(fmt))
+    return compiled_struct
+
+
+class SchemaMismatch(ValueError):
+    """
+    A packet was encoded with a different schema than the codec decoding it.
+    """
+
 
 class Codec(object):
     """
     Base class for SARP message encoding/decoding
+
+    With a schema_id, such as the hash given by the schema registry, every packet starts with it,
+    and decoding a packet of any other schema raises SchemaMismatch after comparing one int.
     """
-    def __init__(self, msg_schema):
+    def __init__(self, msg_schema, schema_id=None):
         self.msg_schema = msg_schema
-        fmt_str = '!' + ''.join([self.msg_schema[k] for k in self.msg_schema])
-        self.struct = struct.Struct(fmt_str)
+        self.schema_id = schema_id
+        fmt_str = ''.join([self.msg_schema[k] for k in self.msg_schema])
+        # the channels alone, and the packet with the schema id in front if there is one
+        self.fields = compiled('!' + fmt_str)
+        self.struct = self.fields if schema_id is None else compiled('!I' + fmt_str)
+        self.max_size = self.struct.size
+        self._prefix = () if schema_id is None else (schema_id,)
+        channels = tuple(self.msg_schema)
+        # gathers the values of a message in schema order in one call
+        self._values = itemgetter(*channels) if len(channels) > 1 else lambda msg: (msg[channels[0]],)
+        # reused by encode_into, so sending does not allocate a packet each time
+        self.buffer = bytearray(self.struct.size)
+        self.view = memoryview(self.buffer)
+        # record class of this schema, with an attribute per channel
+        attributes = {"__slots__": (), "_index": {name: idx for idx, name in enumerate(channels)}}
+        for idx, name in enumerate(channels):
+            attributes[name] = property(lambda record, idx=idx: record._values[idx])
+        self.Record = type(type(self).__name__ + "Record", (Record,), attributes)
 
     def encode(self, msg):
         """
@@ -15,8 +106,18 @@ class Codec(object):
             msg: a dictionary of channels:values matching the msg_schema
         Returns: a bytestring formatted packet
         """
-        msg_vals = [msg[channel] for channel in self.msg_schema]
-        return self.struct.pack(*msg_vals)
+        return self.struct.pack(*self._prefix, *self._values(msg))
+
+    def encode_into(self, msg, buffer=None, offset=0):
+        """
+        Pack msg, as for encode, into buffer at offset, or into this codec's own buffer.
+        Returns: a memoryview of the packet, valid until the buffer is next packed into
+        """
+        if buffer is None:
+            self.struct.pack_into(self.buffer, 0, *self._prefix, *self._values(msg))
+            return self.view
+        self.struct.pack_into(buffer, offset, *self._prefix, *self._values(msg))
+        return memoryview(buffer)[offset:offset + self.struct.size]
 
     def decode(self, packet):
         """
@@ -25,7 +126,30 @@ class Codec(object):
         Returns: a dictionary of channels:values matching the msg_schema
         """
         msg_vals = self.struct.unpack(packet)
-        msg = {}
-        for name, value in zip(self.msg_schema, msg_vals):
-            msg[name] = value
-        return msg
+        if self._prefix:
+            if msg_vals[0] != self.schema_id:
+                raise SchemaMismatch(f"Packet schema {msg_vals[0]:08x} is not {self.schema_id:08x}")
+            msg_vals = msg_vals[1:]
+        return dict(zip(self.msg_schema, msg_vals))
+
+    def record(self):
+        """
+        Returns: an empty record of this codec's schema, for decode_into
+        """
+        return self.Record()
+
+    def decode_into(self, packet, record=None, offset=0):
+        """
+        Decode the packet at offset into packet, any bytes-like object, into record, reused
+        between packets, or a new record.
+        Returns: the record
+        """
+        if record is None:
+            record = self.Record()
+        if self._prefix:
+            schema_id = SCHEMA_ID.unpack_from(packet, offset)[0]
+            if schema_id != self.schema_id:
+                raise SchemaMismatch(f"Packet schema {schema_id:08x} is not {self.schema_id:08x}")
+            offset += SCHEMA_ID.size
+        record._values = self.fields.unpack_from(packet, offset)
+        return record
@@ -1,19 +1,23 @@
 import json
 import asyncio
-import os
 import time
 import pdb
 import logging
+import numpy as np
 logging.basicConfig(level=logging.INFO)
 from relays import Relays
 from prop_sensors import PropSensors
 from fill_sensors import FillSensors
-from fill_telem_codec import FillTelemCodec
-from prop_telem_codec import PropTelemCodec
-from fill_command_codec import FillCommandCodec
-from prop_command_codec import PropCommandCodec
-from network_node import SendNode, ReceiveNode
-from bitfield_utils import Utils
+from schema_registry import SchemaRegistry
+from network_node import SendNode, ReceiveNode, coalesce
+from sequencer import Sequencer
+from scheduler import Scheduler
+from redlines import RedlineEngine, REDLINE_TAG
+from calibration import Calibration
+from filters import FilterBank
+from capture import BurstCapture
+from sensor_schedule import ConversionPlan, max_frame_rate
+from bitfield_utils import Utils, NUM_RELAYS
 
 try:
     import RPi.GPIO as GPIO
@@ -23,6 +27,17 @@ except (RuntimeError, ModuleNotFoundError):
     fake_rpigpio.utils.install()
     import RPi.GPIO as GPIO
 
+# seconds between heartbeats sent to ground control
+HEARTBEAT_PERIOD = 1
+# seconds without a heartbeat echo before the network is considered down
+NETWORK_TIMEOUT = 10
+# seconds between checks for edited configuration files
+CONFIG_CHECK_PERIOD = 5
+# where burst captures around fire commands and redline trips are saved
+CAPTURE_DIR = "/home/pi/controller/captures"
+# special state command from the operator to capture the last few seconds
+CAPTURE_COMMAND = 0b1
+
 class Controller:
 
     def __init__(self):
@@ -31,28 +46,55 @@ class Controller:
         self._control = open("/home/pi/controller/control.txt", "r").read()[0:4]
         self.relays = Relays(GPIO)
         self.redlines_armed = False
-        self.lastPing = time.time()
         self.og_time = 0.0
+        self.coalesced_commands = 0
+        # latest PT readings, used by sequence requirements
+        self.readings = None
+        # saves high rate samples around events, once acquisition is running
+        self.capture = None
+        # monotonic time of the newest sample sent in a telemetry batch
+        self.batch_sent_t = 0.0
+        self.adc_channels = [f"{self._control[0]}c_adc{adc}_c{channel}" for adc in (1, 2) for channel in range(1, 5)]
         self.first_time = True
         # pull appropriate sensor file
         with open("/home/pi/controller/" + self._control +"_pt_scale.json") as pt_scalings:
             pt_scaling = json.load(pt_scalings)
+            calibration = Calibration.from_config(pt_scaling["pt_scale"], self.adc_channels)
             if self._control == "fill":
-                self.sensors = FillSensors(pt_scaling["pt_scale"]["max_p"])
+                self.sensors = FillSensors(pt_scaling["pt_scale"]["max_p"], calibration)
             else:
-                self.sensors = PropSensors(pt_scaling["pt_scale"]["max_p"])
+                self.sensors = PropSensors(pt_scaling["pt_scale"]["max_p"], calibration)
+
+        with open("/home/pi/controller/gse_master.json") as gse_f:
+            self.gse_config = json.load(gse_f)
+        # every telemetry and command codec, compiled from gse_master.json
+        self.schemas = SchemaRegistry(self.gse_config)
+        # per channel filtering between acquisition and telemetry and redlines
+        with open("/home/pi/controller/sensor_map.json") as sensor_map_f:
+            self.sensor_map = json.load(sensor_map_f)
+        self.filters = FilterBank.from_config(self.sensor_map, self.adc_channels)
+        cpu_temp = self.sensor_map.get(f"{self._control[0]}c_cpu_temp", {})
+        if "rate_hz" in cpu_temp:
+            self.sensors.cpu_period = 1 / cpu_temp["rate_hz"]
+        self.sequencer = Sequencer(self.relays, GPIO, self.gse_config["sequences"][self._control],
+                                   self.gse_config["relay_maps"][self._control])
+
+        self.redlines = RedlineEngine(self.gse_config["redlines"][self._control], self.adc_channels)
+        self.scheduler = Scheduler()
 
         addresses= {}
         with open("/home/pi/controller/addresses.json") as addresses_f:
             addresses = json.load(addresses_f)
 
         self.gc_address = addresses["addresses"]["GC_ADDR_IP"]
+        self.gc_heartbeat_addr = (addresses["addresses"]["GC_ADDR_IP"], addresses["addresses"]["GC_ADDR_PORT"])
+        # telemetry is sent change-only if the control has a telemetry_delta entry in gse_master.json
         self.tlmServer = SendNode((addresses["addresses"]["TLM_SERVER_ADDR_IP"], addresses["addresses"]["TLM_SERVER_ADDR_PORT"]),
                                   (addresses["addresses"]["GC_ADDR_IP"], addresses["addresses"]["GC_ADDR_PORT"]),
-                                  eval(f"{self._control.capitalize()}TelemCodec()"))
+                                  self.schemas.delta(self._control) or self.schemas.codec("telemetry", self._control))
 
         self.cmdReceiver = ReceiveNode((addresses["addresses"]["CMD_RECEIVER_ADDR_IP"], addresses["addresses"]["CMD_RECEIVER_ADDR_PORT"]),
-                                       eval(f"{self._control.capitalize()}CommandCodec()"))
+                                       self.schemas.codec("command", self._control))
 
         # set config for log files
         self.soft_arm = False
@@ -71,146 +113,274 @@ class Controller:
         logger.addHandler(handler)
         return logger
 
-    def processRequest(self):
+    def commandsReceived(self, received):
+        """
+        Called by the command receiver as soon as datagrams arrive. The commands are applied to the
+        relays right away rather than on the next actuator tick.
+        """
+        self.applyCommands(received)
+
+    def applyCommands(self, received):
         """
-        Process the command to update relays. Here we will make sure the requested update is a
-        valid one.
+        Apply a burst of (command, addr) tuples, oldest first. Each command is applied as it would
+        be on its own, edge-triggered requests (fire, pulse) and then its state request and arm
+        flags, except for state-only commands overtaken by a later one, which are already stale.
+        The relays are updated after each command so the next one's edges see its state.
         """
-        command, addr = self.cmdReceiver.receive()
-        print("-------------------------------")
-        print(command)
-        print(addr)
-        print("-------------------------------")
-        if command is not None:
+        if not received:
+            return
+        for command, addr in received:
             self.cntrl_logger.info(command)
+        commands, coalesced = coalesce([command for command, addr in received])
+        if coalesced:
+            self.coalesced_commands += coalesced
+            self.cntrl_logger.info(f"Coalesced {coalesced} stale commands")
+        for command in commands:
+            self.handleEdges(command)
+            self.handleLevels(command)
+            self.relays.update(GPIO)
 
-            # check if we are firing
-            if self._control == "prop":
-                if command[f"{self._control[0]}c_fire"]:
-                    self.relays.INITIATE_FIRE_SEQUENCE(GPIO)
-
-            # pulse valve
-            pulse_valve = command[f"{self._control[0]}c_pulse"]
-            if pulse_valve >= 0:
-                pulse_delay = command[f"{self._control[0]}c_pdelay"]
-                print(f"Pulsing valve {pulse_valve}")
-                self.relays.PULSE_VALVE(GPIO, pulse_valve, pulse_delay)
-
-            # check if software is armed
-            if command[f"{self._control[0]}c_soft_armed"]:
-                self.soft_arm = True
-                self.relays.arm(GPIO)
-            else:
-                self.soft_arm = False
-                self.relays.disarm(GPIO)
+    def handleEdges(self, command):
+        """
+        Act on the one-off requests in a command.
+        """
+        # check if we are firing
+        if self._control == "prop":
+            # a second fire command aborts the burn
+            if command[f"{self._control[0]}c_fire"]:
+                if self.sequencer.is_running("fire"):
+                    self.sequencer.abort("fire")
+                else:
+                    self.sequencer.start("fire", self.readings)
+                    self.triggerCapture("fire")
 
-            if command[f"{self._control[0]}c_redlines_armed"]:
-                self.redlines_armed = True
-            else:
-                self.ignore_redlines = True
+        # pulse valve
+        pulse_valve = command[f"{self._control[0]}c_pulse"]
+        if pulse_valve >= NUM_RELAYS:
+            self.cntrl_logger.error(f"Dropping pulse of unknown valve {pulse_valve}")
+        elif pulse_valve >= 0:
+            pulse_delay = command[f"{self._control[0]}c_pdelay"]
+            self.cntrl_logger.info(f"Pulsing valve {pulse_valve}")
+            self.sequencer.pulse(pulse_valve, pulse_delay)
 
-            stateRequest = Utils.bitfield(command[f"{self._control[0]}c_state"])
-            if len(stateRequest) > 10:
-                # do special command stuff
-                pass
-            self.relays.request_state(stateRequest, 0)
+    def handleLevels(self, command):
+        """
+        Apply the arm flags and requested relay state of a command.
+        """
+        # check if software is armed
+        if command[f"{self._control[0]}c_soft_armed"]:
+            self.soft_arm = True
+            self.relays.arm(GPIO)
+        else:
+            self.soft_arm = False
+            self.sequencer.disarmed()
+            self.relays.disarm(GPIO)
+
+        arming = command[f"{self._control[0]}c_redlines_armed"] and not self.redlines_armed
+        if command[f"{self._control[0]}c_redlines_armed"]:
+            self.redlines_armed = True
+        else:
+            self.redlines_armed = False
+
+        stateCommand = command[f"{self._control[0]}c_state"]
+        if stateCommand >> (NUM_RELAYS + 1):
+            # do special command stuff
+            if stateCommand >> (NUM_RELAYS + 1) == CAPTURE_COMMAND:
+                self.triggerCapture("operator")
+        self.relays.request_state(Utils.bitfield(stateCommand), 0)
+        # rules which tripped while disarmed act as soon as redlines are armed
+        if arming and self.redlines.tripped.any():
+            self.cntrl_logger.error("Redlines armed with rules tripped")
+            self.redlineSafeState(self.redlines.active())
 
-    def checkRedlines(self):
+    def checkRedlines(self, readings, t, times=None):
         """
         Check PT readings for thresholds to update valves in event of dangerous state realized from
-        sensor readings.
+        sensor readings. Called with every sample of the PTs, taken at monotonic time t, with each
+        channel converted at times.
         """
+        tripped = self.redlines.evaluate(readings, t, times)
+        if len(tripped) == 0:
+            return
+        for idx in tripped:
+            self.cntrl_logger.error(self.redlines.describe(idx))
+        self.triggerCapture("redline", t)
         if (self.redlines_armed):
-            pass
-        else:
-            pass
+            self.redlineSafeState(tripped)
 
-    async def updateActuators(self):
+    def redlineSafeState(self, tripped):
         """
-        Update relays but first check if the update is safe.
+        Command the safe state of the first of the tripped rules.
         """
-        while True:
-            # Override SCR if applicable
-            self.checkRedlines()
-            # Submit SCR if command
-            self.processRequest()
-            # Apply latest SCR
-            self.relays.update(GPIO)
-            # logging.info("update actuators")
-            await asyncio.sleep(.5)
+        # the safe state takes over from any running sequence straight away
+        self.sequencer.abort_all()
+        self.relays.request_state(self.relays.safe_state(self.redlines.actions[tripped[0]]), REDLINE_TAG)
+        self.relays.update(GPIO)
+
+    def triggerCapture(self, reason, t=None):
+        """
+        Save the samples around monotonic time t, now by default, to a capture file.
+        """
+        if self.capture is not None:
+            self.cntrl_logger.info(f"Capture triggered by {reason}")
+            self.capture.trigger(reason, t)
+
+    def sampleTaken(self, t, readings, times):
+        """
+        Called on the loop with each sample from the acquisition thread, taken at monotonic time t.
+        times is when each channel was last converted, since the plan may convert it less often.
+        """
+        self.readings = list(readings)
+        self.checkRedlines(self.readings, t, times)
+
+    def updateActuators(self):
+        """
+        Update relays but first check if the update is safe. Run by the scheduler at the
+        update_actuators rate.
+        """
+        # Redlines are checked, and override the SCR, as each sensor sample is taken
+        # Commands are applied by commandsReceived as they arrive
+        # Apply latest SCR
+        self.relays.update(GPIO)
+
+    def sendTelemetry(self):
+        """
+        Construct the codec for telemetry. Run by the scheduler at the send_telemetry rate.
+        """
+        # Retrieve telemetry from sensors and relays
+        sensorTelem = self.sensors.get_telemetry()
+        relayTelem = self.relays.get_telemetry()
+        fullTelem = {}
+        # Add time stamp to fullTelem
+        if self.first_time:
+            self.og_time = time.time()
+            self.first_time = False
+        fullTelem[f"{self._control[0]}c_timestamp"] = time.time() - self.og_time
+
+        # Add redlines_armed to fullTelem
+        fullTelem[f"{self._control[0]}c_redlines_armed"] = self.redlines_armed
 
-    async def sendTelemetry(self):
+        # Add the measured width of the last valve pulse
+        fullTelem[f"{self._control[0]}c_pulse_width"] = self.sequencer.pulse_width
+
+        # Add the loss, duplication and reordering of the commands received
+        sequence = self.cmdReceiver.sequence
+        fullTelem[f"{self._control[0]}c_cmd_gaps"] = sequence.gaps
+        fullTelem[f"{self._control[0]}c_cmd_duplicates"] = sequence.duplicates
+        fullTelem[f"{self._control[0]}c_cmd_reordered"] = sequence.reordered
+
+        # Add sensors and relays to telemetry
+        fullTelem.update(sensorTelem)
+        fullTelem.update(relayTelem)
+        try:
+            self.tlmServer.send(fullTelem)
+        except Exception as e:
+            self.telem_logger.error('Network error:')
+        if self.soft_arm:
+            self.telem_logger.info(fullTelem)
+
+    def sendBatch(self):
+        """
+        Send the samples acquired since the last batch, at the full acquisition rate and in as few
+        datagrams as they fit in. Run by the scheduler at the send_batch rate.
+        """
+        if self.sensors.acquisition is None:
+            return
+        times, values = self.sensors.acquisition.ring.since(self.batch_sent_t)
+        if len(times) == 0:
+            return
+        try:
+            self.tlmServer.send_batch(self.schemas.codec("batch", self._control),
+                                      (times * 1e9).astype(np.uint64), values)
+            self.batch_sent_t = times[-1]
+        except Exception as e:
+            self.telem_logger.error(f'Network error: {e}')
+
+    async def watchConfig(self):
         """
-        Construct the codec for telemetry.
+            rebuild the interlock table if the prohibited states or relay map are edited
         """
         while True:
-            # Retrieve telemetry from sensors and relays
-            sensorTelem = self.sensors.get_telemetry()
-            relayTelem = self.relays.get_telemetry()
-            print("\nSENSOR TELEM")
-            print(sensorTelem)
-            print("\nRELAY TELEM")
-            print(relayTelem)
-            fullTelem = {}
-            # Add time stamp to fullTelem
-            if self.first_time:
-                self.og_time = time.time()
-                self.first_time = False
-            fullTelem[f"{self._control[0]}c_timestamp"] = time.time() - self.og_time
-
-            # Add redlines_armed to fullTelem
-            fullTelem[f"{self._control[0]}c_redlines_armed"] = self.redlines_armed
-
-            # Add sensors and relays to telemetry
-            fullTelem.update(sensorTelem)
-            fullTelem.update(relayTelem)
-            print("\nFULL TELEM")
-            print(fullTelem)
             try:
-                self.tlmServer.send(fullTelem)
-                print("success")
+                if self.relays.interlocks.reload_if_changed():
+                    self.cntrl_logger.info("Interlock configuration reloaded")
             except Exception as e:
-                self.telem_logger.error('Network error:')
-            if self.soft_arm:
-                self.telem_logger.info(fullTelem)
-            await asyncio.sleep(.5)
+                # a half saved or malformed file; the previous table stays in force
+                self.cntrl_logger.error(f"Interlock configuration not reloaded, keeping the previous table: {e}")
+            await asyncio.sleep(CONFIG_CHECK_PERIOD)
+
+    async def heartbeat(self):
+        """
+            send a heartbeat to gc over the command socket
+            the echo is timed by the command receiver's link monitor
+        """
+        while True:
+            self.cmdReceiver.heartbeat(self.gc_heartbeat_addr)
+            await asyncio.sleep(HEARTBEAT_PERIOD)
 
     async def checkNetwork(self):
         """
-            ping gc to check connection
+            check heartbeat echoes from gc
             set network status based on response
         """
         count = 0
+        link = self.cmdReceiver.link
         while True:
-            # ping gc
-            response = os.system("ping -c 1 -w 10 " + str(self.gc_address))
-
-            # if valid ping
-            if response == 0:
-                # keep track of last successful ping
+            # if gc echoed a heartbeat recently
+            if link.since_last_echo() < NETWORK_TIMEOUT:
                 count = 0
-                self.lastPing = time.time()
             else:
                 # check 10 minute time out
                 count += 1
                 if count > 1:
                     self.cntrl_logger.error("Bad network state detected")
-                    if time.time() - self.lastPing > 600:
+                    if link.since_last_echo() > 600:
                         # disarm and vent
-                        self.relays.SET_VENT_STATE(GPIO, 3)
+                        self.sequencer.start("vent", self.readings, tag=3)
                         # self.relays.disarm(GPIO) # disarm sets closed, we want to leave open
                     # set to closed state if not venting
                     else:
                         self.relays.SET_CLOSED_STATE(GPIO, 3)
 
-            await asyncio.sleep(10)
+            if link.rtt_avg is not None:
+                self.cntrl_logger.info(f"Link rtt {link.rtt * 1000:.1f} ms (avg {link.rtt_avg * 1000:.1f} ms, "
+                                       f"max {link.rtt_max * 1000:.1f} ms), loss {link.loss():.1%} "
+                                       f"({link.lost}/{link.sent})")
+            if self.cmdReceiver.sequence.received:
+                self.cntrl_logger.info(f"Commands: {self.cmdReceiver.sequence}")
+            await asyncio.sleep(NETWORK_TIMEOUT)
 
 
     def main(self):
         pool = asyncio.get_event_loop()
+        pool.run_until_complete(self.cmdReceiver.listen(pool, self.commandsReceived))
+        pool.create_task(self.heartbeat())
         pool.create_task(self.checkNetwork())
-        pool.create_task(self.updateActuators())
-        pool.create_task(self.sendTelemetry())
+        pool.create_task(self.watchConfig())
+        # actuation and telemetry run on absolute deadlines at the rates in gse_master.json
+        task_rates = self.gse_config["task_rates"][self._control]
+        self.scheduler.add_from_config("update_actuators", task_rates["update_actuators"], self.updateActuators)
+        self.scheduler.add_from_config("send_telemetry", task_rates["send_telemetry"], self.sendTelemetry)
+        self.scheduler.add_from_config("send_batch", task_rates["send_batch"], self.sendBatch)
+        self.scheduler.start(pool)
+        # the ADCs are read in their own thread, and each sample handed to the loop
+        acquisition = self.gse_config["acquisition"][self._control]
+        rate_hz = acquisition["rate_hz"]
+        if rate_hz == "max":
+            # as fast as the ADCs can convert every channel, so captures hold the full rate history
+            rate_hz = max_frame_rate(self.sensors.channel_devices())
+        self.cntrl_logger.info(f"Acquiring at {rate_hz} Hz")
+        # each channel is converted at its own rate from sensor_map.json
+        plan = ConversionPlan.from_config(self.sensor_map, self.adc_channels, self.sensors.channel_devices(),
+                                          rate_hz)
+        self.sensors.start_acquisition(rate_hz, acquisition["history_s"],
+                                       lambda t, readings: pool.call_soon_threadsafe(
+                                           self.sampleTaken, t, readings, self.sensors.acquisition.held_times),
+                                       self.filters, plan)
+        capture = acquisition["capture"]
+        self.capture = BurstCapture(self.sensors.acquisition, self.adc_channels, capture["pre_s"], capture["post_s"],
+                                    CAPTURE_DIR, f"{self._control}_capture")
+        self.capture.start()
         pool.run_forever()
 
 
@@ -0,0 +1,131 @@
+"""
+Change-only telemetry: each frame carries only the channels which moved beyond their deadband.
+"""
+import struct
+from codec import compiled, SchemaMismatch
+
+# schema id and flags, ahead of the presence mask
+DELTA_HEADER = struct.Struct("!IB")
+# flag of a frame carrying every channel
+KEYFRAME = 0x01
+# frames from one keyframe to the next
+DEFAULT_KEYFRAME_EVERY = 20
+
+
+class DeltaUnsynced(ValueError):
+    """
+    A change-only frame arrived before a keyframe gave the values of the channels it left out.
+    """
+
+
+class DeltaCodec:
+    """
+    Encodes a telemetry schema as a presence mask, a bit per channel with the first channel the
+    most significant bit, followed by the values of only the channels whose bits are set. A
+    channel is sent when it has moved more than its deadband from the value last sent for it, so a
+    slow drift is still sent once it adds up. Every keyframe_every frames all of the channels are
+    sent, so a receiver which joins late or misses a frame is back in step within that many frames.
+
+    A codec holds the state of one stream: the values last sent when encoding, and the values last
+    received when decoding, so the sender and each receiver need a codec of their own.
+    """
+    def __init__(self, msg_schema, schema_id, deadbands=None, keyframe_every=DEFAULT_KEYFRAME_EVERY):
+        if deadbands is None:
+            deadbands = {}
+        unknown = set(deadbands) - set(msg_schema)
+        if unknown:
+            raise ValueError(f"Deadbands given for channels not in the schema: {', '.join(sorted(unknown))}")
+        self.msg_schema = msg_schema
+        self.schema_id = schema_id
+        self.keyframe_every = keyframe_every
+        self.channels = tuple(msg_schema)
+        self._structs = [compiled("!" + msg_schema[name]) for name in self.channels]
+        self._deadbands = [deadbands.get(name, 0) for name in self.channels]
+        self.mask_size = (len(self.channels) + 7) // 8
+        # a keyframe, the largest frame
+        self.max_size = DELTA_HEADER.size + self.mask_size + sum(s.size for s in self._structs)
+        self.buffer = bytearray(self.max_size)
+        self.view = memoryview(self.buffer)
+        # encoding: values last sent, and frames until the next keyframe
+        self._sent = [None] * len(self.channels)
+        self._until_keyframe = 0
+        # decoding: values last received, None until the first keyframe
+        self._received = None
+
+    def keyframe(self):
+        """
+        Send every channel in the next frame, such as when a receiver has just connected.
+        """
+        self._until_keyframe = 0
+
+    def encode_into(self, msg, buffer=None, offset=0):
+        """
+        Pack the channels of msg which have changed, or all of them in a keyframe, into buffer at
+        offset, or into this codec's own buffer.
+        Returns: a memoryview of the packet, valid until the buffer is next packed into
+        """
+        if buffer is None:
+            buffer = self.buffer
+        keyframe = self._until_keyframe <= 0
+        self._until_keyframe = self.keyframe_every - 1 if keyframe else self._until_keyframe - 1
+        mask = 0
+        end = offset + DELTA_HEADER.size + self.mask_size
+        for idx, name in enumerate(self.channels):
+            mask <<= 1
+            value = msg[name]
+            last = self._sent[idx]
+            # not within the deadband rather than beyond it, so a NaN is always sent
+            if keyframe or last is None or (value != last and not abs(value - last) <= self._deadbands[idx]):
+                self._structs[idx].pack_into(buffer, end, value)
+                end += self._structs[idx].size
+                self._sent[idx] = value
+                mask |= 1
+        DELTA_HEADER.pack_into(buffer, offset, self.schema_id, KEYFRAME if keyframe else 0)
+        buffer[offset + DELTA_HEADER.size:offset + DELTA_HEADER.size + self.mask_size] = \
+            mask.to_bytes(self.mask_size, "big")
+        return memoryview(buffer)[offset:end]
+
+    def encode(self, msg):
+        """
+        Args:
+            msg: a dictionary of channels:values matching the msg_schema
+        Returns: a bytestring formatted packet
+        """
+        return bytes(self.encode_into(msg))
+
+    def decode(self, packet, offset=0):
+        """
+        Update the values last received with the channels in packet.
+        Returns: a dictionary of every channel:value, the newest received of each
+        """
+        schema_id, flags = DELTA_HEADER.unpack_from(packet, offset)
+        if schema_id != self.schema_id:
+            raise SchemaMismatch(f"Packet schema {schema_id:08x} is not {self.schema_id:08x}")
+        offset += DELTA_HEADER.size
+        mask = int.from_bytes(packet[offset:offset + self.mask_size], "big")
+        offset += self.mask_size
+        if flags & KEYFRAME:
+            self._received = [None] * len(self.channels)
+        elif self._received is None:
+            raise DeltaUnsynced("Change-only frame received before a keyframe")
+        bit = 1 << (len(self.channels) - 1)
+        for idx in range(len(self.channels)):
+            if mask & bit:
+                self._received[idx] = self._structs[idx].unpack_from(packet, offset)[0]
+                offset += self._structs[idx].size
+            bit >>= 1
+        return dict(zip(self.channels, self._received))
+
+    def changed(self, packet, offset=0):
+        """
+        Returns: the names of the channels carried by packet
+        """
+        mask = int.from_bytes(packet[offset + DELTA_HEADER.size:offset + DELTA_HEADER.size + self.mask_size], "big")
+        return [name for idx, name in enumerate(self.channels) if mask & (1 << (len(self.channels) - 1 - idx))]
+
+    def resync(self):
+        """
+        Forget the values received, after a lost frame, so change-only frames raise DeltaUnsynced
+        until the next keyframe rather than leave a missed change standing.
+        """
+        self._received = None
@@ -0,0 +1,54 @@
+import asyncio
+import selectors
+
+# Simulated monotonic clock for the unit tests. Timers fire at exactly their deadline without the
+# test waiting for them, so timing is asserted exactly and does not depend on the machine's load.
+
+
+class _ClockSelector(selectors.DefaultSelector):
+    """
+    Polls instead of blocking for a timer, then moves the clock on to it.
+    """
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return super().select()
+        ready = super().select(0)
+        if not ready:
+            self.loop.advance(timeout)
+        return ready
+
+
+class FakeClockLoop(asyncio.SelectorEventLoop):
+    """
+    An event loop whose time() only moves when every task is waiting on a timer, jumping straight
+    to the next one, or when advance() stands for work taking that long. I/O is still real.
+    """
+    def __init__(self):
+        self._now = 0.0
+        super().__init__(_ClockSelector(self))
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+
+def run(main):
+    """
+    Like asyncio.run(), on a FakeClockLoop. Returns main's result.
+    """
+    loop = FakeClockLoop()
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
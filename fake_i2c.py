@@ -0,0 +1,190 @@
+import struct
+import time
+
+# Simulated I2C bus and ADCs for the unit tests and benchmarks. Transactions take the time the
+# bytes would take on the wire, so benchmark results are comparable to the real bus.
+
+# bits on the wire per byte, including the ack
+BITS_PER_BYTE = 9
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class FakeI2C:
+    """
+    Stands in for busio.I2C. Devices are added by address and each transaction is passed on to
+    the device after spinning for the time the address byte and data would take at frequency.
+    """
+    def __init__(self, frequency=100000):
+        self.frequency = frequency
+        self.devices = {}
+        self.transactions = 0
+        self._locked = False
+
+    def add(self, address, device):
+        self.devices[address] = device
+        return device
+
+    def _transfer(self, address, nbytes):
+        if address not in self.devices:
+            raise OSError(f"No I2C device at address: 0x{address:x}")
+        self.transactions += 1
+        spin((nbytes + 1) * BITS_PER_BYTE / self.frequency)
+        return self.devices[address]
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        data = bytes(buffer[start:end])
+        self._transfer(address, len(data)).write(data)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        buffer[start:end] = self._transfer(address, end - start).read(end - start)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None):
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
+
+    def deinit(self):
+        pass
+
+
+class FakeADS1219:
+    """
+    An ADS1219 converting at the data rate in its config register. codes maps each mux setting to
+    the code it converts to. A single-shot conversion, or each conversion in continuous mode, is
+    ready one conversion period after START/SYNC. The commands the chip is sent are counted so
+    tests can check what a driver did without timing it.
+    """
+    PERIODS = {0x0: 1 / 20, 0x4: 1 / 90, 0x8: 1 / 330, 0xC: 1 / 1000}
+
+    def __init__(self, codes=None):
+        self.codes = codes if codes is not None else {}
+        self.config = 0
+        self.configs_written = 0
+        self.resets = 0
+        self.conversions = 0
+        self.starts = 0
+        self.status_reads = 0
+        # results read when no new conversion had completed
+        self.stale_reads = 0
+        self._started = None
+        self._converting = 0
+        self._results_read = 0
+        self._reply = b""
+
+    def _period(self):
+        return self.PERIODS[self.config & 0xC]
+
+    def _completed(self):
+        if self._started is None:
+            return 0
+        completed = int((time.perf_counter() - self._started) / self._period())
+        # single-shot mode converts once
+        return completed if self.config & 0x2 else min(completed, 1)
+
+    def write(self, data):
+        if not data:
+            # probed for
+            return
+        command = data[0]
+        if command == 0x6:
+            self.config = 0
+            self.resets += 1
+            self._started = None
+        elif command == 0x8:
+            self.starts += 1
+            self._started = time.perf_counter()
+            self._converting = self.config & 0xE0
+            self._results_read = 0
+        elif command == 0x2:
+            self._started = None
+        elif command == 0x10:
+            completed = self._completed()
+            if completed <= self._results_read:
+                self.stale_reads += 1
+            self._results_read = completed
+            self.conversions += 1
+            self._reply = struct.pack(">I", self.codes.get(self._converting, 0))[1:]
+        elif command == 0x20:
+            self._reply = bytes([self.config])
+        elif command == 0x24:
+            self.status_reads += 1
+            ready = self._completed() > self._results_read
+            self._reply = bytes([0x80 if ready else 0x0])
+        elif command == 0x40:
+            self.config = data[1]
+            self.configs_written += 1
+
+    def read(self, nbytes):
+        return self._reply[:nbytes]
+
+
+class FakeADS1115:
+    """
+    An ADS1115 converting at the data rate in its config register. codes maps each mux setting to
+    the signed code it converts to. Writing the config register with OS set starts a single-shot
+    conversion; in continuous mode a write restarts the conversions.
+    """
+    RATES = [8, 16, 32, 64, 128, 250, 475, 860]
+
+    def __init__(self, codes=None):
+        self.codes = codes if codes is not None else {}
+        self.config = 0x8583
+        self.configs_written = 0
+        self.pointer = 0
+        self._started = None
+        self._converting = 0
+        self._result = 0
+
+    def _period(self):
+        return 1 / self.RATES[(self.config >> 5) & 0x7]
+
+    def _completed(self):
+        if self._started is None:
+            return 0
+        completed = int((time.perf_counter() - self._started) / self._period())
+        # single-shot mode converts once
+        if self.config & 0x100:
+            completed = min(completed, 1)
+        if completed:
+            self._result = self.codes.get(self._converting, 0)
+        return completed
+
+    def write(self, data):
+        if not data:
+            # probed for
+            return
+        self.pointer = data[0] & 0x3
+        if len(data) == 3 and self.pointer == 1:
+            self.config = (data[1] << 8 | data[2]) & 0x7FFF
+            self.configs_written += 1
+            if data[1] & 0x80 or not self.config & 0x100:
+                self._completed()
+                self._started = time.perf_counter()
+                self._converting = (self.config >> 12) & 0x7
+
+    def read(self, nbytes):
+        if self.pointer == 0:
+            self._completed()
+            return struct.pack(">h", self._result)[:nbytes]
+        if self.pointer == 1:
+            converting = self.config & 0x100 and self._started is not None and not self._completed()
+            return struct.pack(">H", self.config | (0 if converting else 0x8000))[:nbytes]
+        return bytes(nbytes)
@@ -1,22 +1,13 @@
 """
-Codec format for commands.
+The codec format for fill commands, compiled from the "f" block of command_config in gse_master.json.
 """
-
 from codec import Codec
-from collections import OrderedDict
+from schema_registry import get_registry
 
 # Map of all channel names to data types. For more info see:
 # https://docs.python.org/3/library/struct.html#struct-format-strings
-# h = short
-# ? = _Bool
-msg_schema = OrderedDict([
-    ("fc_state", "h"),
-    ("fc_soft_armed", "?"),
-    ("fc_redlines_armed", "?"),
-    ("fc_pulse", "i"),
-    ("fc_pdelay", "i")
-])
+msg_schema = get_registry().codec("command", "f").msg_schema
 
 class FillCommandCodec(Codec):
     def __init__(self):
-        super(FillCommandCodec, self).__init__(msg_schema)
+        super(FillCommandCodec, self).__init__(msg_schema, get_registry().codec("command", "f").schema_id)
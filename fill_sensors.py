@@ -1,48 +1,46 @@
 import logging
 logging.basicConfig(level=logging.DEBUG)
+from sensor_board import SensorBoard
+import time
 
 try:
     from gpiozero import CPUTemperature
-    import PROP_ADC_Driver
+    from ads1115 import ADS1115
     ONTARGET = True
 except:
     ONTARGET = False
 
 ADC_GAIN = 2/3
 ADC_SAMPLE_RATE = 20
+# conversions run at the ADS1115's fastest rate, so the PTs can be sampled at the highest rate
+ADC_DATA_RATE = 860
 
 # max pressure in 1000 PSI
 # PT_MAX_P = [1, 1, 1, 1, 5, 5, 0, 0]
 
 
-class FillSensors:
-    def __init__(self, pt_scale):
-        self.adc = []
-        self.PT_scaling = pt_scale
+class FillSensors(SensorBoard):
+    def __init__(self, pt_scale, calibration=None):
+        super().__init__(pt_scale, calibration, ADC_DATA_RATE, "fill_acquisition")
+        # seconds between reads of the CPU temperature; it barely changes
+        self.cpu_period = 0
+        self._cpu_temp = 0
+        self._cpu_read_at = None
         if (ONTARGET):
             self.cpu = CPUTemperature()
-            self.adc.append(PROP_ADC_Driver.ADS1115(gain=ADC_GAIN, addr=0x48))
-            self.adc.append(PROP_ADC_Driver.ADS1115(gain=ADC_GAIN, addr=0x49))
+            self.set_adcs([ADS1115(gain=ADC_GAIN, addr=0x48, data_rate=ADC_DATA_RATE),
+                           ADS1115(gain=ADC_GAIN, addr=0x49, data_rate=ADC_DATA_RATE)])
 
     def get_cpu_temp(self):
         if (ONTARGET):
-            return self.cpu.temperature
+            now = time.monotonic()
+            if self._cpu_read_at is None or now - self._cpu_read_at >= self.cpu_period:
+                self._cpu_temp = self.cpu.temperature
+                self._cpu_read_at = now
+            return self._cpu_temp
         else:
             return 0
 
-    def get_adc_readings(self):
-        readings = []
-        if (ONTARGET):
-            for num, adc in enumerate(self.adc):
-                for channel in range(0, 4):
-                    # 4 pts with max 1k psi
-                    # readings.append(self.PT_scaling[num*4 + channel])
-                    readings.append(adc.read_pressure(channel, max_p=self.PT_scaling[num*4 + channel]))
-                    # readings.append(adc.read_voltage(channel))
-        else:
-            return [0, 0, 0, 0, 0, 0, 0, 0]
-        return readings
-
     def get_hard_armed(self):
         return False
 
@@ -52,7 +50,7 @@ class FillSensors:
         Send the cpu temp and each of the adc readings over telemetry. If read_channels
         is false, then we return 0 instead of the true readings.
         """
-        readings = self.get_adc_readings()
+        readings = self.get_latest_readings()
         if not read_channels:
             readings = [0, 0, 0, 0, 0, 0, 0, 0]
 
@@ -0,0 +1,214 @@
+import math
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Largest growth of the scale factors within one chunk of an IIR block, keeping the closed form
+# evaluation well inside double precision
+IIR_MAX_SCALE = 1e8
+
+
+class MovingAverage:
+    """
+    Mean of the last window samples. Until window samples have been seen, the mean of those seen.
+    """
+    def __init__(self, window):
+        self.window = window
+        # the last window - 1 samples
+        self._history = deque(maxlen=window - 1)
+
+    def process(self, x):
+        history = np.array(self._history, dtype=float)
+        full = np.concatenate((history, x))
+        sums = np.concatenate(([0.0], np.cumsum(full)))
+        ends = np.arange(len(history) + 1, len(full) + 1)
+        starts = np.maximum(ends - self.window, 0)
+        self._history.clear()
+        self._history.extend(full[max(len(full) - (self.window - 1), 0):].tolist())
+        return (sums[ends] - sums[starts]) / (ends - starts)
+
+    def step(self, x):
+        """
+        Filter one sample, as process does a block, without the cost of building arrays.
+        """
+        y = (sum(self._history) + x) / (len(self._history) + 1)
+        if self.window > 1:
+            self._history.append(x)
+        return y
+
+
+class Median:
+    """
+    Median of the last window samples. Until window samples have been seen, the median of those
+    seen.
+    """
+    def __init__(self, window):
+        self.window = window
+        # the last window - 1 samples
+        self._history = deque(maxlen=window - 1)
+
+    def process(self, x):
+        full = np.concatenate((np.array(self._history, dtype=float), x))
+        h = len(self._history)
+        y = np.empty(len(x))
+        # outputs before the window first fills
+        filling = min(max(self.window - 1 - h, 0), len(x))
+        for i in range(filling):
+            y[i] = np.median(full[:h + i + 1])
+        if filling < len(x):
+            windows = sliding_window_view(full, self.window)
+            y[filling:] = np.median(windows[h + filling - self.window + 1:], axis=1)
+        self._history.clear()
+        self._history.extend(full[max(len(full) - (self.window - 1), 0):].tolist())
+        return y
+
+    def step(self, x):
+        """
+        Filter one sample, as process does a block, without the cost of building arrays.
+        """
+        window = sorted(self._history)
+        window.append(x)
+        window.sort()
+        if self.window > 1:
+            self._history.append(x)
+        middle = len(window) // 2
+        return window[middle] if len(window) % 2 else (window[middle - 1] + window[middle]) / 2
+
+
+class SinglePoleIIR:
+    """
+    y[n] = y[n-1] + alpha * (x[n] - y[n-1]), starting from the first sample. Blocks are evaluated in
+    closed form a chunk at a time rather than sample by sample.
+    """
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"IIR alpha {alpha} must be in (0, 1]")
+        self.alpha = alpha
+        decay = 1 - alpha
+        self._chunk = int(math.log(IIR_MAX_SCALE) / -math.log(decay)) if decay > 0 else None
+        self._y = None
+
+    def process(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.alpha == 1:
+            if len(x):
+                self._y = x[-1]
+            return x.copy()
+        y = np.empty(len(x))
+        decay = 1 - self.alpha
+        start = 0
+        if self._y is None and len(x):
+            self._y = x[0]
+        while start < len(x):
+            chunk = x[start:start + self._chunk]
+            # y[i] = decay^(i+1) * (y0 + alpha * sum(x[k] / decay^(k+1) for k <= i))
+            scale = decay ** -np.arange(1, len(chunk) + 1)
+            y[start:start + len(chunk)] = (self._y + self.alpha * np.cumsum(chunk * scale)) / scale
+            self._y = y[start + len(chunk) - 1]
+            start += len(chunk)
+        return y
+
+    def step(self, x):
+        """
+        Filter one sample, as process does a block.
+        """
+        self._y = x if self._y is None else self._y + self.alpha * (x - self._y)
+        return self._y
+
+
+FILTERS = {"moving_average": lambda spec: MovingAverage(spec["window"]),
+           "median": lambda spec: Median(spec["window"]),
+           "iir": lambda spec: SinglePoleIIR(spec["alpha"])}
+
+
+def make_filter(spec):
+    if spec["type"] not in FILTERS:
+        raise ValueError(f"Unknown filter type '{spec['type']}'")
+    return FILTERS[spec["type"]](spec)
+
+
+class FilterBank:
+    """
+    A filter and decimation for each channel, applied to blocks of samples with one column per
+    channel. Memory is bounded by the longest filter window, whatever the length of the stream.
+
+    Configured per channel in sensor_map.json, for example:
+
+    "pc_adc1_c1": {"adc": 1.1, "filter": {"type": "median", "window": 5}, "decimate": 4}
+
+    filter is a moving_average or median over window samples, or an iir with smoothing factor
+    alpha. decimate keeps every nth filtered sample. Either may be left out.
+
+    A NaN marks a channel not converted in that sample. It is skipped, so each channel is filtered
+    and decimated over its own conversions.
+    """
+    def __init__(self, filters, decimation):
+        """
+        filters holds a filter or None per channel, decimation a factor per channel.
+        """
+        self.filters = filters
+        self.decimation = decimation
+        # samples until each channel's next output
+        self._phase = [0] * len(filters)
+        # latest output of each channel and its time
+        self.latest = np.full(len(filters), np.nan)
+        self.latest_times = np.full(len(filters), np.nan)
+
+    @classmethod
+    def from_config(cls, sensor_map, channels):
+        specs = [sensor_map.get(channel, {}) for channel in channels]
+        return cls([make_filter(spec["filter"]) if "filter" in spec else None for spec in specs],
+                   [spec.get("decimate", 1) for spec in specs])
+
+    def process(self, times, block):
+        """
+        Filter a block of samples taken at times. Returns a list of (times, values) of each
+        channel's output.
+        """
+        times = np.asarray(times, dtype=float)
+        block = np.asarray(block, dtype=float)
+        outputs = []
+        latest = self.latest.copy()
+        latest_times = self.latest_times.copy()
+        for channel, (channel_filter, factor) in enumerate(zip(self.filters, self.decimation)):
+            values = block[:, channel]
+            converted = ~np.isnan(values)
+            channel_times = times[converted]
+            values = values[converted]
+            if channel_filter is not None:
+                values = channel_filter.process(values)
+            kept = np.arange(self._phase[channel], len(values), factor)
+            out_times, out_values = channel_times[kept], values[kept]
+            if len(kept):
+                self._phase[channel] = kept[-1] + factor - len(values)
+                latest[channel] = out_values[-1]
+                latest_times[channel] = out_times[-1]
+            else:
+                self._phase[channel] -= len(values)
+            outputs.append((out_times, out_values))
+        # published whole, so readers in other threads never see a half updated sample
+        self.latest = latest
+        self.latest_times = latest_times
+        return outputs
+
+    def process_sample(self, t, sample):
+        """
+        Filter one sample taken at time t, with each filter's scalar step rather than a one row
+        block. Updates latest and latest_times as process does.
+        """
+        latest = self.latest.copy()
+        latest_times = self.latest_times.copy()
+        for channel, (channel_filter, factor) in enumerate(zip(self.filters, self.decimation)):
+            value = float(sample[channel])
+            if value != value:
+                continue
+            if channel_filter is not None:
+                value = channel_filter.step(value)
+            if self._phase[channel] <= 0:
+                self._phase[channel] = factor - 1
+                latest[channel] = value
+                latest_times[channel] = t
+            else:
+                self._phase[channel] -= 1
+        self.latest = latest
+        self.latest_times = latest_times
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque
+import logging
+logging.basicConfig(level=logging.DEBUG)
+
+try:
+    import busio
+    import board
+    ONTARGET = True
+except:
+    ONTARGET = False
+
+# Shared I2CBus of each physical interface
+_buses = {}
+_buses_lock = threading.Lock()
+DEFAULT_BUS = "SCL/SDA"
+
+
+def get_bus(i2c=None):
+    """
+    The single I2CBus shared by every driver on a physical interface. With no argument that is the
+    board's SCL/SDA bus, opened the first time it is asked for. A busio.I2C-like object, such as a
+    simulated bus, gets an I2CBus of its own which is likewise shared by everyone passing it in.
+    """
+    if isinstance(i2c, I2CBus):
+        return i2c
+    key = DEFAULT_BUS if i2c is None else id(i2c)
+    with _buses_lock:
+        if key not in _buses:
+            if i2c is None:
+                if not ONTARGET:
+                    raise RuntimeError("No I2C bus off target")
+                i2c = busio.I2C(board.SCL, board.SDA)
+            # the I2CBus keeps i2c alive, so its id is not reused while it is in _buses
+            _buses[key] = I2CBus(i2c)
+        return _buses[key]
+
+
+class BusLock:
+    """
+    Reentrant lock granted in the order it was asked for, so a thread reading continuously cannot
+    starve others of the bus.
+    """
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiters = deque()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self, blocking=True):
+        me = threading.get_ident()
+        with self._mutex:
+            if self._owner == me:
+                self._depth += 1
+                return True
+            if self._owner is None and not self._waiters:
+                self._owner = me
+                self._depth = 1
+                return True
+            if not blocking:
+                return False
+            turn = threading.Lock()
+            turn.acquire()
+            self._waiters.append((me, turn))
+        # released by the owner when it hands us the lock
+        turn.acquire()
+        return True
+
+    def release(self):
+        with self._mutex:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("Bus lock released by a thread not holding it")
+            self._depth -= 1
+            if self._depth:
+                return
+            if self._waiters:
+                self._owner, turn = self._waiters.popleft()
+                self._depth = 1
+                turn.release()
+            else:
+                self._owner = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class TransactionStats:
+    """
+    Transactions with one device address: their number, errors, and time on the bus and waiting
+    for it, in seconds.
+    """
+    __slots__ = ("transactions", "errors", "bus_time", "max_bus_time", "wait_time", "max_wait_time")
+
+    def __init__(self):
+        self.transactions = 0
+        self.errors = 0
+        self.bus_time = 0.0
+        self.max_bus_time = 0.0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def mean_bus_time(self):
+        return self.bus_time / self.transactions if self.transactions else 0.0
+
+    def __repr__(self):
+        return "{} transactions, {} errors, {:.1f} us mean, {:.1f} us max, {:.1f} us max wait".format(
+            self.transactions, self.errors, self.mean_bus_time() * 1e6, self.max_bus_time * 1e6,
+            self.max_wait_time * 1e6)
+
+
+class I2CBus:
+    """
+    An I2C interface shared by several drivers, used in place of busio.I2C. Each transaction holds
+    the bus lock, so transactions from different threads are queued rather than interleaved, and
+    is timed into stats by device address.
+
+    A driver holds device_lock(address) over a sequence of transactions which must not be
+    interleaved with others to the same device, such as starting a conversion and reading it back.
+    try_lock blocks until the bus is ours, so drivers built on adafruit_bus_device's I2CDevice
+    queue for the bus too.
+    """
+    def __init__(self, i2c):
+        self._i2c = i2c
+        self.lock = BusLock()
+        self._device_locks = {}
+        # address -> TransactionStats
+        self.stats = {}
+
+    def _stats(self, address):
+        stats = self.stats.get(address)
+        if stats is None:
+            stats = self.stats.setdefault(address, TransactionStats())
+        return stats
+
+    def _transaction(self, address, fn, *args, **kwargs):
+        stats = self._stats(address)
+        asked = time.perf_counter()
+        with self.lock:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except OSError:
+                stats.errors += 1
+                raise
+            finally:
+                end = time.perf_counter()
+                stats.transactions += 1
+                stats.bus_time += end - start
+                stats.max_bus_time = max(stats.max_bus_time, end - start)
+                stats.wait_time += start - asked
+                stats.max_wait_time = max(stats.max_wait_time, start - asked)
+
+    def device_lock(self, address):
+        lock = self._device_locks.get(address)
+        if lock is None:
+            lock = self._device_locks.setdefault(address, threading.RLock())
+        return lock
+
+    def transactions(self):
+        return sum(stats.transactions for stats in self.stats.values())
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        return self._transaction(address, self._i2c.writeto, address, buffer, start=start, end=end)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        return self._transaction(address, self._i2c.readfrom_into, address, buffer, start=start, end=end)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None, **kwargs):
+        return self._transaction(address, self._i2c.writeto_then_readfrom, address, buffer_out, buffer_in,
+                                 out_start=out_start, out_end=out_end, in_start=in_start, in_end=in_end,
+                                 **kwargs)
+
+    def scan(self):
+        with self.lock:
+            return self._i2c.scan()
+
+    def try_lock(self):
+        return self.lock.acquire()
+
+    def unlock(self):
+        self.lock.release()
+
+    def deinit(self):
+        pass
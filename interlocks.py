@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+logging.basicConfig(level=logging.DEBUG)
+from bitfield_utils import RelayState, NUM_RELAYS
+
+
+def state_index(state):
+    """
+    Index of a relay state in the interlock table, which is simply its bits. State arrays are
+    packed the same way, relay 1 being the most significant bit.
+    """
+    if isinstance(state, RelayState):
+        return state.bits
+    return RelayState.from_list(state).bits
+
+
+class InterlockTable:
+    """
+    Mutual exclusion and mutual inclusion rules compiled into a table covering every one of the
+    1024 relay states, so a state change request is validated with a single lookup. Each entry is
+    the (valid, message) tuple check_safe_update returns, with the message of the first rule the
+    state violates.
+
+    The controller falls back on the states in safe_states (the board's vent and closed states).
+    They are checked like any other state, and a warning is logged for each one the rules
+    prohibit, since the configuration then needs looking at.
+    """
+    def __init__(self, relay_map_path, prohibited_states_path, safe_states=()):
+        self.relay_map_path = relay_map_path
+        self.prohibited_states_path = prohibited_states_path
+        self.safe_states = [state_index(state) for state in safe_states]
+        self._mtimes = None
+        self.reload()
+
+    def reload(self):
+        """
+        Read the configuration files and rebuild the table.
+        """
+        self._mtimes = self._read_mtimes()
+        with open(self.relay_map_path) as relays_f:
+            relay_map = json.load(relays_f)
+        with open(self.prohibited_states_path) as states_f:
+            prohibited_states = json.load(states_f)
+
+        def bit(name):
+            return 1 << (NUM_RELAYS - 1 - relay_map[name])
+
+        # (mask, required, message): a state violates the rule if state & mask == required
+        rules = []
+        # states we know must be mutually exclusive
+        for mutex in prohibited_states["mutual_exclusions"]:
+            mask = bit(mutex[0]) | bit(mutex[1])
+            rules.append((mask, mask, "Mutual exclusion violation for {} and {}.".format(mutex[0], mutex[1])))
+        # states we know must be mutually inclusive: the second must be open if the first is
+        for mutex in prohibited_states["mutual_inclusions"]:
+            mask = bit(mutex[0]) | bit(mutex[1])
+            rules.append((mask, bit(mutex[0]), "Mutual inclusion violation for {} and {}.".format(mutex[0], mutex[1])))
+
+        valid = (True, "")
+        results = [valid] * (1 << NUM_RELAYS)
+        for mask, required, message in rules:
+            violation = (False, message)
+            for index in range(1 << NUM_RELAYS):
+                if index & mask == required and results[index] is valid:
+                    results[index] = violation
+        for index in self.safe_states:
+            if not results[index][0]:
+                logging.warning("Safe state {:010b} is prohibited. {}".format(index, results[index][1]))
+        self.rules = rules
+        self.results = results
+        logging.info("Interlock table built from {} rules".format(len(rules)))
+
+    def check(self, state, locked=0, current=None):
+        """
+        Returns (True, "") if state is permitted, else (False, reason).
+
+        locked holds the bits of relays driven by a running sequence, whose bits in state are the
+        levels the sequence commanded. A rule broken by such a relay is let through only while
+        its other relays stay as they are in current; any change to them is checked in full.
+        """
+        index = state_index(state)
+        result = self.results[index]
+        if result[0] or not locked:
+            return result
+        changed = index ^ state_index(current) if current is not None else ~0
+        for mask, required, message in self.rules:
+            if index & mask == required and not (mask & locked and not changed & mask & ~locked):
+                return (False, message)
+        return (True, "")
+
+    def reload_if_changed(self):
+        """
+        Rebuild the table if either configuration file was modified. Returns True if it was.
+        """
+        if self._read_mtimes() == self._mtimes:
+            return False
+        self.reload()
+        return True
+
+    def _read_mtimes(self):
+        return (os.stat(self.relay_map_path).st_mtime_ns, os.stat(self.prohibited_states_path).st_mtime_ns)
@@ -1,4 +1,23 @@
+import asyncio
+import logging
 import socket
+import struct
+import time
+
+# Every datagram but a heartbeat starts with this header: protocol version, sequence number and
+# the sender's time.monotonic_ns when it was sent. The codec packet follows, starting with its
+# schema id.
+PROTOCOL_VERSION = 1
+PACKET_HEADER = struct.Struct("!BIQ")
+
+
+def pack_packet(codec, msg, seq, sent_ns=None):
+    """
+    A datagram of msg, encoded by codec, with sequence number seq, as SendNode sends them.
+    """
+    if sent_ns is None:
+        sent_ns = time.monotonic_ns()
+    return PACKET_HEADER.pack(PROTOCOL_VERSION, seq, sent_ns) + codec.encode(msg)
 
 
 class SendNode:
@@ -13,6 +32,13 @@ class SendNode:
         self.target_addr = target_addr
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(bind_addr)
+        # sequence number of the last datagram sent
+        self.seq = 0
+        # reused by send, header then codec packet
+        self._buffer = bytearray(PACKET_HEADER.size + codec.max_size)
+        self._view = memoryview(self._buffer)
+        # reused by send_batch, grown to the largest batch sent
+        self._batch_buffer = bytearray(0)
 
     def shutdown(self):
         """
@@ -24,9 +50,259 @@ class SendNode:
     def send(self, msg):
         """
         We encode the argument msg, which is a list of values expected by the codec, and send it to
-        the target address which is specified in the constructor in the form of tartget_addr.
+        the target address which is specified in the constructor in the form of tartget_addr. The
+        packet is packed behind a PACKET_HEADER in a reusable buffer and sent from there without a
+        copy. Packets of a DeltaCodec vary in length, and only as much of the buffer as was packed
+        is sent.
         """
-        self.sock.sendto(self.codec.encode(msg), self.target_addr)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        PACKET_HEADER.pack_into(self._buffer, 0, PROTOCOL_VERSION, self.seq, time.monotonic_ns())
+        packet = self.codec.encode_into(msg, self._buffer, PACKET_HEADER.size)
+        self.sock.sendto(self._view[:PACKET_HEADER.size + len(packet)], self.target_addr)
+
+    def send_batch(self, batch_codec, times_ns, values):
+        """
+        Send samples, times_ns one per sample and values a row per sample, in as few datagrams of
+        batch_codec as they fit in, each with its own header. Returns the number of datagrams sent.
+        """
+        size = PACKET_HEADER.size + batch_codec.size(batch_codec.max_samples)
+        if len(self._batch_buffer) < size:
+            self._batch_buffer = bytearray(size)
+        view = memoryview(self._batch_buffer)
+        sent = 0
+        for start in range(0, len(times_ns), batch_codec.max_samples):
+            end = start + batch_codec.max_samples
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            PACKET_HEADER.pack_into(self._batch_buffer, 0, PROTOCOL_VERSION, self.seq, time.monotonic_ns())
+            nbytes = batch_codec.encode_into(times_ns[start:end], values[start:end], self._batch_buffer,
+                                             PACKET_HEADER.size)
+            self.sock.sendto(view[:PACKET_HEADER.size + nbytes], self.target_addr)
+            sent += 1
+        return sent
+
+
+# Longest a datagram is expected to be held up behind a later one. An older datagram than this
+# is from a sender which has restarted rather than a late one.
+REORDER_LIMIT_NS = 1000000000
+
+
+class SequenceTracker:
+    """
+    Counts lost, duplicated and reordered datagrams from their sequence numbers, which wrap at 32
+    bits. A datagram arriving after a later one fills the gap it left, so gaps counts those still
+    missing. The last `window` sequence numbers are remembered to tell late datagrams from
+    duplicates.
+
+    A sender which restarts starts its sequence numbers again. A datagram behind the highest seen
+    but sent after the newest one, or long before it, or further behind than the window, is from
+    a restarted sender: the tracker starts again from it rather than drop its datagrams as
+    duplicates.
+    """
+    def __init__(self, window=64):
+        self.window = window
+        self.received = 0
+        self.gaps = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.restarts = 0
+        # highest sequence number seen, and a bit per sequence number below it that has been seen
+        self.highest = None
+        self._seen = 0
+        # sender's time.monotonic_ns of the newest datagram
+        self.last_sent_ns = None
+
+    def update(self, seq, sent_ns=None):
+        """
+        Record a datagram. Returns False if it is a duplicate, which should be dropped.
+        """
+        if self.highest is None:
+            self.highest = seq
+            self.received += 1
+            self.last_sent_ns = sent_ns
+            return True
+        # distance ahead of the highest, as a signed 32 bit difference
+        ahead = ((seq - self.highest + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        if ahead <= 0 and self._restarted(ahead, sent_ns):
+            logging.warning(f"Sequence restarted at {seq} after {self.highest}")
+            self.restarts += 1
+            self.highest = seq
+            self._seen = 0
+            self.last_sent_ns = sent_ns
+            self.received += 1
+            return True
+        if ahead > 0:
+            self.gaps += ahead - 1
+            self._seen = ((self._seen << ahead) | (1 << (ahead - 1))) & ((1 << self.window) - 1)
+            self.highest = seq
+            self.last_sent_ns = sent_ns
+        elif ahead == 0:
+            self.duplicates += 1
+            return False
+        else:
+            bit = 1 << (-ahead - 1)
+            if self._seen & bit:
+                self.duplicates += 1
+                return False
+            self._seen |= bit
+            self.gaps -= 1
+            self.reordered += 1
+        self.received += 1
+        return True
+
+    def _restarted(self, ahead, sent_ns):
+        if -ahead > self.window:
+            return True
+        if sent_ns is None or self.last_sent_ns is None:
+            return False
+        return sent_ns > self.last_sent_ns or sent_ns < self.last_sent_ns - REORDER_LIMIT_NS
+
+    def loss(self):
+        """
+        Fraction of datagrams sent which are missing.
+        """
+        total = self.received + self.gaps
+        return self.gaps / total if total else 0.0
+
+    def __repr__(self):
+        return "{} received, {} missing ({:.1%}), {} duplicated, {} reordered, {} restarts".format(
+            self.received, self.gaps, self.loss(), self.duplicates, self.reordered, self.restarts)
+
+
+# Suffixes of command channels which request a one-off action. Every other channel describes a
+# level (a relay state or an arm flag) where only the newest value matters.
+EDGE_CHANNELS = ("_fire", "_pulse")
+
+
+def is_edge_command(command):
+    """
+    True if the command requests a one-off action: a fire, or a pulse of a valve (pulse >= 0).
+    """
+    for channel, value in command.items():
+        if channel.endswith("_fire") and value:
+            return True
+        if channel.endswith("_pulse") and value >= 0:
+            return True
+    return False
+
+
+def coalesce(commands):
+    """
+    Collapse a burst of commands, oldest first. Level channels are last-writer-wins, so a command
+    without an edge is overtaken by the next one, unless an edge-triggered command follows it: the
+    edge must see the levels that preceded it. Returns a tuple of (commands to apply in order,
+    number of commands coalesced away).
+    """
+    edges = [is_edge_command(command) for command in commands]
+    kept = [command for i, command in enumerate(commands)
+            if edges[i] or i == len(commands) - 1 or edges[i + 1]]
+    return (kept, len(commands) - len(kept))
+
+
+# Heartbeats share the command socket with codec packets and are told apart by a 4 byte tag. A
+# PING is echoed back by the far end with the tag swapped to PONG and the rest left untouched.
+HEARTBEAT = struct.Struct("!4sIQ")
+HEARTBEAT_PING = b"PING"
+HEARTBEAT_PONG = b"PONG"
+
+
+class LinkMonitor:
+    """
+    LinkMonitor builds heartbeat packets and times their echoes on the monotonic clock. A ping
+    that has not been echoed within timeout seconds is counted as lost.
+    """
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.seq = 0
+        self.sent = 0
+        self.received = 0
+        self.lost = 0
+        self.rtt = None
+        self.rtt_avg = None
+        self.rtt_max = 0.0
+        # the link is assumed good at start up so the fallback timers start from now
+        self.last_echo = time.monotonic()
+        self._outstanding = {}
+
+    def ping(self):
+        """
+        Returns the next heartbeat packet to send.
+        """
+        now = time.monotonic_ns()
+        self._expire(now)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self._outstanding[self.seq] = now
+        self.sent += 1
+        return HEARTBEAT.pack(HEARTBEAT_PING, self.seq, now)
+
+    def echo(self, seq, sent_ns):
+        """
+        Record the echo of one of our pings. Late or duplicate echoes are ignored.
+        """
+        if self._outstanding.pop(seq, None) is None:
+            return
+        now = time.monotonic_ns()
+        self.rtt = (now - sent_ns) / 1e9
+        self.rtt_avg = self.rtt if self.rtt_avg is None else self.rtt_avg * .875 + self.rtt * .125
+        self.rtt_max = max(self.rtt_max, self.rtt)
+        self.received += 1
+        self.last_echo = now / 1e9
+
+    def since_last_echo(self):
+        """
+        Seconds since the last echo was received.
+        """
+        return time.monotonic() - self.last_echo
+
+    def loss(self):
+        """
+        Fraction of completed pings which were lost.
+        """
+        done = self.received + self.lost
+        return self.lost / done if done else 0.0
+
+    def _expire(self, now):
+        deadline = now - int(self.timeout * 1e9)
+        for seq in [seq for seq, sent_ns in self._outstanding.items() if sent_ns < deadline]:
+            del self._outstanding[seq]
+            self.lost += 1
+
+
+class CommandProtocol(asyncio.DatagramProtocol):
+    """
+    CommandProtocol hands datagrams received by a ReceiveNode to a callback as soon as the event
+    loop sees them, instead of waiting for the next poll. The transport reads a single datagram
+    each time the socket is ready, so the first one schedules a flush which drains the rest of the
+    socket with receive_all(). Everything queued by then is delivered together as one list of
+    (command, addr) tuples.
+    """
+    def __init__(self, node, callback, loop):
+        self.node = node
+        self.callback = callback
+        self.loop = loop
+        self.pending = []
+
+    def datagram_received(self, data, addr):
+        if self.node.handle_heartbeat(data, addr):
+            return
+        try:
+            command = self.node.unpack(data)
+        except Exception:
+            logging.error("Dropping malformed command from " + str(addr))
+            return
+        if command is None:
+            return
+        if not self.pending:
+            self.loop.call_soon(self.flush)
+        self.pending.append((command, addr))
+
+    def flush(self):
+        received, self.pending = self.pending, []
+        received += self.node.receive_all()
+        self.callback(received)
+        self.node.recycle()
+
+    def error_received(self, exc):
+        logging.error("Command socket error: " + str(exc))
 
 
 class ReceiveNode:
@@ -41,6 +317,15 @@ class ReceiveNode:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(bind_addr)
         self.sock.setblocking(0)
+        # reused by receive_all so draining a burst does not allocate a buffer per datagram
+        self._buffer = bytearray(1024)
+        self._view = memoryview(self._buffer)
+        # records the commands are decoded into, the first _taken of them handed out since recycle()
+        self._records = []
+        self._taken = 0
+        self.link = LinkMonitor()
+        # loss, duplication and reordering of the datagrams received
+        self.sequence = SequenceTracker()
 
     def shutdown(self):
         """
@@ -54,13 +339,97 @@ class ReceiveNode:
         Returns a tuple containing a list of data as defined in the codec and the source address.
         None is returned if there is no data.
         """
-        print("receiving")
         try:
-            print("pre check")
             data, server = self.sock.recvfrom(1024)
-            # print(data)
-            print("working")
         except socket.error:
-            print("not working")
             return (None, None)
-        return (self.codec.decode(data), server)
+        if self.handle_heartbeat(data, server):
+            return (None, None)
+        return (self.unpack(data, self.codec.record()), server)
+
+    def receive_all(self):
+        """
+        Drain every datagram waiting on the socket in one pass. Returns a list of (command, addr)
+        tuples, oldest first, which is empty if there is no data. The commands are records reused
+        after the next recycle(), so call it once they have been handled.
+        """
+        received = []
+        while True:
+            try:
+                nbytes, server = self.sock.recvfrom_into(self._buffer)
+            except socket.error:
+                return received
+            if self.handle_heartbeat(self._view[:nbytes], server):
+                continue
+            try:
+                command = self.unpack(self._view[:nbytes])
+            except Exception:
+                logging.error("Dropping malformed command from " + str(server))
+                continue
+            if command is not None:
+                received.append((command, server))
+
+    def unpack(self, data, record=None):
+        """
+        Decode a datagram's header and packet, recording its sequence number, into record or else
+        the next of the node's records. Returns None for a duplicate. Raises ValueError for another
+        protocol version or schema.
+        """
+        version, seq, sent_ns = PACKET_HEADER.unpack_from(data)
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"Protocol version {version} is not {PROTOCOL_VERSION}")
+        pooled = record is None
+        if pooled:
+            if self._taken == len(self._records):
+                self._records.append(self.codec.record())
+            record = self._records[self._taken]
+        command = self.codec.decode_into(data, record, PACKET_HEADER.size)
+        if not self.sequence.update(seq, sent_ns):
+            logging.warning(f"Dropping duplicate datagram {seq}")
+            return None
+        self._taken += pooled
+        return command
+
+    def recycle(self):
+        """
+        Reuse the records of every command received so far, once they have been handled.
+        """
+        self._taken = 0
+
+    def listen(self, loop, callback):
+        """
+        Switch to event-driven mode. Returns a coroutine which registers the socket with the event
+        loop so callback(received) runs as soon as datagrams arrive, with received in the same form
+        as receive_all() returns. Once listening, the receive methods should no longer be polled
+        since the protocol drains the socket itself.
+        """
+        return loop.create_datagram_endpoint(lambda: CommandProtocol(self, callback, loop), sock=self.sock)
+
+    def heartbeat(self, target_addr):
+        """
+        Send a heartbeat to target_addr. Its echo comes back to this socket and is timed by
+        self.link. Never blocks; a ping which cannot be sent is simply counted as lost later.
+        """
+        try:
+            self.sock.sendto(self.link.ping(), target_addr)
+        except socket.error:
+            pass
+
+    def handle_heartbeat(self, data, addr):
+        """
+        Returns True if data was a heartbeat rather than a command. Pings from the far end are
+        echoed straight back and echoes of our own pings are recorded.
+        """
+        if len(data) != HEARTBEAT.size:
+            return False
+        tag, seq, sent_ns = HEARTBEAT.unpack(data)
+        if tag == HEARTBEAT_PING:
+            try:
+                self.sock.sendto(HEARTBEAT.pack(HEARTBEAT_PONG, seq, sent_ns), addr)
+            except socket.error:
+                pass
+            return True
+        if tag == HEARTBEAT_PONG:
+            self.link.echo(seq, sent_ns)
+            return True
+        return False
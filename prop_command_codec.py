@@ -1,23 +1,13 @@
 """
-Codec format for commands.
+The codec format for propulsion commands, compiled from the "p" block of command_config in gse_master.json.
 """
-
 from codec import Codec
-from collections import OrderedDict
+from schema_registry import get_registry
 
 # Map of all channel names to data types. For more info see:
 # https://docs.python.org/3/library/struct.html#struct-format-strings
-# h = short
-# ? = _Bool
-msg_schema = OrderedDict([
-    ("pc_state", "h"),
-    ("pc_soft_armed", "?"),
-    ("pc_fire", "?"),
-    ("pc_redlines_armed", "?"),
-    ("pc_pulse", "i"),
-    ("pc_pdelay", "i")
-])
+msg_schema = get_registry().codec("command", "p").msg_schema
 
 class PropCommandCodec(Codec):
     def __init__(self):
-        super(PropCommandCodec, self).__init__(msg_schema)
\ No newline at end of file
+        super(PropCommandCodec, self).__init__(msg_schema, get_registry().codec("command", "p").schema_id)
@@ -3,6 +3,7 @@ import json
 import logging
 logging.basicConfig(level=logging.DEBUG)
 from sarp_utils.bitfield_utils import Utils
+from interlocks import InterlockTable
 
 
 class Relays:
@@ -27,6 +28,8 @@ class Relays:
             # GPIO.output(pin, GPIO.LOW)
         self._state = self.CLOSED_STATE
         self._requested_state = self._state.copy()
+        self.interlocks = InterlockTable("relay_map.json", "prohibited_states.json",
+                                         safe_states=(self.SAFE_STATE, self.CLOSED_STATE))
         """
         SCR_tag tracks what triggered latest state change request. Meaning of each SCR_tag value:
         000 - Current state is that of the request from the user
@@ -117,18 +120,4 @@ class Relays:
         """
         Make sure we are not entering a prohibited state according to configuration files.
         """
-        # initialize dicitionaries that will hold json file contents and read them in
-        relay_map = {}
-        prohibited_states = {}
-        with open("relay_map.json") as relays_f:
-            relay_map = json.load(relays_f)
-
-        with open("prohibited_states.json") as states_f:
-            prohibited_states = json.load(states_f)
-
-        # check for states we know must be mutually exclusive
-        for mutex in prohibited_states["mutual_exclusions"]:
-            if (self._requested_state[relay_map[mutex[0]]] & self._requested_state[relay_map[mutex[1]]]):
-                return (False, "Mutual exclusion violation for {} and {}.".format(mutex[0], mutex[1]))
-
-        return (True, "")
+        return self.interlocks.check(self._requested_state)
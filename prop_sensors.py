@@ -2,6 +2,8 @@ import logging
 logging.basicConfig(level=logging.DEBUG)
 
 from ads1115 import ADS1115
+from sensor_board import SensorBoard
+import time
 try:
     #from gpiozero import CPUTemperature
     from ads1115 import ADS1115
@@ -10,38 +12,34 @@ except:
     print("PROP ADC not imported")
     ONTARGET = False
 
-ADC_GAIN = 4
+# +/-6.144 V full scale, the only range covering the PTs' 0.5-4.5 V output
+ADC_GAIN = 2/3
 ADC_SAMPLE_RATE = 20
+# conversions run at the ADS1115's fastest rate, so a sweep takes as little of each period as it can
+ADC_DATA_RATE = 860
 
-class PropSensors:
-    def __init__(self, pt_scale):
-        self.adc = []
-        self.PT_scaling = pt_scale
+class PropSensors(SensorBoard):
+    def __init__(self, pt_scale, calibration=None):
+        super().__init__(pt_scale, calibration, ADC_DATA_RATE, "prop_acquisition")
+        # seconds between reads of the CPU temperature; it barely changes
+        self.cpu_period = 0
+        self._cpu_temp = 0
+        self._cpu_read_at = None
         if (ONTARGET):
             self.cpu = {"temperature": 0} #CPUTemperature()
-            self.adc.append(ADS1115(gain=ADC_GAIN, addr=0x48))
-            self.adc.append(ADS1115(gain=ADC_GAIN, addr=0x49))
+            self.set_adcs([ADS1115(gain=ADC_GAIN, addr=0x48, data_rate=ADC_DATA_RATE),
+                           ADS1115(gain=ADC_GAIN, addr=0x49, data_rate=ADC_DATA_RATE)])
 
     def get_cpu_temp(self):
         if (ONTARGET):
-            return self.cpu["temperature"]
+            now = time.monotonic()
+            if self._cpu_read_at is None or now - self._cpu_read_at >= self.cpu_period:
+                self._cpu_temp = self.cpu["temperature"]
+                self._cpu_read_at = now
+            return self._cpu_temp
         else:
             return 0
 
-    def get_adc_readings(self):
-        readings = []
-        if (ONTARGET):
-            for num, adc in enumerate(self.adc):
-                for channel in range(0, 4):
-                    # 4 pts with max 1k psi
-                    readings.append(adc.read_pressure(channel, max_p=self.PT_scaling[num * 4 + channel]))
-        else:
-            readings = [0, 0, 0, 0, 0, 0, 0, 0]
-            #for adc in self.adc:
-            #      for channel in range(0, 4):
-            #        readings.append(0)
-        return readings
-
     def get_hard_armed(self):
         return False
 
@@ -49,7 +47,7 @@ class PropSensors:
         """
         Send the cpu temp and each of the adc readings over telemetry.
         """
-        readings = self.get_adc_readings()
+        readings = self.get_latest_readings()
         telemObject = {
             "pc_cpu_temp": self.get_cpu_temp(),
             "pc_adc1_c1" : readings[0],
@@ -62,6 +60,5 @@ class PropSensors:
             "pc_adc2_c4" : readings[7],
             "pc_hard_armed" : True #self.get_hard_armed()
         }
-        print(telemObject)
 
         return telemObject
@@ -0,0 +1,87 @@
+import logging
+import numpy as np
+logging.basicConfig(level=logging.DEBUG)
+
+# SCR tag of a redline-commanded state
+REDLINE_TAG = 0b010
+
+
+class RedlineEngine:
+    """
+    Redline rules compiled from config into arrays, so every rule is evaluated at once against each
+    PT sample. A rule looks like:
+
+    {"channel": "pc_adc1_c1", "max": 900, "min": 10, "hysteresis": 25, "persistence": 3,
+     "max_rate": 2000, "action": "vent"}
+
+    min and max are optional limits. Once tripped a rule stays tripped until the value is back
+    inside its limits by more than hysteresis. persistence is the number of consecutive conversions
+    out of limits before the rule trips, and max_rate is an optional limit on the rate of change
+    per second. action names the safe state to command, "vent" or "closed".
+    """
+    def __init__(self, rules, channels):
+        """
+        channels is the list of channel names in the order readings are given in.
+        """
+        self.rules = rules
+        self.channels = np.array([channels.index(rule["channel"]) for rule in rules], dtype=np.intp)
+        self.low = np.array([rule.get("min", -np.inf) for rule in rules], dtype=float)
+        self.high = np.array([rule.get("max", np.inf) for rule in rules], dtype=float)
+        self.hysteresis = np.array([rule.get("hysteresis", 0) for rule in rules], dtype=float)
+        self.persistence = np.array([rule.get("persistence", 1) for rule in rules], dtype=np.int64)
+        self.max_rate = np.array([rule.get("max_rate", np.inf) for rule in rules], dtype=float)
+        self.actions = [rule.get("action", "vent") for rule in rules]
+        self.reset()
+
+    def reset(self):
+        self.counts = np.zeros(len(self.rules), dtype=np.int64)
+        self.tripped = np.zeros(len(self.rules), dtype=bool)
+        self.trips = 0
+        # each rule's channel value and conversion time as of its last rate check, and the result
+        self._last_values = np.full(len(self.rules), np.nan)
+        self._last_t = np.full(len(self.rules), np.nan)
+        self._too_fast = np.zeros(len(self.rules), dtype=bool)
+
+    def evaluate(self, readings, t, times=None):
+        """
+        Evaluate every rule against one sample of readings taken at monotonic time t. times, if
+        given, is the monotonic time each reading was converted, for channels converted less often
+        than they are sampled. Their rate of change is taken between conversions, and a reading
+        held from an earlier conversion keeps the rate verdict of that conversion and does not
+        count towards persistence. Returns the
+        indices of the rules which tripped on this sample.
+        """
+        values = np.asarray(readings, dtype=float)[self.channels]
+        converted_t = t if times is None else np.asarray(times, dtype=float)[self.channels]
+        # a tripped rule only clears once its value is back inside the limits by the hysteresis
+        margin = np.where(self.tripped, self.hysteresis, 0.0)
+        out = (values > self.high - margin) | (values < self.low + margin)
+        # NaN times, before a channel's first conversion, compare False
+        dt = converted_t - self._last_t
+        new = dt > 0
+        # held readings give 0 * inf for rules without a max_rate, which are not used
+        with np.errstate(invalid="ignore"):
+            np.copyto(self._too_fast, np.abs(values - self._last_values) > self.max_rate * dt, where=new)
+        out |= self._too_fast
+        new |= np.isnan(self._last_t)
+        np.copyto(self._last_values, values, where=new)
+        np.copyto(self._last_t, converted_t, where=new)
+        # persistence counts conversions, so a held reading neither adds to nor resets the count
+        np.copyto(self.counts, np.where(out, self.counts + 1, 0), where=new)
+        tripping = out & (self.counts >= self.persistence)
+        new_trips = np.flatnonzero(tripping & ~self.tripped)
+        self.tripped = out & (self.tripped | tripping)
+        self.trips += len(new_trips)
+        return new_trips
+
+    def active(self):
+        """
+        Returns the indices of the rules which are tripped now, whether or not they tripped on
+        the last sample.
+        """
+        return np.flatnonzero(self.tripped)
+
+    def describe(self, idx):
+        rule = self.rules[idx]
+        return "Redline '{}' tripped on {} (min {}, max {}, max rate {})".format(
+            rule.get("name", idx), rule["channel"], rule.get("min"), rule.get("max"), rule.get("max_rate"))
@@ -2,29 +2,39 @@ import time
 import json
 import logging
 logging.basicConfig(level=logging.DEBUG)
-from bitfield_utils import Utils
+from bitfield_utils import Utils, RelayState, NUM_RELAYS
+from interlocks import InterlockTable
 import pdb
 
 class Relays:
     """
     Relay state management class. Here we handle logic for requested commands. States are
-    represented using an array of 10 integers. 0 means the relays IS NOT powered and 1 means it IS
-    powered. Relays are read from left to right, so it would look something along the lines of:
+    represented using a RelayState, 10 bits of an int. 0 means the relays IS NOT powered and 1 means
+    it IS powered. Relays are read from left to right (most significant bit first), so it would
+    look something along the lines of:
      1   2   3   4   5   6   7   8   9   10
     [__, __, __, __, __, __, __, __, __, __]
     """
 
     GPIO_MAPPING = [13, 6, 5, 11, 9, 10, 22, 27, 17, 4]
 
-    def __init__(self, GPIO):
+    def __init__(self, GPIO, control=None, config_dir="/home/pi/controller/"):
         # vent and closed state are both variable to the board it is on
         # vent state - all valves unpowered
         global VENT_STATE
         # closed state - all valves closed
         global CLOSED_STATE
-        self._control = open("/home/pi/controller/control.txt", "r").read()[0:4]
+        if control is None:
+            control = open(config_dir + "control.txt", "r").read()
+        self._control = control[0:4]
         self._armed = True
-        self._inj = False
+        # bits of the relays currently driven by a sequence, which state requests leave alone
+        self._locked = 0
+        # GPIO pins of the relays set in each of the 1024 possible bitmasks
+        self._pins = [tuple(pin for idx, pin in enumerate(self.GPIO_MAPPING) if RelayState(mask)[idx])
+                      for mask in range(1 << NUM_RELAYS)]
+        # (pins, levels) written for each (changed, rising) pair of bitmasks, built on first use
+        self._writes = {}
         for pin in self.GPIO_MAPPING:
             GPIO.setup(pin, GPIO.OUT)
             GPIO.output(pin, GPIO.LOW)
@@ -32,16 +42,21 @@ class Relays:
         request = []
         # for default state, fill is set to venting state
         if self._control == "fill":
-            VENT_STATE = [0, 0, 0, 0, 0, 1, 0, 1, 1, 0]
-            CLOSED_STATE = [1, 1, 1, 1, 1, 0, 1, 0, 0, 0]
-            self._state = VENT_STATE
+            VENT_STATE = RelayState.from_list([0, 0, 0, 0, 0, 1, 0, 1, 1, 0])
+            CLOSED_STATE = RelayState.from_list([1, 1, 1, 1, 1, 0, 1, 0, 0, 0])
+            self._state = VENT_STATE.copy()
             request = CLOSED_STATE
         else:
-            VENT_STATE = [0, 0, 1, 0, 1, 0, 0, 0, 0, 0]
-            CLOSED_STATE = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            self._state = VENT_STATE
+            VENT_STATE = RelayState.from_list([0, 0, 1, 0, 1, 0, 0, 0, 0, 0])
+            CLOSED_STATE = RelayState.from_list([0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+            self._state = VENT_STATE.copy()
             request = CLOSED_STATE
 
+        # prohibited states are compiled once here, and again whenever the files change
+        self.interlocks = InterlockTable(config_dir + self._control + "_relay_map.json",
+                                         config_dir + self._control + "_prohibited_states.json",
+                                         safe_states=(VENT_STATE, CLOSED_STATE))
+        self._requested_state = self._state.copy()
         self.request_state(request, 0)
         self.update(GPIO)
         self._armed = False
@@ -77,12 +92,16 @@ class Relays:
     def get_state(self):
         return self._state
 
+    def safe_state(self, name):
+        """
+        The board's "vent" or "closed" state.
+        """
+        return VENT_STATE if name == "vent" else CLOSED_STATE
+
     def get_telemetry(self):
-        # Convert bit array of states into number
+        # Convert relay state into number
         states = Utils.num(self._state)
 
-        print("Relay state: ", self._state)
-
         telemObject = {
             f"{self._control[0]}c_soft_armed" : self.is_armed(),
             f"{self._control[0]}c_state": states,
@@ -91,113 +110,39 @@ class Relays:
         return telemObject
 
     def request_state(self, request, tag):
-        self._requested_state = request.copy()
+        if not isinstance(request, RelayState):
+            request = RelayState.from_list(request)
+        # relays owned by a running sequence keep their current state
+        self._requested_state.bits = (request.bits & ~self._locked) | (self._state.bits & self._locked)
         self._SCR_tag = tag
 
-    def INITIATE_FIRE_SEQUENCE(self, GPIO):
-            # Oxygen Main Valve (OMV): 5
-            # Fuel Main Valve (FMV): 6
-            # Oxygen Purge Valve (OPV): 7
-            # Helium Bottle Valve (HBV: 8
-            prop = self.GPIO_MAPPING
-
-            if self._inj:
-                GPIO.output(prop[5], GPIO.LOW)
-                time.sleep(0.02)
-                GPIO.output(prop[6], GPIO.LOW)
-                self._inj = False
-                return
-
-            if not self._armed:
-                return
-
-            # Step 1: Fire button clicked- Power ignitor
-            GPIO.output(prop["igniter"], GPIO.HIGH)
-            time.sleep(3.5)
-
-            # Step 2: Open OMV (Ox Main Valve)
-            GPIO.output(prop[5], GPIO.HIGH)
-
-            # Step 3: Delay 65 ms
-            time.sleep(0.065)
-
-            # Step 4: Open FMV (Fuel Main Valve)
-            GPIO.output(prop[6], GPIO.HIGH)
-
-            # Step 5: Delay 14.5 s (combustion duration)
-            time.sleep(14.5)
-
-            # Step 6: Open OPV (Ox Purge Valve)
-            GPIO.output(prop[7], GPIO.HIGH)
-
-            # Step 7: Delay 30 s (purge time)
-            time.sleep(30)
-
-            # Step 8: Close OPV
-            GPIO.output(prop[7], GPIO.LOW)
-
-            # Step 9: Close HBV (Helium Blowdown Valve)
-            GPIO.output(prop[8], GPIO.LOW)
-
-            # Step 10: Delay 30 s
-            time.sleep(30)
-
-            # Step 11: Close OMV
-            GPIO.output(prop[5], GPIO.LOW)
-
-            # Step 12: Close FMV
-            GPIO.output(prop[6], GPIO.LOW)
-
-            # Final: Power off ignitor
-            GPIO.output(prop["igniter"], GPIO.LOW)
-        
-    def INITIATE_FIRE_SEQUENCE_OLD(self, GPIO):
-        if (self._inj):
-            GPIO.output(self.GPIO_MAPPING[5], GPIO.LOW)
-            time.sleep(0.02)
-            GPIO.output(self.GPIO_MAPPING[6], GPIO.LOW)
-            self._inj = False
-            return
-
-        if (self._armed):
-            #self._inj = True
-            # power ignitor
-            GPIO.output(self.GPIO_MAPPING[0], GPIO.HIGH)
-            # delay 2000 ms
-            time.sleep(3.5)
-            # open solenoid (injector)
-            GPIO.output(self.GPIO_MAPPING[5], GPIO.HIGH)  # OX
-            time.sleep(0.0055) # NOTE: NEED TO ENSURE 65 ms DELAY HERE
-            GPIO.output(self.GPIO_MAPPING[6], GPIO.HIGH)  # FUEL
-            # delay 30 ms
-            #time.sleep(0.5)
-            # close solenoid (injector)
-            time.sleep(8.5)
-            GPIO.output(self.GPIO_MAPPING[5], GPIO.LOW)
-            GPIO.output(self.GPIO_MAPPING[6], GPIO.LOW)
-            # delay 5 seconds before we power off the ignitor
-            GPIO.output(self.GPIO_MAPPING[0], GPIO.LOW)
-        return
+    def set_locked(self, relays):
+        """
+        Set the relay indices driven by sequences, which state change requests leave alone.
+        """
+        self._locked = 0
+        for idx in relays:
+            self._locked |= 1 << (NUM_RELAYS - 1 - idx)
 
-    def PULSE_VALVE(self, GPIO, valve, delay):
-        # flip requested valve
-        self._requested_state[valve] = 0 if self._requested_state[valve] == 1 else 1
-        self.update(GPIO)
-        # valve delay
-        time.sleep(delay/1000)
-        # flip to previous state
-        self._requested_state[valve] = 0 if self._requested_state[valve] == 1 else 1
-        self.update(GPIO)
+    def check_relay(self, idx, level):
+        """
+        Check the current state with the relay at idx set to level against the interlocks, as
+        check_safe_update does for a state change request.
+        """
+        state = self._state.copy()
+        state[idx] = level
+        return self.interlocks.check(state, self._locked, self._state)
 
-    def SET_VENT_STATE(self, GPIO, tag):
+    def set_relay(self, GPIO, idx, level, tag=None):
         """
-        Set to relays to safe state and update SCR tag with given tag.
+        Drive a single relay immediately, bypassing the state change request. Used by sequences
+        which are already vetted. tag, if given, replaces the SCR tag.
         """
-        self.request_state(VENT_STATE, tag)
-        self.update(GPIO)
-        time.sleep(0.5)
-        self._requested_state[1] = not self._requested_state[1]
-        self.update(GPIO)
+        GPIO.output(self.GPIO_MAPPING[idx], GPIO.HIGH if level else GPIO.LOW)
+        self._state[idx] = level
+        self._requested_state[idx] = level
+        if tag is not None:
+            self._SCR_tag = tag
 
     def SET_CLOSED_STATE(self, GPIO, tag):
         """
@@ -209,58 +154,31 @@ class Relays:
     def update(self, GPIO):
         """
         Update current relays states upon a change to _requested_state. We only update the state if
-        the change is valid and when the relays are armed.
+        the change is valid. Only the pins that changed are written, in a single GPIO call with a
+        level per pin, so pins switching on and off change together rather than in two calls.
         """
-        if (self._requested_state != self._state):
-            if (True):
-                update_validity = self.check_safe_update()
-                print("Validity: ", update_validity[0])
-                if update_validity[0]:
-                    for idx, relay_state in enumerate(self._requested_state):
-                        print()
-                        print("Requested state: ", self._requested_state)
-                        print("Relay state: ", relay_state)
-                        print()
-                        if relay_state == 1:
-                            GPIO.output(self.GPIO_MAPPING[idx], GPIO.HIGH)
-                        else:
-                            GPIO.output(self.GPIO_MAPPING[idx], GPIO.LOW)
-                    self._state = self._requested_state.copy()
-                    logging.info("SCR by '" + str(self._SCR_tag) + "' approved to " + str(self._state))
-                else:
-                    self._requested_state = self._state.copy()
-                    logging.info("INVALID STATE REQUEST, ignoring request." + update_validity[1])
+        requested = self._requested_state.bits
+        changed = requested ^ self._state.bits
+        if changed:
+            update_validity = self.check_safe_update()
+            if update_validity[0]:
+                rising = changed & requested
+                write = self._writes.get((changed, rising))
+                if write is None:
+                    write = (self._pins[changed], tuple(GPIO.HIGH if pin in self._pins[rising] else GPIO.LOW
+                                                        for pin in self._pins[changed]))
+                    self._writes[(changed, rising)] = write
+                GPIO.output(*write)
+                self._state.bits = requested
+                logging.info("SCR by '%s' approved to %s", self._SCR_tag, self._state)
             else:
-                print(self._requested_state)
-                self._requested_state = self._state.copy()
-                self._SCR_tag = 1
-                logging.info("DISARMED, ignoring SCR.")
+                self._requested_state.bits = self._state.bits
+                logging.info("INVALID STATE REQUEST, ignoring request.%s", update_validity[1])
 
     def check_safe_update(self):
         """
-        Make sure we are not entering a prohibited state according to configuration files.
-        """
-        # initialize dicitionaries that will hold json file contents and read them in
-        """
-        relay_map = {}
-        prohibited_states = {}
-        with open("/home/pi/controller/" + self._control + "_relay_map.json") as relays_f:
-            relay_map = json.load(relays_f)
-
-        with open(f"/home/pi/controller/{self._control}_prohibited_states.json") as states_f:
-            prohibited_states = json.load(states_f)
-
-        # check for states we know must be mutually exclusive
-        for mutex in prohibited_states["mutual_exclusions"]:
-            if (self._requested_state[relay_map[mutex[0]]] & self._requested_state[relay_map[mutex[1]]]):
-                return (False, "Mutual exclusion violation for {} and {}.".format(mutex[0], mutex[1]))
-
-         # check for states we know must be mutually inclusive
-        for mutex in prohibited_states["mutual_inclusions"]:
-            if (self._requested_state[relay_map[mutex[0]]]):
-                # if relay with mutual inclusion req requested open
-                if (self._requested_state[relay_map[mutex[0]]] != self._requested_state[relay_map[mutex[1]]]):
-                  # mutual inclusion requirement not met
-                  return (False, "Mutual inclusion violation for {} and {}.".format(mutex[0], mutex[1]))
+        Make sure we are not entering a prohibited state according to configuration files. Relays
+        driven by a running sequence keep the state the sequence gave them, so only changes to the
+        other relays of a rule they break are refused.
         """
-        return (True, "")
+        return self.interlocks.check(self._requested_state, self._locked, self._state)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+logging.basicConfig(level=logging.DEBUG)
+
+# What a periodic task does after overrunning one or more of its deadlines:
+# skip - drop the missed runs and wait for the next deadline still in the future
+# catch_up - run back to back until the missed runs are made up, at most MAX_CATCH_UP of them
+SKIP = "skip"
+CATCH_UP = "catch_up"
+MAX_CATCH_UP = 5
+# seconds between overrun warnings for a task
+OVERRUN_LOG_PERIOD = 1
+
+
+class PeriodicTask:
+    """
+    A function run at a fixed rate. fn may be a plain function or a coroutine function.
+    """
+    def __init__(self, name, rate_hz, fn, policy=SKIP):
+        if policy not in (SKIP, CATCH_UP):
+            raise ValueError(f"Unknown overrun policy '{policy}'")
+        self.name = name
+        self.period = 1 / rate_hz
+        self.fn = fn
+        self.policy = policy
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        # longest a run started after its deadline, in seconds
+        self.max_lateness = 0.0
+        self._last_warning = None
+
+
+class Scheduler:
+    """
+    Runs periodic tasks against absolute deadlines on the event loop's monotonic clock. The time a
+    task takes does not add to its period and lateness does not accumulate into drift. A run that
+    finishes after its next deadline is an overrun and is handled by the task's policy.
+    """
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, name, rate_hz, fn, policy=SKIP):
+        task = PeriodicTask(name, rate_hz, fn, policy)
+        self.tasks.append(task)
+        return task
+
+    def add_from_config(self, name, config, fn):
+        """
+        Add a task configured by a dict such as {"rate_hz": 50, "policy": "skip"}.
+        """
+        return self.add(name, config["rate_hz"], fn, config.get("policy", SKIP))
+
+    def start(self, loop):
+        return [loop.create_task(self._run(task)) for task in self.tasks]
+
+    async def _run(self, task):
+        loop = asyncio.get_event_loop()
+        deadline = loop.time()
+        while True:
+            task.max_lateness = max(task.max_lateness, loop.time() - deadline)
+            result = task.fn()
+            if asyncio.iscoroutine(result):
+                await result
+            task.runs += 1
+            deadline += task.period
+            now = loop.time()
+            if now > deadline:
+                task.overruns += 1
+                missed = int((now - deadline) / task.period) + 1
+                if task.policy == SKIP:
+                    task.skipped += missed
+                    deadline += missed * task.period
+                elif missed > MAX_CATCH_UP:
+                    task.skipped += missed - MAX_CATCH_UP
+                    deadline += (missed - MAX_CATCH_UP) * task.period
+                self._warn_overrun(task, now)
+            await asyncio.sleep(max(deadline - now, 0))
+
+    def _warn_overrun(self, task, now):
+        if task._last_warning is None or now - task._last_warning > OVERRUN_LOG_PERIOD:
+            task._last_warning = now
+            logging.warning("Task '{}' overran its {:.1f} ms period ({} overruns, {} runs skipped)".format(
+                task.name, task.period * 1000, task.overruns, task.skipped))
@@ -0,0 +1,129 @@
+"""
+The telemetry and command schemas of both controllers, compiled once from gse_master.json.
+"""
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from codec import Codec
+from batch_codec import BatchCodec, TIME_CHANNEL
+from delta_codec import DeltaCodec, DEFAULT_KEYFRAME_EVERY
+from network_node import PACKET_HEADER
+
+# gse_master.json alongside this file, /home/pi/controller/gse_master.json on the Pis
+GSE_MASTER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gse_master.json")
+# kind of message -> its block of gse_master.json
+SCHEMA_BLOCKS = {"telemetry": "telemetry_config", "command": "command_config"}
+# group of telemetry channels also sent in batches of samples
+BATCH_GROUP = "adc_channels"
+# optional block of gse_master.json configuring change-only telemetry per control
+DELTA_BLOCK = "telemetry_delta"
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def flatten(config, schema=None):
+    """
+    Channel name -> struct format of a schema block, in file order, with nested groups such as
+    adc_channels flattened in where they appear.
+    """
+    if schema is None:
+        schema = OrderedDict()
+    for name, value in config.items():
+        if isinstance(value, dict):
+            flatten(value, schema)
+        elif name in schema:
+            raise ValueError(f"Channel {name} is defined twice")
+        else:
+            schema[name] = value
+    return schema
+
+
+def schema_hash(msg_schema, encoding=""):
+    """
+    32 bit hash of the channel names, formats and order of a schema, and of the encoding, if it is
+    not the plain struct, so each encoding of a schema has its own hash.
+    """
+    return zlib.crc32((encoding + ";".join(f"{name}:{fmt}" for name, fmt in msg_schema.items())).encode())
+
+
+def get_registry(path=GSE_MASTER):
+    """
+    The SchemaRegistry of a gse_master.json, compiled the first time it is asked for.
+    """
+    with _registries_lock:
+        if path not in _registries:
+            with open(path) as gse_f:
+                _registries[path] = SchemaRegistry(json.load(gse_f))
+        return _registries[path]
+
+
+class SchemaRegistry:
+    """
+    Every codec of gse_master.json's telemetry_config and command_config blocks, compiled when the
+    registry is built, so there is one definition of each schema and one compiled struct.Struct.
+
+    Each codec carries its schema hash at the start of every packet, so a ground station or
+    controller running with a different schema drops the packet rather than misreading it.
+
+    The adc_channels group of each telemetry block also gets a "batch" BatchCodec, for many
+    timestamped samples of those channels in one datagram.
+
+    A control with an entry in the optional telemetry_delta block sends its telemetry change-only,
+    for example:
+
+    "telemetry_delta": {"f": {"keyframe_every": 20, "deadband": {"fc_adc1_c1": 0.5}}}
+
+    Its DeltaCodecs are made by delta(), since each holds the state of one stream.
+    """
+    def __init__(self, gse_config):
+        # (kind, control key) -> Codec
+        self.codecs = {}
+        # schema hash -> (kind, control key)
+        self.ids = {}
+        # control key -> (schema, schema hash, deadbands, keyframe_every) of change-only telemetry
+        self.deltas = {}
+        for kind, block in SCHEMA_BLOCKS.items():
+            for key, config in gse_config[block].items():
+                msg_schema = flatten(config)
+                schema_id = schema_hash(msg_schema)
+                self._add(kind, key, Codec(msg_schema, schema_id))
+                if kind == "telemetry" and BATCH_GROUP in config:
+                    batch_schema = OrderedDict([(TIME_CHANNEL, "Q")])
+                    batch_schema.update(flatten(config[BATCH_GROUP]))
+                    self._add("batch", key, BatchCodec(batch_schema, schema_hash(batch_schema), PACKET_HEADER.size))
+                if kind == "telemetry" and key in gse_config.get(DELTA_BLOCK, {}):
+                    delta = gse_config[DELTA_BLOCK][key]
+                    self.deltas[key] = (msg_schema, schema_hash(msg_schema, "delta"), delta.get("deadband", {}),
+                                        delta.get("keyframe_every", DEFAULT_KEYFRAME_EVERY))
+                    # built once here to check the deadbands name channels of the schema
+                    self._add("delta", key, DeltaCodec(*self.deltas[key]))
+
+    def _add(self, kind, key, codec):
+        if codec.schema_id in self.ids:
+            raise ValueError(f"Schemas {self.ids[codec.schema_id]} and {(kind, key)} have the same hash")
+        self.codecs[(kind, key)] = codec
+        self.ids[codec.schema_id] = (kind, key)
+
+    def codec(self, kind, control):
+        """
+        The codec of kind "telemetry", "command" or "batch" for control, "prop" or "fill" (or just its
+        first letter). The same codec is returned each time.
+        """
+        return self.codecs[(kind, control[0])]
+
+    def delta(self, control):
+        """
+        A new DeltaCodec of control's telemetry, or None if it is not sent change-only.
+        """
+        if control[0] not in self.deltas:
+            return None
+        return DeltaCodec(*self.deltas[control[0]])
+
+    def lookup(self, schema_id):
+        """
+        (kind, control key) of the schema with hash schema_id, or None if there is none.
+        """
+        return self.ids.get(schema_id)
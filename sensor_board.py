@@ -0,0 +1,128 @@
+import logging
+logging.basicConfig(level=logging.DEBUG)
+from acquisition import Acquisition
+from calibration import Calibration
+from sensor_schedule import conversion_time
+from sweep import sweep
+import functools
+import itertools
+import numpy as np
+
+NUM_CHANNELS = 8
+ADC_ADDRESSES = (0x48, 0x49)
+
+
+class SensorBoard:
+    """
+    The PT channels of two ADS1115s, or of the four ADS1219s at 0x40-0x43, read directly or by an
+    Acquisition thread, shared by the prop and fill sensor boards.
+
+    With a ConversionPlan each sample converts only the channels in the plan's next frame. The
+    others are NaN in that sample, so the ring and everything reading it (captures, batches,
+    filters) sees only real conversions, while telemetry and redlines get the latest conversion of
+    every channel.
+    """
+    def __init__(self, pt_scale, calibration, data_rate, name):
+        self.adc = []
+        self.PT_scaling = pt_scale
+        # converts a sweep of voltages to pressures
+        self.calibration = calibration if calibration is not None else Calibration.linear(pt_scale)
+        self.data_rate = data_rate
+        self.name = name
+        self.acquisition = None
+        # (chip, start, read) of each channel's conversion, so sweeps can overlap the chips; None
+        # off target
+        self._conversions = None
+        # (chip, estimated conversion time) of each channel, if not the ADS1115s at ADC_ADDRESSES
+        self._devices = None
+        # latest volts of each channel and the frames of the conversion plan, if sampling by one
+        self._volts = np.zeros(NUM_CHANNELS)
+        self._frames = None
+
+    def set_adcs(self, adcs):
+        self.adc = adcs
+        self._conversions = [(adc.addr, functools.partial(adc.start_conversion, channel), adc.read_conversion)
+                             for adc in adcs for channel in range(0, 4)]
+
+    def set_ads1219(self, channels):
+        """
+        Read the ADS1219s instead, with channels holding an ADS1219 for each of the 8 channels in
+        order. Their conversions are swept and planned across the chips like the ADS1115s'.
+        """
+        self.adc = channels
+        self._conversions = [(channel.get_address(), channel.start_conversion,
+                              functools.partial(self._read_ads1219, channel)) for channel in channels]
+        self._devices = [(channel.get_address(), conversion_time(channel.get_data_rate())) for channel in channels]
+
+    @staticmethod
+    def _read_ads1219(channel):
+        return channel.to_millivolts(channel.read_conversion()) / 1000
+
+    def get_adc_readings(self):
+        if self._conversions is None:
+            return [0] * NUM_CHANNELS
+        volts = sweep(self._conversions)
+        return self.calibration.convert(volts).tolist()
+
+    def channel_devices(self):
+        """
+        (ADC address, estimated conversion time) of each channel, for planning conversions.
+        """
+        if self._devices is not None:
+            return self._devices
+        return [(address, conversion_time(self.data_rate)) for address in ADC_ADDRESSES for channel in range(0, 4)]
+
+    def set_plan(self, plan):
+        """
+        Convert by plan, a ConversionPlan, from its first frame.
+        """
+        # each frame with the channels it leaves out
+        self._frames = itertools.cycle([(frame, [idx for idx in range(NUM_CHANNELS) if idx not in frame])
+                                        for frame in plan.frames])
+
+    def read_planned(self):
+        """
+        Convert the channels in the next frame of the conversion plan. Returns a reading of every
+        channel, NaN for those not converted.
+        """
+        if self._conversions is None:
+            return [0] * NUM_CHANNELS
+        frame, held = next(self._frames)
+        self._volts[frame] = sweep([self._conversions[idx] for idx in frame])
+        readings = self.calibration.convert(self._volts)
+        readings[held] = np.nan
+        return readings
+
+    def start_acquisition(self, rate_hz, history_s, on_sample=None, filters=None, plan=None):
+        """
+        Sample the ADCs at rate_hz in a background thread, keeping the last history_s seconds of
+        samples. Telemetry then comes from the latest sample without touching I2C, filtered by
+        filters if given. on_sample(t, readings) is called from the acquisition thread with each
+        sample, holding the latest conversion of channels not converted in it.
+
+        With a ConversionPlan at rate_hz, each sample converts only the channels in the plan's next
+        frame.
+        """
+        read_fn = self.get_adc_readings
+        if plan is not None:
+            self.set_plan(plan)
+            read_fn = self.read_planned
+        self.acquisition = Acquisition(read_fn, NUM_CHANNELS, rate_hz,
+                                       int(rate_hz * history_s), on_sample, self.name, filters)
+        self.acquisition.start()
+
+    def stop_acquisition(self):
+        if self.acquisition is not None:
+            self.acquisition.stop()
+            self.acquisition = None
+
+    def get_latest_readings(self):
+        """
+        The latest reading of each channel from the acquisition thread, filtered if it has filters,
+        or a fresh reading if it is not running or has no samples yet.
+        """
+        if self.acquisition is not None:
+            latest = self.acquisition.latest()
+            if latest is not None:
+                return latest[1].tolist()
+        return self.get_adc_readings()
@@ -0,0 +1,155 @@
+import logging
+import math
+logging.basicConfig(level=logging.DEBUG)
+
+# Bus time, in seconds, of starting, polling and reading back one single-shot conversion: about
+# four transactions of a few bytes at 100 kHz
+SINGLE_SHOT_BUS_S = 0.0005
+# Slowest a channel may be sampled, as a number of frames between its samples
+MAX_DIVISOR = 64
+# Priority of channels not given one; lower numbers are more important
+DEFAULT_PRIORITY = 1
+# Fraction of each frame the conversions may take, leaving the rest for jitter
+FRAME_BUDGET = 0.9
+
+
+def conversion_time(data_rate):
+    """
+    Estimated time in seconds of one single-shot conversion at data_rate samples per second.
+    """
+    return 1 / data_rate + SINGLE_SHOT_BUS_S
+
+
+def max_frame_rate(devices):
+    """
+    Fastest whole frame rate, in Hz, at which every channel can be converted in every frame, with
+    devices holding (device, conversion_s) of each channel and the devices converting at once.
+    """
+    chip_times = {}
+    for device, conversion_s in devices:
+        chip_times[device] = chip_times.get(device, 0.0) + conversion_s
+    return math.floor(FRAME_BUDGET / max(chip_times.values()))
+
+
+class PlannedChannel:
+    """
+    A channel in a ConversionPlan, converted by device taking conversion_s each time.
+    """
+    def __init__(self, name, device, conversion_s, rate_hz, priority=DEFAULT_PRIORITY):
+        self.name = name
+        self.device = device
+        self.conversion_s = conversion_s
+        self.rate_hz = rate_hz
+        self.priority = priority
+        # frames between samples and the first frame it is sampled in
+        self.divisor = 1
+        self.offset = 0
+
+
+class ConversionPlan:
+    """
+    Which channels to convert in each frame of the acquisition, frame_rate frames a second, so
+    each channel is sampled at close to its own rate and the load is spread evenly over the frames.
+
+    A channel's rate is rounded to frame_rate over a power of two, so the plan repeats every
+    `cycle` frames. Within a frame the conversions alternate between devices, so that each chip
+    can be converting while another is read. If a frame's conversions do not fit in FRAME_BUDGET of
+    it, the least important channels (highest priority number) are halved in rate until they do.
+
+    Configured per channel in sensor_map.json, for example:
+
+    "pc_adc1_c1": {"adc": 1.1, "rate_hz": 100, "priority": 0}
+
+    A channel with no rate_hz is sampled every frame.
+    """
+    def __init__(self, channels, frame_rate):
+        self.channels = channels
+        self.frame_rate = frame_rate
+        for channel in channels:
+            divisor = 1
+            while divisor < MAX_DIVISOR and frame_rate / (divisor * 2) >= channel.rate_hz:
+                divisor *= 2
+            channel.divisor = divisor
+        self._fit()
+
+    @classmethod
+    def from_config(cls, sensor_map, channels, devices, frame_rate):
+        """
+        Plan for channels, a list of channel names, with devices holding (device, conversion_s) of
+        each channel.
+        """
+        planned = []
+        for name, (device, conversion_s) in zip(channels, devices):
+            spec = sensor_map.get(name, {})
+            planned.append(PlannedChannel(name, device, conversion_s, spec.get("rate_hz", frame_rate),
+                                          spec.get("priority", DEFAULT_PRIORITY)))
+        return cls(planned, frame_rate)
+
+    def _fit(self):
+        budget = FRAME_BUDGET / self.frame_rate
+        while True:
+            self._place()
+            loads = [self.frame_time(frame) for frame in self.frames]
+            worst = max(range(self.cycle), key=lambda f: loads[f])
+            if loads[worst] <= budget:
+                for channel in self.channels:
+                    if self.frame_rate / channel.divisor < channel.rate_hz:
+                        logging.info(f"{channel.name} slowed to {self.frame_rate / channel.divisor:g} Hz to fit the "
+                                     f"{1000 / self.frame_rate:.1f} ms frame")
+                return
+            slowable = [idx for idx in range(len(self.channels)) if self.channels[idx].divisor < MAX_DIVISOR]
+            if not slowable:
+                raise ValueError(f"Conversions take {loads[worst] * 1000:.1f} ms of a "
+                                 f"{1000 / self.frame_rate:.1f} ms frame even at the slowest rates")
+            # the least important, and of those the fastest, so equal channels are slowed evenly
+            channel = self.channels[max(slowable, key=lambda idx: (self.channels[idx].priority,
+                                                                   -self.channels[idx].divisor, idx))]
+            channel.divisor *= 2
+
+    def _place(self):
+        """
+        Choose each channel's first frame, most important first, where it adds least to the
+        busiest frame it is in, then lay out the frames.
+        """
+        self.cycle = max(channel.divisor for channel in self.channels)
+        loads = [0.0] * self.cycle
+        order = sorted(range(len(self.channels)), key=lambda idx: (self.channels[idx].priority, idx))
+        for idx in order:
+            channel = self.channels[idx]
+            channel.offset = min(range(channel.divisor), key=lambda offset: (
+                max(loads[offset::channel.divisor]), offset))
+            for f in range(channel.offset, self.cycle, channel.divisor):
+                loads[f] += channel.conversion_s
+        self.frames = [self._interleave([idx for idx in order if f % self.channels[idx].divisor ==
+                                         self.channels[idx].offset]) for f in range(self.cycle)]
+
+    def _interleave(self, due):
+        """
+        Order the conversions of a frame taking a channel from each device in turn, so the same
+        chip is not converted twice in a row while another is idle. due is most important first.
+        """
+        queues = {}
+        for idx in due:
+            queues.setdefault(self.channels[idx].device, []).append(idx)
+        queues = list(queues.values())
+        order = []
+        for turn in range(max((len(queue) for queue in queues), default=0)):
+            order += [queue[turn] for queue in queues if turn < len(queue)]
+        return order
+
+    def frame_time(self, frame):
+        """
+        Estimated time in seconds to make the conversions of a frame, overlapped across chips by
+        sweep: the time of the busiest chip's conversions.
+        """
+        chip_times = {}
+        for idx in frame:
+            channel = self.channels[idx]
+            chip_times[channel.device] = chip_times.get(channel.device, 0.0) + channel.conversion_s
+        return max(chip_times.values(), default=0.0)
+
+    def rates(self):
+        """
+        Rate each channel is sampled at, in Hz.
+        """
+        return [self.frame_rate / channel.divisor for channel in self.channels]
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+from collections import deque
+from bitfield_utils import NUM_RELAYS
+logging.basicConfig(level=logging.DEBUG)
+
+# Number of actuations kept in Sequencer.actuations
+ACTUATION_LOG_LENGTH = 256
+
+# "open" powers a relay
+LEVELS = {"open": 1, "closed": 0, 1: 1, 0: 0}
+# SCR tag of relay changes made by a valve pulse
+PULSE_TAG = 0b100
+
+
+async def sleep_until(deadline):
+    """
+    Sleep until deadline on the event loop's monotonic clock. The loop wakes up to about a
+    millisecond late; nothing spins on it waiting for the exact moment, since that would hold up
+    commands, redline checks and telemetry. The lateness of each actuation is logged with it.
+    """
+    loop = asyncio.get_event_loop()
+    remaining = deadline - loop.time()
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+
+
+def valve_index(valve_id, relay_map):
+    """
+    Valves are named either by their relay map name or by relay number 1-10.
+    """
+    if isinstance(valve_id, str):
+        return relay_map[valve_id]
+    if not 1 <= valve_id <= 10:
+        raise ValueError(f"Relay number {valve_id} must be 1-10")
+    return valve_id - 1
+
+
+def compile_actions(actions, relay_map):
+    """
+    Compile a list of set_valve and wait actions into a table of (offset, relay index, level)
+    where offset is in seconds from the start of the sequence.
+    """
+    table = []
+    offset = 0.0
+    for action in actions:
+        if action["type"] == "wait":
+            offset += action["duration"]
+        elif action["type"] == "set_valve":
+            table.append((offset, valve_index(action["valve_id"], relay_map), LEVELS[action["state"]]))
+        else:
+            raise ValueError(f"Unknown action type '{action['type']}'")
+    return table
+
+
+def compile_requirements(requirements, relay_map):
+    """
+    Compile requirements into tuples of (type, index, low, high). Pressure requirements become an
+    open range on a sensor, valve requirements a relay index and level.
+    """
+    compiled = []
+    for req in requirements:
+        if req["type"] == "pressure_below":
+            compiled.append(("pressure", req["sensor_id"] - 1, float("-inf"), req["threshold"]))
+        elif req["type"] == "pressure_above":
+            compiled.append(("pressure", req["sensor_id"] - 1, req["threshold"], float("inf")))
+        elif req["type"] == "pressure_between":
+            compiled.append(("pressure", req["sensor_id"] - 1, req["min_threshold"], req["max_threshold"]))
+        elif req["type"] == "valve_state":
+            level = LEVELS[req["state"]]
+            compiled.append(("valve", valve_index(req["valve_id"], relay_map), level, level))
+        elif req["type"] == "armed":
+            compiled.append(("armed", None, None, None))
+        else:
+            raise ValueError(f"Unknown requirement type '{req['type']}'")
+    return compiled
+
+
+class Sequence:
+    """
+    A valve sequence precompiled from its JSON description, for example:
+
+    {
+        "requirements": [{"type": "pressure_below", "sensor_id": 1, "threshold": 50.0}],
+        "actions": [
+            {"type": "set_valve", "valve_id": "OMV", "state": "open"},
+            {"type": "wait", "duration": 0.065},
+            {"type": "set_valve", "valve_id": 7, "state": "open"}
+        ],
+        "abort": [{"type": "set_valve", "valve_id": "OMV", "state": "closed"}],
+        "abort_on_disarm": true
+    }
+
+    valve_id is a relay map name or a relay number 1-10, "open" powers the relay and wait durations
+    are in seconds. The abort actions are applied at once if the sequence is aborted.
+    """
+    def __init__(self, name, spec, relay_map):
+        self.name = name
+        self.table = compile_actions(spec["actions"], relay_map)
+        self.abort_table = compile_actions(spec.get("abort", []), relay_map)
+        self.requirements = compile_requirements(spec.get("requirements", []), relay_map)
+        self.abort_on_disarm = spec.get("abort_on_disarm", False)
+        self.relays = frozenset(idx for offset, idx, level in self.table)
+
+    def requirements_met(self, relays, readings):
+        """
+        Check the requirements against the relay state and the latest PT readings, which may be None
+        if no readings have been taken yet.
+        """
+        state = relays.get_state()
+        for kind, idx, low, high in self.requirements:
+            if kind == "pressure":
+                if readings is None or not low < readings[idx] < high:
+                    return False
+            elif kind == "valve":
+                if state[idx] != low:
+                    return False
+            elif not relays.is_armed():
+                return False
+        return True
+
+
+class Sequencer:
+    """
+    Runs precompiled valve sequences as tasks on the event loop, and valve pulses as timer
+    events. Any number of sequences and pulses may run at once. Each actuation is timestamped
+    against its deadline on the loop's monotonic clock and kept in self.actuations as (sequence,
+    relay index, level, deadline, actual time).
+    """
+    def __init__(self, relays, GPIO, sequences, relay_map):
+        self.relays = relays
+        self.GPIO = GPIO
+        self.relay_map = relay_map
+        self.sequences = {name: Sequence(name, spec, relay_map) for name, spec in sequences.items()}
+        # name -> (sequence, task) of each running sequence
+        self.running = {}
+        self.actuations = deque(maxlen=ACTUATION_LOG_LENGTH)
+        # relay index -> timer handle of each valve being pulsed
+        self.pulses = {}
+        # measured width in milliseconds of the last completed pulse
+        self.pulse_width = 0.0
+
+    def start(self, name, readings=None, tag=None):
+        """
+        Start the named sequence if its requirements are met. tag, if given, becomes the relays'
+        SCR tag. Returns False if the sequence was not started.
+        """
+        sequence = self.sequences[name]
+        if not sequence.requirements_met(self.relays, readings):
+            logging.info(f"Sequence '{name}' requirements not met")
+            return False
+        return self.start_compiled(sequence, tag)
+
+    def start_compiled(self, sequence, tag=None):
+        """
+        Start an already compiled sequence without checking its requirements.
+        """
+        if sequence.name in self.running:
+            logging.info(f"Sequence '{sequence.name}' already running")
+            return False
+        self.running[sequence.name] = (sequence, asyncio.ensure_future(self._run(sequence, tag)))
+        self._update_locks()
+        logging.info(f"Sequence '{sequence.name}' started")
+        return True
+
+    def is_running(self, name):
+        return name in self.running
+
+    def abort(self, name):
+        """
+        Cancel the named sequence and apply its abort actions. The relays are driven here rather
+        than in the task so the abort takes effect before the next scheduler tick.
+        """
+        if name not in self.running:
+            return
+        sequence, task = self.running.pop(name)
+        task.cancel()
+        self._update_locks()
+        for offset, idx, level in sequence.abort_table:
+            self.relays.set_relay(self.GPIO, idx, level)
+        logging.info(f"Sequence '{name}' aborted")
+
+    def abort_all(self):
+        """
+        Abort every running sequence and pulse.
+        """
+        for name in list(self.running):
+            self.abort(name)
+        for valve, handle in list(self.pulses.items()):
+            handle.cancel()
+        self.pulses.clear()
+        self._update_locks()
+
+    def disarmed(self):
+        """
+        Abort every running sequence which must not outlive the arm.
+        """
+        for name, (sequence, task) in list(self.running.items()):
+            if sequence.abort_on_disarm:
+                self.abort(name)
+
+    def pulse(self, valve, delay):
+        """
+        Flip the relay at index valve, then flip it back delay milliseconds later from a timer on
+        the event loop. Pulses on different valves run independently. Returns False if the valve
+        is already pulsing, is driven by a running sequence, or if the pulsed state is prohibited
+        by the interlocks.
+        """
+        if not 0 <= valve < NUM_RELAYS:
+            logging.error(f"No valve {valve} to pulse")
+            return False
+        if valve in self.pulses:
+            logging.info(f"Valve {valve} already pulsing")
+            return False
+        # restoring the level from before the pulse would undo any step the sequence took meanwhile
+        for sequence, task in self.running.values():
+            if valve in sequence.relays:
+                logging.info(f"Valve {valve} is driven by sequence '{sequence.name}'")
+                return False
+        level = self.relays.get_state()[valve]
+        valid, message = self.relays.check_relay(valve, 1 - level)
+        if not valid:
+            logging.info(f"Pulse of valve {valve} refused. {message}")
+            return False
+        loop = asyncio.get_event_loop()
+        self.relays.set_relay(self.GPIO, valve, 1 - level, PULSE_TAG)
+        start = loop.time()
+        self.actuations.append((f"pulse_{valve}", valve, 1 - level, start, start))
+        deadline = start + delay / 1000
+        self.pulses[valve] = loop.call_at(deadline, self._end_pulse, valve, level, start, deadline)
+        self._update_locks()
+        return True
+
+    def _end_pulse(self, valve, level, start, deadline):
+        loop = asyncio.get_event_loop()
+        self.relays.set_relay(self.GPIO, valve, level, PULSE_TAG)
+        end = loop.time()
+        self.actuations.append((f"pulse_{valve}", valve, level, deadline, end))
+        del self.pulses[valve]
+        self._update_locks()
+        self.pulse_width = (end - start) * 1000
+        logging.info("Valve {} pulsed for {:.3f} ms ({:+.3f} ms)".format(
+            valve, self.pulse_width, (end - deadline) * 1000))
+
+    def _update_locks(self):
+        # relays driven by a running sequence or pulse are left alone by state change requests
+        locked = set(self.pulses)
+        for sequence, task in self.running.values():
+            locked |= sequence.relays
+        self.relays.set_locked(locked)
+
+    async def _run(self, sequence, tag):
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        jitter = 0.0
+        try:
+            for offset, idx, level in sequence.table:
+                deadline = start + offset
+                await sleep_until(deadline)
+                self.relays.set_relay(self.GPIO, idx, level, tag)
+                now = loop.time()
+                self.actuations.append((sequence.name, idx, level, deadline, now))
+                jitter = max(jitter, now - deadline)
+        finally:
+            if self.running.get(sequence.name, (None, None))[1] is asyncio.current_task():
+                del self.running[sequence.name]
+                self._update_locks()
+        logging.info("Sequence '{}' complete, max jitter {:.3f} ms".format(sequence.name, jitter * 1000))
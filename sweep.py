@@ -0,0 +1,40 @@
+import heapq
+
+
+def sweep(conversions):
+    """
+    Make a list of conversions, overlapping those on different chips. Each is (chip, start, read):
+    start() begins a conversion and returns the time.monotonic time it is due, and read() waits for
+    it and returns the result. The first conversion on every chip is started straight away, then
+    whichever chip is due first is read and started on its next conversion, so a sweep takes about
+    as long as the busiest chip's conversions rather than all of them one after another.
+
+    Conversions on the same chip are made in the order given. Returns the results in the order
+    given.
+    """
+    queues = {}
+    for idx, (chip, start, read) in enumerate(conversions):
+        queues.setdefault(chip, []).append(idx)
+    results = [None] * len(conversions)
+    # (due, conversion) of each chip's conversion in progress
+    converting = []
+    try:
+        for queue in queues.values():
+            idx = queue.pop(0)
+            heapq.heappush(converting, (conversions[idx][1](), idx))
+        while converting:
+            due, idx = heapq.heappop(converting)
+            chip, start, read = conversions[idx]
+            results[idx] = read()
+            queue = queues[chip]
+            if queue:
+                idx = queue.pop(0)
+                heapq.heappush(converting, (conversions[idx][1](), idx))
+    finally:
+        # a failed conversion must not leave other chips held
+        for due, idx in converting:
+            try:
+                conversions[idx][2]()
+            except Exception:
+                pass
+    return results
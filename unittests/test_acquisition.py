@@ -0,0 +1,103 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from acquisition import SampleRing, Acquisition
+import threading
+import numpy as np
+import time
+import pytest
+
+
+class TestSampleRing:
+    def test_empty(self):
+        ring = SampleRing(4, 2)
+        assert (ring.latest() is None)
+        times, values = ring.last(3)
+        assert (len(times) == 0 and values.shape == (0, 2))
+
+    def test_wraps(self):
+        ring = SampleRing(4, 2)
+        for i in range(6):
+            ring.append(float(i), [i, -i])
+        t, values = ring.latest()
+        assert (t == 5.0 and list(values) == [5, -5])
+        times, values = ring.last(10)
+        assert (list(times) == [2.0, 3.0, 4.0, 5.0])
+        assert (list(values[:, 1]) == [-2, -3, -4, -5])
+        times, values = ring.since(3.0)
+        assert (list(times) == [4.0, 5.0])
+
+    def test_copies(self):
+        ring = SampleRing(2, 1)
+        ring.append(0.0, [1])
+        t, values = ring.latest()
+        ring.append(1.0, [2])
+        ring.append(2.0, [3])
+        assert (values[0] == 1)
+
+
+class TestAcquisition:
+    def test_samples_at_rate(self):
+        samples = []
+        reads = iter(range(1000))
+        acquisition = Acquisition(lambda: [next(reads)] * 3, 3, 200, 100,
+                                  on_sample=lambda t, values: samples.append(values))
+        acquisition.start()
+        time.sleep(0.105)
+        acquisition.stop()
+        assert (not acquisition.is_running())
+        assert (20 <= acquisition.ring.count <= 23)
+        assert (len(samples) == acquisition.ring.count)
+        times, values = acquisition.ring.last(100)
+        assert (list(values[:, 0]) == list(range(acquisition.ring.count)))
+        assert (acquisition.overruns == 0)
+        assert (acquisition.latest()[0] == times[-1])
+
+    def test_read_errors(self):
+        def read():
+            raise OSError("No I2C device at address: 0x48")
+        acquisition = Acquisition(read, 8, 200, 10)
+        acquisition.start()
+        time.sleep(0.05)
+        acquisition.stop()
+        assert (acquisition.errors >= 5)
+        assert (acquisition.ring.count == 0)
+
+    def test_overruns_skip(self):
+        acquisition = Acquisition(lambda: time.sleep(0.025) or [0], 1, 100, 10)
+        acquisition.start()
+        time.sleep(0.1)
+        acquisition.stop()
+        assert (acquisition.overruns >= 3)
+        assert (acquisition.ring.count <= 4)
+
+    def test_filtered(self):
+        from filters import FilterBank, Median
+        reads = iter([1.0, 2.0, 900.0, 3.0] + [4.0] * 1000)
+        samples = []
+        acquisition = Acquisition(lambda: [next(reads)], 1, 200, 100, filters=FilterBank([Median(3)], [1]),
+                                  on_sample=lambda t, values: samples.append(values[0]))
+        acquisition.start()
+        time.sleep(0.03)
+        acquisition.stop()
+        assert (max(samples) < 10)
+        assert (acquisition.ring.values[:acquisition.ring.count].max() == 900.0)
+        assert (acquisition.latest()[1][0] == samples[-1])
+
+    def test_held(self):
+        # the second channel is converted every other sample
+        reads = iter([[i, i if i % 2 == 0 else np.nan] for i in range(1000)])
+        samples = []
+        acquisition = Acquisition(lambda: next(reads), 2, 200, 100,
+                                  on_sample=lambda t, values: samples.append(list(values)))
+        acquisition.start()
+        time.sleep(0.03)
+        acquisition.stop()
+        count = acquisition.ring.count
+        times, values = acquisition.ring.last(count)
+        # the ring keeps only real conversions
+        assert (np.isnan(values[1::2, 1]).all() and list(values[::2, 1]) == list(range(0, count, 2)))
+        # samples hold the last conversion
+        assert ([s[1] for s in samples[:4]] == [0, 0, 2, 2])
+        t, latest = acquisition.latest()
+        assert (latest[1] == (count - 1) // 2 * 2)
+        assert (acquisition.held_times[0] == t and acquisition.held_times[1] == times[(count - 1) // 2 * 2])
@@ -0,0 +1,50 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from ads1115 import ADS1115
+from i2c_bus import get_bus
+from fake_i2c import FakeI2C, FakeADS1115
+import pytest
+
+# single-ended mux settings of channels 0-3, and codes of 1, 2, 3 and 4 V at gain 1
+CODES = {4: 8000, 5: 16000, 6: 24000, 7: 32000}
+
+
+@pytest.fixture
+def fake():
+    fake = FakeI2C(frequency=400000)
+    fake.add(0x48, FakeADS1115(dict(CODES)))
+    return fake
+
+
+class TestADS1115:
+    def test_read_voltage(self, fake):
+        adc = ADS1115(gain=1, addr=0x48, i2c=fake, data_rate=860)
+        assert ([round(adc.read_voltage(channel), 3) for channel in range(4)] == [1.0, 2.0, 3.0, 4.0])
+        assert ([round(v, 3) for v in adc.read_voltages()] == [1.0, 2.0, 3.0, 4.0])
+        assert (round(adc.read_pressure(3, max_p=1000), 1) == 875.0)
+
+    def test_one_conversion_per_sample(self, fake):
+        adc = ADS1115(gain=1, addr=0x48, i2c=fake, data_rate=860)
+        before = fake.devices[0x48].configs_written
+        adc.read_voltages()
+        assert (fake.devices[0x48].configs_written - before == 4)
+
+    def test_continuous(self, fake):
+        adc = ADS1115(gain=1, addr=0x48, i2c=fake, data_rate=860, continuous=True)
+        adc.read_voltage(2)
+        stats = get_bus(fake).stats[0x48]
+        before = stats.transactions
+        for i in range(10):
+            assert (round(adc.read_voltage(2), 3) == 3.0)
+        # the last result is read without writing the pointer or config
+        assert (stats.transactions - before == 10)
+
+    def test_data_rate(self, fake):
+        with pytest.raises(ValueError):
+            ADS1115(gain=1, addr=0x48, i2c=fake, data_rate=1000)
+
+    def test_gain(self, fake):
+        # at 2/3 the full scale is 6.144 V rather than 4.096 V, so the same codes read 1.5 times the volts
+        adc = ADS1115(gain=2/3, addr=0x48, i2c=fake, data_rate=860)
+        assert (adc.adc.gain == 2/3)
+        assert ([round(adc.read_voltage(channel), 2) for channel in range(4)] == [1.5, 3.0, 4.5, 6.0])
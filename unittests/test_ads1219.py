@@ -0,0 +1,115 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from ADC_Driver import ADS1219
+from fake_i2c import FakeI2C, FakeADS1219
+import pytest
+
+CODES = {ADS1219.CHANNEL_AIN0_AIN1: 0x123456, ADS1219.CHANNEL_AIN2_AIN3: 0x654321}
+
+
+@pytest.fixture
+def bus():
+    bus = FakeI2C(frequency=400000)
+    for address in range(0x40, 0x44):
+        bus.add(address, FakeADS1219(dict(CODES)))
+    return bus
+
+
+class TestADS1219:
+    def test_configure(self, bus):
+        adc = ADS1219(3, gain=4, data_rate=1000, i2c=bus)
+        config = bus.devices[0x41].config
+        assert (config & 0xE0 == ADS1219.CHANNEL_AIN0_AIN1)
+        assert (config & 0x10 == ADS1219.GAIN_4X)
+        assert (config & 0xC == ADS1219.DR_1000_SPS)
+
+    def test_single_shot(self, bus):
+        adc = ADS1219(1, data_rate=1000, i2c=bus)
+        assert (adc.read_raw_data() == CODES[ADS1219.CHANNEL_AIN0_AIN1])
+        # waits out the conversion and polls DRDY once, rather than polling every 100 ms
+        assert (bus.devices[0x40].starts == 1)
+        assert (bus.devices[0x40].status_reads == 1)
+        assert (bus.devices[0x40].stale_reads == 0)
+
+    def test_channels_sharing_a_chip(self, bus):
+        adcs = [ADS1219(i, data_rate=1000, i2c=bus) for i in (1, 2)]
+        assert ([adc.read_raw_data() for adc in adcs] ==
+                [CODES[ADS1219.CHANNEL_AIN0_AIN1], CODES[ADS1219.CHANNEL_AIN2_AIN3]])
+
+    def test_reset_once_per_chip(self, bus):
+        ADS1219(1, gain=4, data_rate=1000, i2c=bus)
+        ADS1219(2, gain=4, data_rate=1000, i2c=bus)
+        assert (bus.devices[0x40].resets == 1)
+        assert (bus.devices[0x40].config & 0x1C == ADS1219.GAIN_4X | ADS1219.DR_1000_SPS)
+
+    def test_chips_on_other_buses(self, bus):
+        other = FakeI2C(frequency=400000)
+        other.add(0x40, FakeADS1219(dict(CODES)))
+        ADS1219(1, data_rate=1000, i2c=bus)
+        ADS1219(1, data_rate=1000, i2c=other)
+        # the chip at the same address on the other bus is reset and configured for itself
+        assert (other.devices[0x40].resets == 1)
+        assert (other.devices[0x40].config & 0xC == ADS1219.DR_1000_SPS)
+
+    def test_continuous(self, bus):
+        adc = ADS1219(8, data_rate=1000, i2c=bus)
+        adc.start_continuous()
+        chip = bus.devices[0x43]
+        configs_written, starts = chip.configs_written, chip.starts
+        for i in range(20):
+            assert (adc.read_raw_data() == CODES[ADS1219.CHANNEL_AIN2_AIN3])
+        # one new conversion per read, found ready by a single DRDY poll, without restarting the
+        # conversion
+        assert (chip.stale_reads == 0)
+        assert (chip.status_reads == 20)
+        assert (chip.configs_written == configs_written)
+        assert (chip.starts == starts)
+
+    def test_sweep(self, bus):
+        adcs = [ADS1219(i, data_rate=1000, i2c=bus) for i in range(1, 9)]
+        for adc in adcs:
+            adc.start_continuous()
+        chips = [bus.devices[address] for address in range(0x40, 0x44)]
+        starts = [chip.starts for chip in chips]
+        readings = [adc.read_raw_data() for adc in adcs]
+        assert (readings == [CODES[ADS1219.CHANNEL_AIN0_AIN1], CODES[ADS1219.CHANNEL_AIN2_AIN3]] * 4)
+        for chip, before in zip(chips, starts):
+            # each channel switches the mux and waits out a single conversion
+            assert (chip.starts - before == 2)
+            assert (chip.status_reads == 2)
+            assert (chip.stale_reads == 0)
+
+    def test_timeout(self, bus):
+        adc = ADS1219(1, data_rate=1000, i2c=bus)
+        bus.devices[0x40].PERIODS = {0xC: 1}
+        with pytest.raises(TimeoutError):
+            adc.read_raw_data()
+
+    def test_configure_in_one_write(self, bus):
+        adc = ADS1219(5, gain=4, data_rate=330, i2c=bus)
+        # reset and a single config write, without reading the config back
+        assert (adc.transactions == 2)
+        assert (bus.devices[0x42].configs_written == 1)
+        assert (adc.set_data_rate(330))
+        assert (adc.transactions == 2)
+        assert (not adc.configure(gain=2, data_rate=1000))
+        assert (adc.transactions == 3)
+        assert (bus.devices[0x42].config & 0xC == ADS1219.DR_1000_SPS)
+
+    def test_transactions_per_sample(self, bus):
+        adcs = [ADS1219(i, data_rate=1000, i2c=bus) for i in (3, 4)]
+        adcs[0].read_raw_data()
+        # single shot: START/SYNC, a status write and read, RDATA write and read
+        before = adcs[0].transactions
+        adcs[0].read_raw_data()
+        assert (adcs[0].transactions - before == 5)
+        # switching the mux adds its config write
+        before = adcs[1].transactions
+        adcs[1].read_raw_data()
+        assert (adcs[1].transactions - before == 6)
+        # continuous: a status write and read, RDATA write and read
+        adcs[1].start_continuous()
+        adcs[1].read_raw_data()
+        before = adcs[1].transactions
+        adcs[1].read_raw_data()
+        assert (adcs[1].transactions - before == 4)
@@ -0,0 +1,90 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from batch_codec import BatchCodec, BATCH_HEADER, TIME_CHANNEL, DEFAULT_MTU, UDP_IP_OVERHEAD
+from codec import SchemaMismatch
+from network_node import ReceiveNode, SendNode, PACKET_HEADER
+from schema_registry import get_registry
+from prop_command_codec import PropCommandCodec
+from collections import OrderedDict
+import numpy as np
+import socket
+import pytest
+
+CHANNELS = [f"pc_adc{adc}_c{c}" for adc in (1, 2) for c in range(1, 5)]
+
+
+@pytest.fixture
+def batch():
+    return BatchCodec(OrderedDict([(TIME_CHANNEL, "Q")] + [(name, "f") for name in CHANNELS]), 0x1234,
+                      PACKET_HEADER.size)
+
+
+def samples(count, channels=len(CHANNELS)):
+    times = np.arange(count, dtype=np.uint64) * 1000000 + 5
+    values = np.arange(count * channels, dtype=np.float32).reshape(count, channels) / 4
+    return times, values
+
+
+class TestBatchCodec:
+    def test_round_trip(self, batch):
+        times, values = samples(10)
+        packet = batch.encode(times, values)
+        assert (len(packet) == BATCH_HEADER.size + 10 * (8 + 4 * len(CHANNELS)))
+        decoded_times, decoded_values = batch.decode(packet)
+        assert ((decoded_times == times.astype(np.int64)).all())
+        assert ((decoded_values == values).all())
+
+    def test_iter_decode(self, batch):
+        times, values = samples(3)
+        rows = list(batch.iter_decode(batch.encode(times, values)))
+        assert (rows == [(int(t), *map(float, row)) for t, row in zip(times, values)])
+
+    def test_encode_into_offset(self, batch):
+        times, values = samples(4)
+        buffer = bytearray(PACKET_HEADER.size + batch.size(4))
+        assert (batch.encode_into(times, values, buffer, PACKET_HEADER.size) == batch.size(4))
+        assert (bytes(buffer[PACKET_HEADER.size:]) == batch.encode(times, values))
+        assert ((batch.decode(buffer, PACKET_HEADER.size)[1] == values).all())
+
+    def test_fills_mtu(self, batch):
+        datagram = UDP_IP_OVERHEAD + PACKET_HEADER.size + batch.size(batch.max_samples)
+        assert (datagram <= DEFAULT_MTU < datagram + batch.sample.size)
+        with pytest.raises(ValueError):
+            batch.encode(*samples(batch.max_samples + 1))
+        with pytest.raises(ValueError):
+            BatchCodec(batch.msg_schema, 1, mtu=64)
+
+    def test_mismatch(self, batch):
+        other = BatchCodec(batch.msg_schema, 0x4321)
+        packet = other.encode(*samples(2))
+        with pytest.raises(SchemaMismatch):
+            batch.decode(packet)
+        with pytest.raises(SchemaMismatch):
+            batch.iter_decode(packet)
+
+    def test_registry(self):
+        registry = get_registry()
+        batch = registry.codec("batch", "prop")
+        assert (batch.channels == CHANNELS)
+        assert (registry.lookup(batch.schema_id) == ("batch", "p"))
+        assert (batch.schema_id != registry.codec("telemetry", "prop").schema_id)
+
+    def test_send_batch(self, batch):
+        node = ReceiveNode(("127.0.0.1", 0), PropCommandCodec())
+        send_node = SendNode(("127.0.0.1", 0), node.sock.getsockname(), PropCommandCodec())
+        times, values = samples(batch.max_samples * 2 + 1)
+        assert (send_node.send_batch(batch, times, values) == 3)
+        node.sock.settimeout(1)
+        received_times = []
+        received_values = []
+        for seq in range(1, 4):
+            packet = node.sock.recv(DEFAULT_MTU)
+            assert (PACKET_HEADER.unpack_from(packet)[1] == seq)
+            assert (len(packet) <= DEFAULT_MTU - UDP_IP_OVERHEAD)
+            batch_times, batch_values = batch.decode(packet, PACKET_HEADER.size)
+            received_times.append(batch_times)
+            received_values.append(batch_values)
+        send_node.sock.close()
+        node.sock.close()
+        assert ((np.concatenate(received_times) == times.astype(np.int64)).all())
+        assert ((np.concatenate(received_values) == values).all())
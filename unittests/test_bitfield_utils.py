@@ -0,0 +1,72 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from bitfield_utils import Utils, RelayState
+from relays import Relays
+import itertools
+import pytest
+try:
+    import RPi.GPIO as GPIO
+except (RuntimeError, ModuleNotFoundError):
+    print("Spoofing GPIO.")
+    import fake_rpigpio.utils
+    fake_rpigpio.utils.install()
+    import RPi.GPIO as GPIO
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+
+
+def reference_num(b):
+    """
+    Utils.num as it was with bitarray: a leading one followed by relay 1 to relay 10.
+    """
+    return int("1" + "".join(str(bit) for bit in b), 2)
+
+
+class TestRelayState:
+    def test_round_trip(self):
+        for state in itertools.product([0, 1], repeat=10):
+            state = list(state)
+            n = Utils.num(state)
+            assert (n == reference_num(state)), state
+            assert (Utils.bitfield(n) == state), state
+            assert (Utils.num(Utils.bitfield(n)) == n), state
+
+    def test_named_states(self):
+        assert (Utils.num([0] * 10) == 0b10000000000)
+        assert (Utils.num([1] * 10) == 0b11111111111)
+        assert (Utils.bitfield(0b11000000001) == [1, 0, 0, 0, 0, 0, 0, 0, 0, 1])
+
+    def test_item_access(self):
+        state = RelayState.from_list([1, 0, 0, 0, 0, 0, 0, 0, 0, 1])
+        assert (state[0] == 1 and state[1] == 0 and state[9] == 1)
+        state[1] = 1
+        state[0] = 0
+        assert (state == [0, 1, 0, 0, 0, 0, 0, 0, 0, 1])
+        assert (len(state) == 10)
+        assert (list(state) == state.to_list())
+
+
+class TestRelayUpdate:
+    @pytest.fixture
+    def setup_relays(self):
+        relays = Relays(GPIO, control="fill", config_dir=CONFIG_DIR)
+        writes = []
+        output = GPIO.output
+        GPIO.output = lambda channel, value: writes.append((channel, value))
+        yield relays, writes
+        GPIO.output = output
+
+    def test_only_changed_pins_written(self, setup_relays):
+        relays, writes = setup_relays
+        # the fill interlocks prohibit the closed state, so the relays are left in the vent state
+        relays.request_state([0, 0, 0, 0, 0, 1, 0, 1, 1, 0], 0)
+        relays.update(GPIO)
+        assert (writes == [])
+        relays.request_state([0, 0, 0, 0, 0, 1, 0, 0, 0, 0], 0)
+        relays.update(GPIO)
+        assert (writes == [(tuple(Relays.GPIO_MAPPING[7:9]), (GPIO.LOW,) * 2)])
+        # power BV-07 and unpower BV-06 in one write
+        relays.request_state([0, 0, 0, 0, 0, 0, 1, 0, 0, 0], 0)
+        relays.update(GPIO)
+        assert (writes[1:] == [(tuple(Relays.GPIO_MAPPING[5:7]), (GPIO.LOW, GPIO.HIGH))])
+        assert (relays.get_state() == [0, 0, 0, 0, 0, 0, 1, 0, 0, 0])
@@ -0,0 +1,55 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from calibration import Calibration
+import json
+import numpy as np
+import pytest
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+CHANNELS = [f"pc_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+MAX_P = [1000, 1000, 1000, 1000, 1000, 1000, 1000, 5000]
+
+
+class TestCalibration:
+    def test_linear(self):
+        calibration = Calibration.linear(MAX_P)
+        pressures = calibration.convert([0.5, 4.5, 2.5, 1.0, 0.5, 0.5, 0.5, 4.5])
+        assert (np.allclose(pressures, [0, 1000, 500, 125, 0, 0, 0, 5000]))
+
+    def test_block(self):
+        calibration = Calibration.linear(MAX_P)
+        volts = np.random.default_rng(0).uniform(0.5, 4.5, (1000, 8))
+        pressures = calibration.convert(volts)
+        assert (pressures.shape == (1000, 8))
+        # the same as read_pressure, one sample at a time
+        expected = [[(v - 0.5) * (max_p / 4.0) for v, max_p in zip(row, MAX_P)] for row in volts]
+        assert (np.allclose(pressures, expected))
+
+    def test_config(self):
+        pt_scale = {"max_p": MAX_P, "max_v": 5.0, "min_v": 1.0, "calibrations": {
+            "pc_adc1_c2": {"type": "linear", "max_p": 2000, "offset": -10},
+            "pc_adc2_c4": {"type": "polynomial", "coefficients": [1.0, 2.0, 3.0], "units": "lbf"}
+        }}
+        calibration = Calibration.from_config(pt_scale, CHANNELS)
+        pressures = calibration.convert([3.0] * 8)
+        assert (np.allclose(pressures, [500, 990, 500, 500, 500, 500, 500, 34]))
+        assert (calibration.units[7] == "lbf" and calibration.units[0] == "psi")
+
+    def test_unknown_type(self):
+        with pytest.raises(ValueError):
+            Calibration.from_config({"max_p": MAX_P, "calibrations": {"pc_adc1_c1": {"type": "spline"}}}, CHANNELS)
+
+    def test_codes(self):
+        calibration = Calibration.linear(MAX_P)
+        # ADS1115 at gain 1: 4.096 V full scale over 15 bits
+        codes = np.full((3, 8), 20000)
+        pressures = calibration.convert_codes(codes, 4.096 / 32768)
+        assert (np.allclose(pressures[:, 0], (20000 * 4.096 / 32768 - 0.5) * 250))
+
+    def test_config_files(self):
+        for control in ("prop", "fill"):
+            with open(CONFIG_DIR + control + "_pt_scale.json") as pt_f:
+                pt_scale = json.load(pt_f)["pt_scale"]
+            channels = [f"{control[0]}c_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+            calibration = Calibration.from_config(pt_scale, channels)
+            assert (np.allclose(calibration.convert([4.5] * 8), pt_scale["max_p"]))
@@ -0,0 +1,97 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from acquisition import Acquisition
+from capture import BurstCapture, write_capture, read_capture
+import itertools
+import time
+import numpy as np
+import pytest
+
+CHANNELS = ["pc_adc1_c1", "pc_adc1_c2"]
+
+
+def counting_acquisition():
+    count = itertools.count()
+    return Acquisition(lambda: [next(count), 1.0], 2, 500, 1000)
+
+
+class TestCaptureFile:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "capture.bin")
+        times = np.linspace(0, 1, 11)
+        values = np.column_stack((times * 2, -times))
+        write_capture(path, CHANNELS, times, values, 0.5, 1700000000.0, 0.5, 0.5, ["fire", "redline"])
+        header, read_times, read_values = read_capture(path)
+        assert (header["channels"] == CHANNELS)
+        assert (header["reasons"] == ["fire", "redline"])
+        assert (header["trigger_t"] == 0.5 and header["pre_s"] == 0.5)
+        assert (np.array_equal(read_times, times) and np.array_equal(read_values, values))
+        assert (not os.path.exists(path + ".part"))
+
+    def test_not_capture(self, tmp_path):
+        path = tmp_path / "other.bin"
+        path.write_bytes(bytes(200))
+        with pytest.raises(ValueError):
+            read_capture(str(path))
+
+
+class TestBurstCapture:
+    def test_short_history(self, tmp_path):
+        with pytest.raises(ValueError):
+            BurstCapture(counting_acquisition(), CHANNELS, 1, 1, str(tmp_path))
+
+    def test_window(self, tmp_path):
+        acquisition = counting_acquisition()
+        capture = BurstCapture(acquisition, CHANNELS, 0.05, 0.05, str(tmp_path))
+        acquisition.start()
+        capture.start()
+        time.sleep(0.1)
+        t = time.monotonic()
+        capture.trigger("fire", t)
+        # within the window, so part of the same capture, which now runs to post_s after it
+        capture.trigger("redline", t + 0.04)
+        assert (capture.pending())
+        time.sleep(0.2)
+        capture.stop()
+        acquisition.stop()
+        assert (len(capture.captures) == 1)
+        header, times, values = read_capture(capture.captures[0])
+        assert (header["reasons"] == ["fire", "redline"])
+        assert (times[0] >= t - 0.05 and times[-1] <= t + 0.09)
+        assert (times[0] < t and times[-1] > t + 0.08)
+        assert (abs(header["post_s"] - 0.09) < 1e-9)
+        # consecutive samples with none missing
+        assert (np.all(np.diff(values[:, 0]) == 1))
+
+    def test_stop_writes_pending(self, tmp_path):
+        acquisition = counting_acquisition()
+        capture = BurstCapture(acquisition, CHANNELS, 0.05, 0.5, str(tmp_path))
+        acquisition.start()
+        capture.start()
+        time.sleep(0.02)
+        capture.trigger("operator")
+        capture.stop()
+        acquisition.stop()
+        assert (len(capture.captures) == 1 and not capture.pending())
+
+    def test_queued_beyond_ring(self, tmp_path):
+        acquisition = counting_acquisition()
+        # too short a window for the third redline to extend it
+        capture = BurstCapture(acquisition, CHANNELS, 0.05, 0.05, str(tmp_path))
+        capture.max_window_s = 0.2
+        acquisition.start()
+        capture.start()
+        time.sleep(0.1)
+        t = time.monotonic()
+        capture.trigger("fire", t)
+        for step in range(1, 4):
+            capture.trigger("redline", t + step * 0.04)
+        time.sleep(0.3)
+        capture.stop()
+        acquisition.stop()
+        # extended to t + 0.13 by the first two redlines, the third starts a capture of its own
+        assert (len(capture.captures) == 2)
+        first, times, values = read_capture(capture.captures[0])
+        second, second_times, second_values = read_capture(capture.captures[1])
+        assert (first["reasons"] == ["fire", "redline"] and times[-1] <= t + 0.13)
+        assert (second["reasons"] == ["redline"] and second["trigger_t"] == t + 0.12)
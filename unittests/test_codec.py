@@ -0,0 +1,57 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from fill_telem_codec import FillTelemCodec
+from prop_telem_codec import PropTelemCodec
+from prop_command_codec import PropCommandCodec
+from network_node import is_edge_command
+import pytest
+
+
+def telemetry(codec):
+    msg = {}
+    for idx, (name, fmt) in enumerate(codec.msg_schema.items()):
+        msg[name] = {"f": idx + 0.5, "?": idx % 2 == 0, "h": idx, "i": idx}[fmt]
+    return msg
+
+
+@pytest.fixture(params=[FillTelemCodec, PropTelemCodec])
+def codec(request):
+    return request.param()
+
+
+class TestCodec:
+    def test_encode_into(self, codec):
+        msg = telemetry(codec)
+        packet = codec.encode_into(msg)
+        assert (bytes(packet) == codec.encode(msg))
+        # packed into the same buffer every time
+        assert (codec.encode_into(msg).obj is packet.obj)
+
+    def test_encode_into_offset(self, codec):
+        msg = telemetry(codec)
+        buffer = bytearray(4 + codec.struct.size)
+        packet = codec.encode_into(msg, buffer, 4)
+        assert (bytes(packet) == codec.encode(msg) and buffer[:4] == bytes(4))
+
+    def test_decode_into(self, codec):
+        msg = telemetry(codec)
+        record = codec.record()
+        assert (codec.decode_into(codec.encode(msg), record) is record)
+        assert (record == codec.decode(codec.encode(msg)))
+        assert (record.to_dict() == msg)
+        name = list(msg)[-1]
+        assert (getattr(record, name) == msg[name] and record[name] == msg[name])
+        # reused for the next packet
+        msg[name] = 0.25
+        codec.decode_into(codec.encode(msg), record)
+        assert (record[name] == 0.25)
+
+    def test_record_as_command(self):
+        codec = PropCommandCodec()
+        command = {"pc_state": 1024, "pc_soft_armed": True, "pc_fire": True, "pc_redlines_armed": False,
+                   "pc_pulse": -1, "pc_pdelay": 0}
+        record = codec.decode_into(codec.encode(command))
+        assert (is_edge_command(record))
+        assert (dict(record.items()) == command)
+        with pytest.raises(AttributeError):
+            record.pc_state = 0
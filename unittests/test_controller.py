@@ -0,0 +1,81 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from controller import Controller
+from relays import Relays
+from sequencer import Sequencer
+from redlines import RedlineEngine
+from bitfield_utils import Utils
+import asyncio
+import json
+import logging
+import pytest
+try:
+    import RPi.GPIO as GPIO
+except (RuntimeError, ModuleNotFoundError):
+    print("Spoofing GPIO.")
+    import fake_rpigpio.utils
+    fake_rpigpio.utils.install()
+    import RPi.GPIO as GPIO
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+CHANNELS = [f"pc_adc{adc}_c{c}" for adc in (1, 2) for c in range(1, 5)]
+CLOSED_STATE = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+SV_02 = [0, 0, 1, 0, 0, 0, 0, 0, 0, 0]
+
+
+def command(state=CLOSED_STATE, armed=True, fire=False, pulse=-1, pdelay=0):
+    return ({
+        "pc_state": Utils.num(state),
+        "pc_soft_armed": armed,
+        "pc_fire": fire,
+        "pc_redlines_armed": False,
+        "pc_pulse": pulse,
+        "pc_pdelay": pdelay
+    }, ("127.0.0.1", 0))
+
+
+class TestApplyCommands:
+    @pytest.fixture
+    def controller(self):
+        # just what applyCommands uses, without the hardware and network set up by __init__
+        with open(CONFIG_DIR + "gse_master.json") as gse_f:
+            gse_config = json.load(gse_f)
+        controller = Controller.__new__(Controller)
+        controller._control = "prop"
+        controller.relays = Relays(GPIO, control="prop", config_dir=CONFIG_DIR)
+        controller.sequencer = Sequencer(controller.relays, GPIO, gse_config["sequences"]["prop"],
+                                         gse_config["relay_maps"]["prop"])
+        controller.redlines = RedlineEngine(gse_config["redlines"]["prop"], CHANNELS)
+        controller.cntrl_logger = logging.getLogger("cntrl")
+        controller.coalesced_commands = 0
+        controller.soft_arm = False
+        controller.redlines_armed = False
+        controller.readings = None
+        controller.capture = None
+        return controller
+
+    def test_arm_then_fire(self, controller):
+        async def run():
+            # the fire command is checked against the arm sent just before it
+            controller.applyCommands([command(armed=True), command(armed=True, fire=True)])
+            assert (controller.sequencer.is_running("fire"))
+            controller.sequencer.abort("fire")
+
+        asyncio.run(run())
+
+    def test_state_then_pulse(self, controller):
+        async def run():
+            # SV-02 powered, then pulsed off and back on
+            controller.applyCommands([command(SV_02), command(SV_02, pulse=2, pdelay=5)])
+            assert (controller.relays.get_state()[2] == 0)
+            await asyncio.sleep(.01)
+            assert (controller.relays.get_state()[2] == 1)
+
+        asyncio.run(run())
+        assert ([(idx, level) for name, idx, level, deadline, actual in controller.sequencer.actuations] ==
+                [(2, 0), (2, 1)])
+
+    def test_stale_states_coalesced(self, controller):
+        controller.applyCommands([command(SV_02), command(CLOSED_STATE), command(SV_02)])
+        assert (controller.coalesced_commands == 2)
+        assert (controller.relays.get_state() == SV_02)
@@ -0,0 +1,116 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from delta_codec import DeltaCodec, DeltaUnsynced, DELTA_HEADER, KEYFRAME
+from codec import SchemaMismatch
+from network_node import ReceiveNode, SendNode, PACKET_HEADER
+from schema_registry import SchemaRegistry, get_registry
+from prop_command_codec import PropCommandCodec
+from collections import OrderedDict
+import json
+import math
+import pytest
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+SCHEMA = OrderedDict([("fc_timestamp", "f"), ("fc_armed", "?"), ("fc_state", "h"), ("fc_adc1_c1", "f"),
+                      ("fc_adc1_c2", "f")])
+
+
+def frame(t, state=1024, pt1=10.0, pt2=20.0):
+    return {"fc_timestamp": t, "fc_armed": False, "fc_state": state, "fc_adc1_c1": pt1, "fc_adc1_c2": pt2}
+
+
+@pytest.fixture
+def codecs():
+    deadbands = {"fc_adc1_c1": 0.5, "fc_adc1_c2": 0.5}
+    return DeltaCodec(SCHEMA, 0x1234, deadbands, 4), DeltaCodec(SCHEMA, 0x1234, deadbands, 4)
+
+
+class TestDeltaCodec:
+    def test_keyframe_first(self, codecs):
+        sender, receiver = codecs
+        packet = sender.encode(frame(1.0))
+        assert (len(packet) == sender.max_size and packet[4] == KEYFRAME)
+        assert (receiver.decode(packet) == frame(1.0))
+
+    def test_only_changes_sent(self, codecs):
+        sender, receiver = codecs
+        receiver.decode(sender.encode(frame(1.0)))
+        packet = sender.encode(frame(1.25, state=1025))
+        assert (sender.changed(packet) == ["fc_timestamp", "fc_state"])
+        assert (len(packet) == DELTA_HEADER.size + sender.mask_size + 4 + 2)
+        assert (receiver.decode(packet) == frame(1.25, state=1025))
+
+    def test_deadband(self, codecs):
+        sender, receiver = codecs
+        receiver.decode(sender.encode(frame(1.0)))
+        # within the deadband of the value last sent, then drifted past it
+        assert (sender.changed(sender.encode(frame(2.0, pt1=10.25))) == ["fc_timestamp"])
+        packet = sender.encode(frame(3.0, pt1=10.75))
+        assert (sender.changed(packet) == ["fc_timestamp", "fc_adc1_c1"])
+        assert (receiver.decode(packet)["fc_adc1_c1"] == 10.75)
+
+    def test_nan_sent(self, codecs):
+        sender, receiver = codecs
+        sender.encode(frame(1.0))
+        assert ("fc_adc1_c1" in sender.changed(sender.encode(frame(2.0, pt1=math.nan))))
+
+    def test_keyframe_every(self, codecs):
+        sender, receiver = codecs
+        flags = [sender.encode(frame(1.0))[4] for _ in range(9)]
+        assert (flags == [KEYFRAME, 0, 0, 0, KEYFRAME, 0, 0, 0, KEYFRAME])
+        sender.keyframe()
+        assert (sender.encode(frame(1.0))[4] == KEYFRAME)
+
+    def test_unsynced(self, codecs):
+        sender, receiver = codecs
+        sender.encode(frame(1.0))
+        delta = sender.encode(frame(2.0))
+        with pytest.raises(DeltaUnsynced):
+            receiver.decode(delta)
+        # a keyframe brings the receiver into step
+        receiver.decode(DeltaCodec(SCHEMA, 0x1234).encode(frame(3.0)))
+        assert (receiver.decode(delta)["fc_timestamp"] == 2.0)
+        receiver.resync()
+        with pytest.raises(DeltaUnsynced):
+            receiver.decode(delta)
+
+    def test_mismatch(self, codecs):
+        sender, receiver = codecs
+        with pytest.raises(SchemaMismatch):
+            receiver.decode(DeltaCodec(SCHEMA, 0x4321).encode(frame(1.0)))
+
+    def test_unknown_deadband(self):
+        with pytest.raises(ValueError):
+            DeltaCodec(SCHEMA, 1, {"fc_adc9_c1": 0.5})
+
+    def test_registry(self):
+        registry = get_registry()
+        assert (registry.delta("prop") is None)
+        sender, receiver = registry.delta("fill"), registry.delta("fill")
+        assert (sender is not receiver)
+        assert (registry.lookup(sender.schema_id) == ("delta", "f"))
+        assert (sender.schema_id != registry.codec("telemetry", "fill").schema_id)
+        assert (sender.channels == tuple(registry.codec("telemetry", "fill").msg_schema))
+
+    def test_registry_bad_deadband(self):
+        with open(CONFIG_DIR + "gse_master.json") as gse_f:
+            gse_config = json.load(gse_f)
+        gse_config["telemetry_delta"]["f"]["deadband"]["pc_adc1_c1"] = 0.5
+        with pytest.raises(ValueError):
+            SchemaRegistry(gse_config)
+
+    def test_send_node(self, codecs):
+        sender, receiver = codecs
+        node = ReceiveNode(("127.0.0.1", 0), PropCommandCodec())
+        send_node = SendNode(("127.0.0.1", 0), node.sock.getsockname(), sender)
+        node.sock.settimeout(1)
+        send_node.send(frame(1.0))
+        send_node.send(frame(2.0))
+        keyframe = node.sock.recv(1024)
+        delta = node.sock.recv(1024)
+        send_node.sock.close()
+        node.sock.close()
+        assert (len(keyframe) == PACKET_HEADER.size + sender.max_size)
+        assert (len(delta) == PACKET_HEADER.size + DELTA_HEADER.size + sender.mask_size + 4)
+        receiver.decode(keyframe, PACKET_HEADER.size)
+        assert (receiver.decode(delta, PACKET_HEADER.size) == frame(2.0))
@@ -0,0 +1,118 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from filters import MovingAverage, Median, SinglePoleIIR, FilterBank, make_filter
+import json
+import numpy as np
+import pytest
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+SIGNAL = np.random.default_rng(1).normal(500, 20, 1000)
+
+
+def in_blocks(f, x, sizes):
+    out = []
+    start = 0
+    for size in sizes:
+        out.append(f.process(x[start:start + size]))
+        start += size
+    out.append(f.process(x[start:]))
+    return np.concatenate(out)
+
+
+def reference(x, window, reduce):
+    return np.array([reduce(x[max(0, i - window + 1):i + 1]) for i in range(len(x))])
+
+
+class TestFilters:
+    def test_moving_average(self):
+        expected = reference(SIGNAL, 8, np.mean)
+        assert (np.allclose(MovingAverage(8).process(SIGNAL), expected))
+        assert (np.allclose(in_blocks(MovingAverage(8), SIGNAL, [1, 1, 3, 100, 7]), expected))
+
+    def test_median(self):
+        expected = reference(SIGNAL, 5, np.median)
+        assert (np.allclose(Median(5).process(SIGNAL), expected))
+        assert (np.allclose(in_blocks(Median(5), SIGNAL, [1, 2, 1, 50, 1]), expected))
+        # a single bad conversion is rejected
+        spike = np.array([500.0, 501, 499, 5000, 500, 502])
+        assert (Median(3).process(spike).max() < 510)
+
+    def test_iir(self):
+        alpha = 0.05
+        expected = [SIGNAL[0]]
+        for x in SIGNAL[1:]:
+            expected.append(expected[-1] + alpha * (x - expected[-1]))
+        # longer than a chunk of the closed form
+        assert (np.allclose(SinglePoleIIR(alpha).process(SIGNAL), expected))
+        assert (np.allclose(in_blocks(SinglePoleIIR(alpha), SIGNAL, [1, 1, 10, 500]), expected))
+        assert (np.allclose(SinglePoleIIR(1).process(SIGNAL), SIGNAL))
+        with pytest.raises(ValueError):
+            SinglePoleIIR(0)
+
+    @pytest.mark.parametrize("make", [lambda: MovingAverage(8), lambda: Median(5), lambda: Median(4),
+                                      lambda: SinglePoleIIR(0.05), lambda: Median(1)])
+    def test_step(self, make):
+        expected = make().process(SIGNAL)
+        f = make()
+        # steps and blocks share the same history
+        stepped = [f.step(x) for x in SIGNAL[:20]] + list(f.process(SIGNAL[20:40])) + \
+            [f.step(x) for x in SIGNAL[40:]]
+        assert (np.allclose(stepped, expected))
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            make_filter({"type": "kalman"})
+
+
+class TestFilterBank:
+    def test_decimation(self):
+        bank = FilterBank([None, None], [1, 3])
+        times = np.arange(10.0)
+        block = np.column_stack((times, times * 2))
+        outputs = bank.process(times[:4], block[:4])
+        outputs += bank.process(times[4:], block[4:])
+        assert (list(np.concatenate([outputs[1][0], outputs[3][0]])) == [0, 3, 6, 9])
+        assert (list(bank.latest) == [9, 18])
+        assert (list(bank.latest_times) == [9, 9])
+
+    def test_per_sample(self):
+        bank = FilterBank([Median(3), MovingAverage(2)], [1, 1])
+        for t, x in enumerate([1.0, 100.0, 2.0, 3.0]):
+            bank.process([t], [[x, x]])
+        assert (list(bank.latest) == [3.0, 2.5])
+
+    def test_process_sample(self):
+        times = np.arange(20.0)
+        block = np.column_stack((SIGNAL[:20], SIGNAL[20:40]))
+        blocked = FilterBank([Median(3), MovingAverage(2)], [1, 3])
+        blocked.process(times, block)
+        stepped = FilterBank([Median(3), MovingAverage(2)], [1, 3])
+        for t, sample in zip(times, block):
+            stepped.process_sample(t, sample)
+        assert (np.allclose(stepped.latest, blocked.latest))
+        assert (list(stepped.latest_times) == list(blocked.latest_times) == [19, 18])
+
+    def test_not_converted(self):
+        # NaN marks a sample where the channel was not converted; it is skipped, not filtered
+        nan = np.nan
+        times = np.arange(6.0)
+        block = np.array([[1.0, 1.0], [2.0, nan], [3.0, 3.0], [4.0, nan], [5.0, 100.0], [6.0, nan]])
+        blocked = FilterBank([MovingAverage(2), MovingAverage(2)], [1, 1])
+        outputs = blocked.process(times, block)
+        assert (list(outputs[1][0]) == [0, 2, 4] and list(outputs[1][1]) == [1.0, 2.0, 51.5])
+        stepped = FilterBank([MovingAverage(2), MovingAverage(2)], [1, 1])
+        for t, sample in zip(times, block):
+            stepped.process_sample(t, sample)
+        assert (list(stepped.latest) == list(blocked.latest) == [5.5, 51.5])
+        assert (list(stepped.latest_times) == [5, 4])
+
+    def test_config(self):
+        with open(CONFIG_DIR + "sensor_map.json") as sensor_map_f:
+            sensor_map = json.load(sensor_map_f)
+        for control in ("prop", "fill"):
+            channels = [f"{control[0]}c_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+            bank = FilterBank.from_config(sensor_map, channels)
+            assert (len(bank.filters) == 8)
+        bank = FilterBank.from_config({"a": {"filter": {"type": "iir", "alpha": 0.5}, "decimate": 2}}, ["a", "b"])
+        assert (isinstance(bank.filters[0], SinglePoleIIR) and bank.filters[1] is None)
+        assert (bank.decimation == [2, 1])
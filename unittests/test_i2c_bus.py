@@ -0,0 +1,80 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from i2c_bus import get_bus, BusLock, I2CBus
+from fake_i2c import FakeI2C, FakeADS1219
+from ADC_Driver import ADS1219
+import threading
+import time
+import pytest
+
+CODES = {ADS1219.CHANNEL_AIN0_AIN1: 0x123456, ADS1219.CHANNEL_AIN2_AIN3: 0x654321}
+
+
+@pytest.fixture
+def fake():
+    fake = FakeI2C(frequency=400000)
+    for address in range(0x40, 0x44):
+        fake.add(address, FakeADS1219(dict(CODES)))
+    return fake
+
+
+class TestI2CBus:
+    def test_shared(self, fake):
+        bus = get_bus(fake)
+        assert (get_bus(fake) is bus)
+        assert (get_bus(bus) is bus)
+        assert (get_bus(FakeI2C()) is not bus)
+        adcs = [ADS1219(i, i2c=fake) for i in range(1, 9)]
+        assert (all(adc._i2c is bus for adc in adcs))
+
+    def test_stats(self, fake):
+        bus = get_bus(fake)
+        adc = ADS1219(3, data_rate=1000, i2c=fake)
+        adc.read_raw_data()
+        assert (bus.stats[0x41].transactions == adc.transactions)
+        assert (bus.transactions() == fake.transactions)
+        assert (bus.stats[0x41].max_bus_time > 0)
+        with pytest.raises(OSError):
+            bus.writeto(0x50, b"\x00")
+        assert (bus.stats[0x50].errors == 1)
+
+    def test_lock_order(self):
+        lock = BusLock()
+        order = []
+        lock.acquire()
+
+        def take(n):
+            with lock:
+                order.append(n)
+
+        threads = []
+        for n in range(5):
+            threads.append(threading.Thread(target=take, args=(n,)))
+            threads[-1].start()
+            # queue each thread before starting the next
+            while len(lock._waiters) <= n:
+                time.sleep(0.001)
+        # still ours, however many are waiting
+        assert (lock.acquire(blocking=False))
+        lock.release()
+        lock.release()
+        for thread in threads:
+            thread.join()
+        assert (order == [0, 1, 2, 3, 4])
+
+    def test_channels_in_threads(self, fake):
+        adcs = [ADS1219(i, data_rate=1000, i2c=fake) for i in range(1, 9)]
+        errors = []
+
+        def read(adc, code):
+            for i in range(10):
+                if adc.read_raw_data() != code:
+                    errors.append(adc.get_ID())
+
+        threads = [threading.Thread(target=read, args=(adc, CODES[adc._mux])) for adc in adcs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (errors == [])
+        assert (get_bus(fake).stats[0x40].max_wait_time > 0)
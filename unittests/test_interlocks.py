@@ -0,0 +1,106 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from interlocks import InterlockTable, state_index
+import itertools
+import json
+import logging
+import pytest
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+VENT_STATE = [0, 0, 0, 0, 0, 1, 0, 1, 1, 0]
+CLOSED_STATE = [1, 1, 1, 1, 1, 0, 1, 0, 0, 0]
+
+
+def reference_check(state, relay_map, prohibited_states):
+    """
+    The rule walk check_safe_update used to do on every update.
+    """
+    for mutex in prohibited_states["mutual_exclusions"]:
+        if (state[relay_map[mutex[0]]] & state[relay_map[mutex[1]]]):
+            return (False, "Mutual exclusion violation for {} and {}.".format(mutex[0], mutex[1]))
+    for mutex in prohibited_states["mutual_inclusions"]:
+        if (state[relay_map[mutex[0]]]):
+            if (state[relay_map[mutex[0]]] != state[relay_map[mutex[1]]]):
+                return (False, "Mutual inclusion violation for {} and {}.".format(mutex[0], mutex[1]))
+    return (True, "")
+
+
+class TestInterlockTable:
+    with open(CONFIG_DIR + "fill_relay_map.json") as relays_f:
+        relay_map = json.load(relays_f)
+    with open(CONFIG_DIR + "fill_prohibited_states.json") as states_f:
+        prohibited_states = json.load(states_f)
+    table = InterlockTable(CONFIG_DIR + "fill_relay_map.json", CONFIG_DIR + "fill_prohibited_states.json",
+                           safe_states=(VENT_STATE, CLOSED_STATE))
+
+    def test_state_index(self):
+        assert (state_index([0] * 10) == 0)
+        assert (state_index([1, 0, 0, 0, 0, 0, 0, 0, 0, 0]) == 512)
+        assert (state_index([0, 0, 0, 0, 0, 0, 0, 0, 0, 1]) == 1)
+
+    def test_matches_rule_walk(self):
+        for state in itertools.product([0, 1], repeat=10):
+            state = list(state)
+            assert (self.table.check(state) == reference_check(state, self.relay_map, self.prohibited_states)), state
+
+    def test_named_states(self):
+        assert (self.table.check([0] * 10) == (True, ""))
+        assert (self.table.check(VENT_STATE) == (True, ""))
+        assert (self.table.check([1, 0, 1, 0, 1, 0, 1, 0, 0, 0]) ==
+                (False, "Mutual exclusion violation for BV-01 and BV-03."))
+        assert (self.table.check([0, 0, 0, 1, 0, 0, 0, 0, 0, 0]) ==
+                (False, "Mutual inclusion violation for BV-04 and BV-07."))
+
+    def test_prohibited_safe_state(self, caplog):
+        # the fill closed state powers BV-01, BV-03 and BV-04 together
+        with caplog.at_level(logging.WARNING):
+            table = InterlockTable(CONFIG_DIR + "fill_relay_map.json", CONFIG_DIR + "fill_prohibited_states.json",
+                                   safe_states=(VENT_STATE, CLOSED_STATE))
+        assert ("Safe state 1111101000 is prohibited" in caplog.text)
+        assert ("Safe state 0000010110" not in caplog.text)
+        # and it is checked like any other state
+        assert (table.check(CLOSED_STATE) == reference_check(CLOSED_STATE, self.relay_map, self.prohibited_states))
+
+    def test_locked_relays(self):
+        # a sequence drives BV-01 on while BV-05 is off, which breaks the BV-01 and BV-05 inclusion
+        current = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        locked = 1 << 9
+        assert (self.table.check(current) == (False, "Mutual inclusion violation for BV-01 and BV-05."))
+        # changes to relays outside the rule go through
+        state = [1, 0, 0, 0, 0, 0, 0, 0, 1, 0]
+        assert (self.table.check(state, locked, current) == (True, ""))
+        # but the rules on the locked relay still check its unlocked partners
+        state = [1, 0, 1, 0, 0, 0, 1, 0, 0, 0]
+        assert (self.table.check(state, locked, current) == (False, "Mutual exclusion violation for BV-01 and BV-03."))
+        # and a rule it does not break is checked in full
+        current = [1, 0, 0, 0, 1, 0, 0, 0, 0, 0]
+        state = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        assert (self.table.check(state, locked, current) == (False, "Mutual inclusion violation for BV-01 and BV-05."))
+        # rules on unlocked relays only are checked as they always are
+        state = [1, 0, 0, 0, 1, 0, 0, 0, 0, 0]
+        assert (self.table.check(state, locked, current) == (True, ""))
+
+    def test_reload_if_changed(self, tmp_path):
+        relay_map_path = tmp_path / "relay_map.json"
+        prohibited_states_path = tmp_path / "prohibited_states.json"
+        relay_map_path.write_text(json.dumps(self.relay_map))
+        prohibited_states_path.write_text(json.dumps({"mutual_exclusions": [], "mutual_inclusions": []}))
+        table = InterlockTable(str(relay_map_path), str(prohibited_states_path))
+        state = [1, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+        assert (table.check(state)[0])
+        assert (not table.reload_if_changed())
+        prohibited_states_path.write_text(json.dumps({"mutual_exclusions": [["BV-01", "BV-02"]],
+                                                      "mutual_inclusions": []}))
+        os.utime(prohibited_states_path, ns=(0, 0))
+        assert (table.reload_if_changed())
+        assert (table.check(state) == (False, "Mutual exclusion violation for BV-01 and BV-02."))
+        # a malformed save leaves the previous table in force until the file is fixed
+        prohibited_states_path.write_text('{"mutual_exclusions": [')
+        os.utime(prohibited_states_path, ns=(1, 1))
+        with pytest.raises(ValueError):
+            table.reload_if_changed()
+        assert (table.check(state) == (False, "Mutual exclusion violation for BV-01 and BV-02."))
+        assert (not table.reload_if_changed())
+        prohibited_states_path.write_text(json.dumps({"mutual_exclusions": [], "mutual_inclusions": []}))
+        os.utime(prohibited_states_path, ns=(2, 2))
+        assert (table.reload_if_changed() and table.check(state)[0])
@@ -0,0 +1,245 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from network_node import CommandProtocol, ReceiveNode, SendNode, SequenceTracker, coalesce, is_edge_command, pack_packet
+from prop_command_codec import PropCommandCodec
+from collections import deque
+import asyncio
+import pytest
+
+
+def command(state, fire=False, pulse=-1, pdelay=0):
+    return {
+        "pc_state": state,
+        "pc_soft_armed": True,
+        "pc_fire": fire,
+        "pc_redlines_armed": False,
+        "pc_pulse": pulse,
+        "pc_pdelay": pdelay
+    }
+
+
+class FakeSocket:
+    """
+    Stands in for a non-blocking UDP socket on a FakeNetwork, so delivery does not depend on the
+    machine's timing.
+    """
+    def __init__(self, network, addr):
+        self.network = network
+        self.addr = addr
+        self.queue = deque()
+
+    def getsockname(self):
+        return self.addr
+
+    def sendto(self, data, addr):
+        # datagrams to an address nothing is bound to are dropped, as on a real network
+        if addr in self.network.sockets:
+            self.network.sockets[addr].queue.append((bytes(data), self.addr))
+
+    def recvfrom(self, bufsize):
+        if not self.queue:
+            raise BlockingIOError()
+        data, addr = self.queue.popleft()
+        return data[:bufsize], addr
+
+    def recvfrom_into(self, buffer):
+        data, addr = self.recvfrom(len(buffer))
+        buffer[:len(data)] = data
+        return len(data), addr
+
+    def close(self):
+        del self.network.sockets[self.addr]
+
+
+class FakeNetwork:
+    """
+    Delivers each datagram to the socket it is sent to before sendto returns.
+    """
+    def __init__(self):
+        self.sockets = {}
+
+    def bind(self):
+        addr = ("127.0.0.1", len(self.sockets) + 1)
+        self.sockets[addr] = FakeSocket(self, addr)
+        return self.sockets[addr]
+
+    def attach(self, node):
+        # swap a node's real socket for one on this network
+        node.sock.close()
+        node.sock = self.bind()
+        return node
+
+
+class TestCoalesce:
+    def test_edge_commands(self):
+        assert (not is_edge_command(command(1024)))
+        assert (is_edge_command(command(1024, fire=True)))
+        assert (is_edge_command(command(1024, pulse=0, pdelay=100)))
+
+    def test_single_command(self):
+        commands, coalesced = coalesce([command(1024)])
+        assert ([c["pc_state"] for c in commands] == [1024])
+        assert (coalesced == 0)
+
+    def test_last_writer_wins(self):
+        commands, coalesced = coalesce([command(1024), command(1025), command(1026)])
+        assert ([c["pc_state"] for c in commands] == [1026])
+        assert (coalesced == 2)
+
+    def test_edges_kept_in_order(self):
+        burst = [command(1024, pulse=3, pdelay=10), command(1025), command(1026, fire=True),
+                 command(1027, pulse=4, pdelay=20)]
+        commands, coalesced = coalesce(burst)
+        assert (commands == burst)
+        assert (coalesced == 0)
+
+    def test_levels_before_edges_kept(self):
+        # the state an edge is requested in is applied before it
+        burst = [command(1024), command(1025), command(1026, pulse=3, pdelay=10), command(1027), command(1028)]
+        commands, coalesced = coalesce(burst)
+        assert (commands == [burst[1], burst[2], burst[4]])
+        assert (coalesced == 2)
+
+
+class TestReceiveNode:
+    @pytest.fixture
+    def setup_node(self):
+        network = FakeNetwork()
+        node = network.attach(ReceiveNode(("127.0.0.1", 0), PropCommandCodec()))
+        return node, network.bind()
+
+    def test_receive_all_empty(self, setup_node):
+        node, sender = setup_node
+        assert (node.receive_all() == [])
+
+    def test_receive_all_drains_burst(self, setup_node):
+        node, sender = setup_node
+        for seq, state in enumerate(range(1024, 1034)):
+            sender.sendto(pack_packet(node.codec, command(state), seq), node.sock.getsockname())
+        received = node.receive_all()
+        assert ([command["pc_state"] for command, addr in received] == list(range(1024, 1034)))
+        assert (node.receive_all() == [])
+
+    def test_records_reused_after_recycle(self, setup_node):
+        node, sender = setup_node
+        packets = [pack_packet(node.codec, command(state), seq) for seq, state in enumerate(range(1024, 1028))]
+        first = [node.unpack(packet) for packet in packets[:2]]
+        # records handed out are kept until the commands in them have been handled
+        assert ([c["pc_state"] for c in first] == [1024, 1025])
+        node.recycle()
+        second = [node.unpack(packet) for packet in packets[2:]]
+        assert ([c["pc_state"] for c in second] == [1026, 1027])
+        assert (all(a is b for a, b in zip(first, second)))
+
+    def test_listen_delivers_burst_as_one_batch(self, setup_node):
+        node, sender = setup_node
+        for seq, state in enumerate(range(1024, 1044)):
+            sender.sendto(pack_packet(node.codec, command(state), seq), node.sock.getsockname())
+        batches = []
+
+        async def listen():
+            protocol = CommandProtocol(node, batches.append, asyncio.get_running_loop())
+            # the transport hands over the first datagram while the rest are still queued
+            protocol.datagram_received(*node.sock.recvfrom(1024))
+            assert (batches == [])
+            await asyncio.sleep(0)
+        asyncio.run(listen())
+        assert (len(batches) == 1)
+        assert ([command["pc_state"] for command, addr in batches[0]] == list(range(1024, 1044)))
+
+    def test_heartbeat_echo(self, setup_node):
+        node, sender = setup_node
+        far_end = sender.network.attach(ReceiveNode(("127.0.0.1", 0), PropCommandCodec()))
+        node.heartbeat(far_end.sock.getsockname())
+        # the far end echoes the ping and neither side reports it as a command
+        assert (far_end.receive_all() == [])
+        assert (node.receive_all() == [])
+        assert (node.link.sent == 1)
+        assert (node.link.received == 1)
+        assert (node.link.rtt >= 0)
+        assert (node.link.loss() == 0)
+
+    def test_send_node(self, setup_node):
+        node, sender = setup_node
+        send_node = sender.network.attach(SendNode(("127.0.0.1", 0), node.sock.getsockname(), PropCommandCodec()))
+        for state in (1024, 1025):
+            send_node.send(command(state))
+        received = node.receive_all()
+        assert ([command["pc_state"] for command, addr in received] == [1024, 1025])
+        assert (node.sequence.received == 2 and node.sequence.gaps == 0)
+
+    def test_duplicates_dropped(self, setup_node):
+        node, sender = setup_node
+        # a duplicate carries the send time of the original, and a reordered datagram an earlier one
+        for seq in (1, 1, 3, 2):
+            sender.sendto(pack_packet(node.codec, command(1024 + seq), seq, seq * 1000),
+                          node.sock.getsockname())
+        received = node.receive_all()
+        assert ([command["pc_state"] for command, addr in received] == [1025, 1027, 1026])
+        assert (node.sequence.duplicates == 1 and node.sequence.reordered == 1)
+
+    def test_wrong_version(self, setup_node):
+        node, sender = setup_node
+        packet = bytearray(pack_packet(node.codec, command(1024), 1))
+        packet[0] = 0
+        with pytest.raises(ValueError):
+            node.unpack(packet)
+
+
+class TestSequenceTracker:
+    def test_in_order(self):
+        tracker = SequenceTracker()
+        assert (all(tracker.update(seq) for seq in range(10)))
+        assert (tracker.received == 10 and tracker.gaps == 0 and tracker.loss() == 0)
+
+    def test_gap(self):
+        tracker = SequenceTracker()
+        for seq in (0, 1, 4, 5):
+            tracker.update(seq)
+        assert (tracker.gaps == 2 and tracker.loss() == 2 / 6)
+
+    def test_reordered_fills_gap(self):
+        tracker = SequenceTracker()
+        for seq in (0, 2, 1, 3):
+            assert (tracker.update(seq))
+        assert (tracker.gaps == 0 and tracker.reordered == 1)
+        # seen already, so a duplicate
+        assert (not tracker.update(1))
+        assert (not tracker.update(3))
+        assert (tracker.duplicates == 2 and tracker.received == 4)
+
+    def test_wraps(self):
+        tracker = SequenceTracker()
+        for seq in (0xFFFFFFFE, 0xFFFFFFFF, 0, 2):
+            tracker.update(seq)
+        assert (tracker.gaps == 1 and tracker.highest == 2)
+        assert (tracker.update(1) and tracker.gaps == 0)
+
+    def test_restart_sent_later(self):
+        tracker = SequenceTracker()
+        for seq in range(1, 11):
+            tracker.update(seq, seq * 1000)
+        # the sender restarted: its new sequence numbers are in the window but sent later
+        assert (all(tracker.update(seq, 20000 + seq * 1000) for seq in range(1, 12)))
+        assert (tracker.restarts == 1 and tracker.duplicates == 0 and tracker.highest == 11)
+        assert (tracker.received == 21 and tracker.gaps == 0)
+
+    def test_restart_far_behind(self):
+        tracker = SequenceTracker()
+        tracker.update(5000)
+        # further back than the window, even with no send times
+        assert (all(tracker.update(seq) for seq in range(1, 5002)))
+        assert (tracker.restarts == 1 and tracker.duplicates == 0)
+
+    def test_restart_other_clock(self):
+        tracker = SequenceTracker()
+        tracker.update(10, 10 ** 12)
+        # a sender started on another clock, long before the newest datagram
+        assert (tracker.update(1, 1000) and tracker.restarts == 1)
+
+    def test_late_not_restart(self):
+        tracker = SequenceTracker()
+        for seq in (1, 3):
+            tracker.update(seq, seq * 1000)
+        assert (tracker.update(2, 2000) and tracker.restarts == 0 and tracker.reordered == 1)
+        assert (not tracker.update(3, 3000) and tracker.duplicates == 1)
@@ -0,0 +1,106 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from redlines import RedlineEngine
+import json
+import logging
+import pytest
+logging.basicConfig(level=logging.DEBUG)
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+CHANNELS = [f"pc_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+
+
+def sample(value, channel=0):
+    readings = [0.0] * len(CHANNELS)
+    readings[channel] = value
+    return readings
+
+
+class TestRedlineEngine:
+    def test_limits(self):
+        engine = RedlineEngine([{"channel": "pc_adc1_c2", "max": 900, "min": -10}], CHANNELS)
+        assert (list(engine.evaluate(sample(500, 1), 0.0)) == [])
+        assert (list(engine.evaluate(sample(901, 1), 0.1)) == [0])
+        # already tripped
+        assert (list(engine.evaluate(sample(950, 1), 0.2)) == [])
+        assert (list(engine.evaluate(sample(-20, 1), 0.3)) == [])
+        assert (engine.trips == 1)
+
+    def test_active(self):
+        engine = RedlineEngine([{"channel": "pc_adc1_c2", "max": 900}, {"channel": "pc_adc1_c1", "max": 900}],
+                               CHANNELS)
+        assert (list(engine.evaluate(sample(901, 1), 0.0)) == [0])
+        assert (list(engine.evaluate(sample(950, 1), 0.1)) == [])
+        # still tripped, for acting on once redlines are armed
+        assert (list(engine.active()) == [0])
+        engine.evaluate(sample(500, 1), 0.2)
+        assert (list(engine.active()) == [])
+
+    def test_hysteresis(self):
+        engine = RedlineEngine([{"channel": "pc_adc1_c1", "max": 900, "hysteresis": 50}], CHANNELS)
+        assert (list(engine.evaluate(sample(910), 0.0)) == [0])
+        # back under the limit but within the hysteresis
+        engine.evaluate(sample(880), 0.1)
+        assert (engine.tripped[0])
+        engine.evaluate(sample(840), 0.2)
+        assert (not engine.tripped[0])
+        assert (list(engine.evaluate(sample(910), 0.3)) == [0])
+
+    def test_persistence(self):
+        engine = RedlineEngine([{"channel": "pc_adc1_c1", "max": 900, "persistence": 3}], CHANNELS)
+        assert (list(engine.evaluate(sample(950), 0.0)) == [])
+        assert (list(engine.evaluate(sample(950), 0.1)) == [])
+        # a single sample back in limits restarts the count
+        assert (list(engine.evaluate(sample(500), 0.2)) == [])
+        assert (list(engine.evaluate(sample(950), 0.3)) == [])
+        assert (list(engine.evaluate(sample(950), 0.4)) == [])
+        assert (list(engine.evaluate(sample(950), 0.5)) == [0])
+
+    def test_rate(self):
+        engine = RedlineEngine([{"channel": "pc_adc2_c4", "max_rate": 100}], CHANNELS)
+        assert (list(engine.evaluate(sample(0, 7), 0.0)) == [])
+        assert (list(engine.evaluate(sample(9, 7), 0.1)) == [])
+        assert (list(engine.evaluate(sample(30, 7), 0.2)) == [0])
+
+    def test_rate_between_conversions(self):
+        engine = RedlineEngine([{"channel": "pc_adc2_c4", "max_rate": 100}], CHANNELS)
+        times = [0.0] * len(CHANNELS)
+        # converted every fourth frame of 10 ms, 3 per conversion is 75 per second
+        for frame in range(12):
+            if frame % 4 == 0:
+                times[7] = frame * .01
+            assert (list(engine.evaluate(sample(times[7] * 75, 7), frame * .01, times)) == [])
+        # 30 in 40 ms is too fast, and stays so while the reading is held
+        times[7] = .12
+        assert (list(engine.evaluate(sample(36, 7), .12, times)) == [0])
+        assert (list(engine.active()) == [0])
+        engine.evaluate(sample(36, 7), .13, times)
+        assert (list(engine.active()) == [0])
+
+    def test_persistence_counts_conversions(self):
+        engine = RedlineEngine([{"channel": "pc_adc1_c1", "max": 900, "persistence": 3}], CHANNELS)
+        times = [0.0] * len(CHANNELS)
+        # one conversion out of limits, held over several frames
+        for frame in range(6):
+            assert (list(engine.evaluate(sample(950), frame * .01, times)) == [])
+        # the second and third conversions out of limits trip it
+        times[0] = .06
+        assert (list(engine.evaluate(sample(950), .06, times)) == [])
+        times[0] = .1
+        assert (list(engine.evaluate(sample(950), .1, times)) == [0])
+
+    def test_many_rules(self):
+        rules = [{"channel": channel, "max": 100 * (i + 1)} for i, channel in enumerate(CHANNELS)]
+        engine = RedlineEngine(rules, CHANNELS)
+        assert (list(engine.evaluate([250.0] * len(CHANNELS), 0.0)) == [0, 1])
+
+    def test_unknown_channel(self):
+        with pytest.raises(ValueError):
+            RedlineEngine([{"channel": "pc_adc3_c1", "max": 900}], CHANNELS)
+
+    def test_config(self):
+        with open(CONFIG_DIR + "gse_master.json") as gse_f:
+            gse_config = json.load(gse_f)
+        for control in ("prop", "fill"):
+            channels = [f"{control[0]}c_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+            RedlineEngine(gse_config["redlines"][control], channels)
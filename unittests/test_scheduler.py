@@ -0,0 +1,65 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from scheduler import Scheduler, PeriodicTask, SKIP, CATCH_UP
+import fake_clock
+import asyncio
+import pytest
+
+
+def run_for(scheduler, seconds):
+    async def run():
+        tasks = scheduler.start(asyncio.get_event_loop())
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+    fake_clock.run(run())
+
+
+def busy(seconds):
+    # work taking seconds on the simulated clock
+    asyncio.get_running_loop().advance(seconds)
+
+
+class TestScheduler:
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            PeriodicTask("bad", 10, lambda: None, "sometimes")
+
+    def test_work_does_not_add_to_period(self):
+        scheduler = Scheduler()
+        # 5 ms of work every 20 ms would have run 8 times in 0.2 s with a sleep after the work
+        task = scheduler.add("work", 50, lambda: busy(0.005))
+        run_for(scheduler, 0.205)
+        assert (task.runs == 11)
+        assert (task.overruns == 0 and task.max_lateness == pytest.approx(0))
+
+    def test_coroutine_task(self):
+        scheduler = Scheduler()
+
+        async def work():
+            await asyncio.sleep(0.001)
+        task = scheduler.add_from_config("work", {"rate_hz": 100}, work)
+        run_for(scheduler, 0.105)
+        assert (task.runs == 11)
+
+    def test_skip_overruns(self):
+        scheduler = Scheduler()
+        # each run takes 2.5 periods so every run overruns and the next two deadlines are dropped
+        task = scheduler.add("slow", 100, lambda: busy(0.025), SKIP)
+        run_for(scheduler, 0.2)
+        # so it runs every 30 ms
+        assert (task.runs == 7)
+        assert (task.overruns == 7 and task.skipped == 14)
+
+    def test_catch_up_overruns(self):
+        scheduler = Scheduler()
+        durations = [0.035] + [0] * 100
+
+        def work():
+            busy(durations.pop(0))
+        # the first run overruns by 3 periods, which are made up straight away
+        task = scheduler.add("late", 100, work, CATCH_UP)
+        run_for(scheduler, 0.105)
+        assert (task.skipped == 0)
+        assert (task.runs == 11)
+        assert (task.max_lateness == pytest.approx(0.025))
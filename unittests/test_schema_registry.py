@@ -0,0 +1,61 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from schema_registry import SchemaRegistry, flatten, schema_hash, get_registry
+from codec import SchemaMismatch
+from prop_telem_codec import PropTelemCodec
+from fill_command_codec import FillCommandCodec
+import json
+import pytest
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+
+
+@pytest.fixture
+def gse_config():
+    with open(CONFIG_DIR + "gse_master.json") as gse_f:
+        return json.load(gse_f)
+
+
+class TestSchemaRegistry:
+    def test_flatten(self, gse_config):
+        schema = flatten(gse_config["telemetry_config"]["p"])
+        names = list(schema)
+        assert (len(names) == 19 and "adc_channels" not in schema)
+        # the group is flattened in where it appears
+        assert (names[11:] == [f"pc_adc{adc}_c{c}" for adc in (1, 2) for c in range(1, 5)])
+        with pytest.raises(ValueError):
+            flatten({"a": "f", "group": {"a": "h"}})
+
+    def test_codecs(self, gse_config):
+        registry = SchemaRegistry(gse_config)
+        for kind in ("telemetry", "command"):
+            for control in ("prop", "fill"):
+                codec = registry.codec(kind, control)
+                assert (codec is registry.codec(kind, control[0]))
+                assert (registry.lookup(codec.schema_id) == (kind, control[0]))
+        assert (registry.codec("command", "prop").msg_schema == gse_config["command_config"]["p"])
+
+    def test_hash(self):
+        assert (schema_hash({"a": "f", "b": "h"}) == schema_hash({"a": "f", "b": "h"}))
+        assert (schema_hash({"a": "f", "b": "h"}) != schema_hash({"b": "h", "a": "f"}))
+        assert (schema_hash({"a": "f", "b": "h"}) != schema_hash({"a": "f", "b": "i"}))
+
+    def test_codec_classes(self):
+        registry = get_registry()
+        assert (PropTelemCodec().schema_id == registry.codec("telemetry", "prop").schema_id)
+        # compiled once and shared
+        assert (PropTelemCodec().struct is registry.codec("telemetry", "prop").struct)
+
+    def test_mismatch(self, gse_config):
+        telemetry = {name: 0 for name in flatten(gse_config["telemetry_config"]["p"])}
+        packet = PropTelemCodec().encode(telemetry)
+        assert (PropTelemCodec().decode(packet) == telemetry)
+        # the same packet size with one more channel
+        other = dict(gse_config["telemetry_config"]["p"], pc_extra="f")
+        changed = SchemaRegistry(dict(gse_config, telemetry_config={"p": other})).codec("telemetry", "p")
+        with pytest.raises(SchemaMismatch):
+            changed.decode(packet + bytes(4))
+        with pytest.raises(SchemaMismatch):
+            changed.decode_into(packet + bytes(4))
+        with pytest.raises(SchemaMismatch):
+            FillCommandCodec().decode_into(packet)
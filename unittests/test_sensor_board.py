@@ -0,0 +1,80 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from sensor_board import SensorBoard
+from sensor_schedule import ConversionPlan, PlannedChannel
+from calibration import Calibration
+from ads1115 import ADS1115
+from fake_i2c import FakeI2C, FakeADS1115, FakeADS1219
+from ADC_Driver import ADS1219
+import numpy as np
+import pytest
+
+# codes of 1, 2, 3 and 4 V on ADS1115 channels 0-3 at gain 1
+CODES = {4: 8000, 5: 16000, 6: 24000, 7: 32000}
+
+
+@pytest.fixture
+def board():
+    bus = FakeI2C(frequency=400000)
+    for address in (0x48, 0x49):
+        bus.add(address, FakeADS1115(dict(CODES)))
+    board = SensorBoard([1] * 8, Calibration.linear([1] * 8), 860, "test_acquisition")
+    board.set_adcs([ADS1115(gain=1, addr=addr, i2c=bus, data_rate=860) for addr in (0x48, 0x49)])
+    return board
+
+
+class TestSensorBoard:
+    def test_off_target(self):
+        board = SensorBoard([1] * 8, Calibration.linear([1] * 8), 860, "test_acquisition")
+        assert (board.get_adc_readings() == [0] * 8 and board.read_planned() == [0] * 8)
+
+    def test_read(self, board):
+        volts = board.calibration.convert([1.0, 2.0, 3.0, 4.0] * 2)
+        assert (np.allclose(board.get_adc_readings(), volts))
+
+    def test_read_planned(self, board):
+        # the first channel of each chip every frame, the rest every other frame
+        channels = [PlannedChannel(f"c{idx}", address, 0.0001, 100 if idx % 4 == 0 else 50)
+                    for idx, (address, conversion_s) in enumerate(board.channel_devices())]
+        plan = ConversionPlan(channels, 100)
+        board.set_plan(plan)
+        converted = np.zeros(8)
+        for f in range(plan.cycle):
+            readings = board.read_planned()
+            assert (sorted(np.flatnonzero(~np.isnan(readings))) == sorted(plan.frames[f]))
+            converted += ~np.isnan(readings)
+        assert (list(converted) == [2, 1, 1, 1, 2, 1, 1, 1])
+
+
+class TestADS1219Board:
+    @pytest.fixture
+    def board(self):
+        bus = FakeI2C(frequency=400000)
+        for address in range(0x40, 0x44):
+            bus.add(address, FakeADS1219({ADS1219.CHANNEL_AIN0_AIN1: 0x100000, ADS1219.CHANNEL_AIN2_AIN3: 0x200000}))
+        board = SensorBoard([1] * 8, Calibration.linear([1] * 8), 1000, "test_acquisition")
+        board.set_ads1219([ADS1219(i, data_rate=1000, i2c=bus) for i in range(1, 9)])
+        return board, bus
+
+    def test_read(self, board):
+        board, bus = board
+        volts = [board.adc[0].to_millivolts(code) / 1000 for code in (0x100000, 0x200000)] * 4
+        assert (np.allclose(board.get_adc_readings(), board.calibration.convert(volts)))
+        # both channels of every chip converted once each
+        assert (all(bus.devices[address].starts == 2 for address in range(0x40, 0x44)))
+
+    def test_read_planned(self, board):
+        board, bus = board
+        assert ([address for address, conversion_s in board.channel_devices()] ==
+                [0x40, 0x40, 0x41, 0x41, 0x42, 0x42, 0x43, 0x43])
+        # the first channel of each chip every frame, the second every other frame
+        channels = [PlannedChannel(f"c{idx}", address, conversion_s, 100 if idx % 2 == 0 else 50)
+                    for idx, (address, conversion_s) in enumerate(board.channel_devices())]
+        plan = ConversionPlan(channels, 100)
+        board.set_plan(plan)
+        converted = np.zeros(8)
+        for f in range(plan.cycle):
+            readings = board.read_planned()
+            assert (sorted(np.flatnonzero(~np.isnan(readings))) == sorted(plan.frames[f]))
+            converted += ~np.isnan(readings)
+        assert (list(converted) == [2, 1] * 4)
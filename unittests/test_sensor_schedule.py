@@ -0,0 +1,90 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from sensor_schedule import ConversionPlan, PlannedChannel, conversion_time, max_frame_rate, FRAME_BUDGET
+import json
+import pytest
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+
+
+def mixed_channels():
+    # two ADS1115s at 860 SPS and the four ADS1219s at 1000 SPS
+    channels = [PlannedChannel(f"ads1115_{addr:x}_{pin}", addr, conversion_time(860), 100, 0)
+                for addr in (0x48, 0x49) for pin in range(4)]
+    channels += [PlannedChannel(f"ads1219_{addr:x}_{mux}", addr, conversion_time(1000), 25, 2)
+                 for addr in (0x40, 0x41, 0x42, 0x43) for mux in range(2)]
+    return channels
+
+
+def samples(plan):
+    counts = [0] * len(plan.channels)
+    for frame in plan.frames:
+        for idx in frame:
+            counts[idx] += 1
+    return counts
+
+
+class TestConversionPlan:
+    def test_rates(self):
+        channels = [PlannedChannel("fast", 0x48, 0.0001, 100), PlannedChannel("slow", 0x49, 0.0001, 10),
+                    PlannedChannel("any", 0x49, 0.0001, 1000)]
+        plan = ConversionPlan(channels, 100)
+        # rounded up to 100 / 8
+        assert (plan.rates() == [100, 12.5, 100])
+        assert (plan.cycle == 8)
+        assert (samples(plan) == [8, 1, 8])
+
+    def test_spread(self):
+        channels = [PlannedChannel(f"c{idx}", 0x48, 0.001, 25) for idx in range(8)]
+        plan = ConversionPlan(channels, 100)
+        # two channels in each of the four frames rather than all eight in one
+        assert ([len(frame) for frame in plan.frames] == [2, 2, 2, 2])
+
+    def test_interleaved(self):
+        plan = ConversionPlan(mixed_channels(), 25)
+        for frame in plan.frames:
+            devices = [plan.channels[idx].device for idx in frame]
+            # no chip converted twice in a row while another has conversions waiting
+            for first, second in zip(devices, devices[1:]):
+                assert (first != second or len(set(devices[devices.index(first):])) == 1)
+
+    def test_priority(self):
+        channels = [PlannedChannel(f"c{idx}", 0x48, conversion_time(860), 100, 0 if idx < 4 else 2)
+                    for idx in range(8)]
+        plan = ConversionPlan(channels, 100)
+        rates = plan.rates()
+        # the important channels keep their rate and the others are slowed to fit
+        assert (rates[:4] == [100] * 4)
+        assert (max(rates[4:]) < 100)
+        assert (max(plan.frame_time(frame) for frame in plan.frames) <= FRAME_BUDGET / 100)
+        assert (samples(plan) == [plan.cycle // channel.divisor for channel in plan.channels])
+
+    def test_overlapped(self):
+        # each chip's conversions fit in the frame, though all of them one after another would not
+        plan = ConversionPlan(mixed_channels(), 100)
+        assert (plan.rates()[:8] == [100] * 8)
+        assert (plan.rates()[8:] == [25] * 8)
+
+    def test_impossible(self):
+        with pytest.raises(ValueError):
+            ConversionPlan([PlannedChannel("c", 0x48, 0.02, 100)], 100)
+
+    def test_config(self):
+        with open(CONFIG_DIR + "sensor_map.json") as sensor_map_f:
+            sensor_map = json.load(sensor_map_f)
+        channels = [f"pc_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+        devices = [(addr, conversion_time(860)) for addr in (0x48, 0x49) for c in range(4)]
+        plan = ConversionPlan.from_config(sensor_map, channels, devices, 100)
+        assert (plan.rates() == [100] * 8)
+
+    def test_max_frame_rate(self):
+        with open(CONFIG_DIR + "sensor_map.json") as sensor_map_f:
+            sensor_map = json.load(sensor_map_f)
+        devices = [(addr, conversion_time(860)) for addr in (0x48, 0x49) for c in range(4)]
+        rate = max_frame_rate(devices)
+        assert (rate == 135)
+        # every PT of either board converted in every frame at the ADCs' fastest rate
+        for control in ("prop", "fill"):
+            channels = [f"{control[0]}c_adc{adc}_c{c}" for adc in range(1, 3) for c in range(1, 5)]
+            plan = ConversionPlan.from_config(sensor_map, channels, devices, rate)
+            assert (plan.rates() == [rate] * 8)
@@ -0,0 +1,172 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from relays import Relays
+from sequencer import Sequence, Sequencer
+import fake_clock
+import asyncio
+import json
+import logging
+import pytest
+logging.basicConfig(level=logging.DEBUG)
+try:
+    import RPi.GPIO as GPIO
+except (RuntimeError, ModuleNotFoundError):
+    print("Spoofing GPIO.")
+    import fake_rpigpio.utils
+    fake_rpigpio.utils.install()
+    import RPi.GPIO as GPIO
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "")
+GSE_MASTER = CONFIG_DIR + "gse_master.json"
+
+SHORT_SEQUENCE = {
+    "requirements": [{"type": "pressure_below", "sensor_id": 1, "threshold": 50.0}],
+    "actions": [
+        {"type": "set_valve", "valve_id": "OMV", "state": "open"},
+        {"type": "wait", "duration": 0.02},
+        {"type": "set_valve", "valve_id": 7, "state": "open"},
+        {"type": "wait", "duration": 10},
+        {"type": "set_valve", "valve_id": "OMV", "state": "closed"}
+    ],
+    "abort": [{"type": "set_valve", "valve_id": "OMV", "state": "closed"}]
+}
+
+
+class TestSequence:
+    @pytest.fixture
+    def gse_config(self):
+        with open(GSE_MASTER) as gse_f:
+            return json.load(gse_f)
+
+    def test_compile_fire(self, gse_config):
+        fire = Sequence("fire", gse_config["sequences"]["prop"]["fire"], gse_config["relay_maps"]["prop"])
+        assert (fire.table[:3] == [(0.0, 0, 1), (3.5, 5, 1), (3.565, 6, 1)])
+        assert (fire.table[-1] == (78.065, 0, 0))
+        assert (fire.relays == {0, 5, 6, 7, 8})
+        # an aborted burn closes the pressurant as well as the mains and igniter
+        assert (fire.abort_table == [(0.0, 7, 0), (0.0, 5, 0), (0.0, 6, 0), (0.0, 0, 0)])
+        assert (fire.abort_on_disarm)
+
+    def test_compile_unknown_action(self, gse_config):
+        with pytest.raises(ValueError):
+            Sequence("bad", {"actions": [{"type": "explode"}]}, gse_config["relay_maps"]["prop"])
+
+    def test_requirements(self, gse_config):
+        relays = Relays(GPIO, control="prop", config_dir=CONFIG_DIR)
+        short = Sequence("short", SHORT_SEQUENCE, gse_config["relay_maps"]["prop"])
+        assert (not short.requirements_met(relays, None))
+        assert (not short.requirements_met(relays, [60, 0, 0, 0, 0, 0, 0, 0]))
+        assert (short.requirements_met(relays, [10, 0, 0, 0, 0, 0, 0, 0]))
+
+
+class TestSequencer:
+    @pytest.fixture
+    def setup_sequencer(self):
+        with open(GSE_MASTER) as gse_f:
+            gse_config = json.load(gse_f)
+        relays = Relays(GPIO, control="prop", config_dir=CONFIG_DIR)
+        sequences = dict(gse_config["sequences"]["prop"], short=SHORT_SEQUENCE)
+        return relays, Sequencer(relays, GPIO, sequences, gse_config["relay_maps"]["prop"])
+
+    def test_run_and_abort(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+
+        async def run():
+            assert (sequencer.start("short", [0] * 8))
+            await asyncio.sleep(0.1)
+            assert (relays.get_state()[5] == 1 and relays.get_state()[6] == 1)
+            # sequence relays are left alone by state change requests
+            relays.request_state([0] * 10, 0)
+            assert (relays._requested_state[5] == 1)
+            sequencer.abort("short")
+            assert (not sequencer.is_running("short"))
+            assert (relays.get_state()[5] == 0 and relays.get_state()[6] == 1)
+
+        fake_clock.run(run())
+        assert ([(name, idx, level) for name, idx, level, deadline, actual in sequencer.actuations] ==
+                [("short", 5, 1), ("short", 6, 1)])
+        # each step is taken at its deadline
+        assert ([deadline for name, idx, level, deadline, actual in sequencer.actuations] == [0.0, 0.02])
+        assert (all(actual == pytest.approx(deadline) for name, idx, level, deadline, actual in sequencer.actuations))
+
+    def test_state_requests_during_fire(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+        relays.arm(GPIO)
+
+        async def run():
+            assert (sequencer.start("fire"))
+            await asyncio.sleep(0.01)
+            # the fire sequence holds the igniter on without the injector
+            assert (relays.get_state()[0] == 1 and relays.get_state()[1] == 0)
+            relays.request_state([0, 0, 1, 0, 0, 0, 0, 0, 0, 0], 0)
+            relays.update(GPIO)
+            assert (relays.get_state()[2] == 1)
+            assert (sequencer.pulse(3, 20))
+            await asyncio.sleep(0.03)
+            sequencer.abort("fire")
+
+        fake_clock.run(run())
+
+    def test_fire_requires_arm(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+        assert (not sequencer.start("fire"))
+
+    def test_concurrent_pulses(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+
+        async def run():
+            sequencer.pulse(3, 50)
+            sequencer.pulse(4, 20)
+            await asyncio.sleep(0.01)
+            assert (relays.get_state()[3] == 1 and relays.get_state()[4] == 1)
+            await asyncio.sleep(0.03)
+            assert (relays.get_state()[3] == 1 and relays.get_state()[4] == 0)
+            await asyncio.sleep(0.04)
+            assert (relays.get_state()[3] == 0)
+
+        fake_clock.run(run())
+        assert (sequencer.pulses == {})
+        assert (sequencer.pulse_width == pytest.approx(50))
+        assert ([(idx, level, actual) for name, idx, level, deadline, actual in sequencer.actuations] ==
+                [(3, 1, 0.0), (4, 1, 0.0), (4, 0, pytest.approx(.02)), (3, 0, pytest.approx(.05))])
+
+    def test_pulse_already_pulsing(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+
+        async def run():
+            assert (sequencer.pulse(3, 20))
+            assert (not sequencer.pulse(3, 20))
+            # a pulsing valve is left alone by state change requests
+            relays.request_state([0] * 10, 0)
+            assert (relays._requested_state[3] == 1)
+            await asyncio.sleep(0.03)
+
+        fake_clock.run(run())
+
+    def test_pulse_sequence_relay(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+
+        async def run():
+            assert (sequencer.start("short", [0] * 8))
+            await asyncio.sleep(0.01)
+            # OMV belongs to the sequence until it is done
+            assert (not sequencer.pulse(5, 20))
+            assert (relays.get_state()[5] == 1 and sequencer.pulses == {})
+            # relays the sequence does not drive can still be pulsed
+            assert (sequencer.pulse(3, 20))
+            await asyncio.sleep(0.03)
+            sequencer.abort("short")
+
+        fake_clock.run(run())
+
+    def test_pulse_interlocks(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+        # the igniter may not be powered without the injector
+        assert (not sequencer.pulse(0, 20))
+        assert (relays.get_state()[0] == 0 and sequencer.pulses == {})
+
+    def test_pulse_unknown_valve(self, setup_sequencer):
+        relays, sequencer = setup_sequencer
+        assert (not sequencer.pulse(12, 20))
+        assert (not sequencer.pulse(-2, 20))
+        assert (sequencer.pulses == {})
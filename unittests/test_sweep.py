@@ -0,0 +1,75 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), ''))
+from sweep import sweep
+from ads1115 import ADS1115
+from ADC_Driver import ADS1219
+from i2c_bus import get_bus
+from fake_i2c import FakeI2C, FakeADS1115, FakeADS1219
+import functools
+import threading
+import time
+import pytest
+
+# codes of 1, 2, 3 and 4 V on ADS1115 channels 0-3 at gain 1
+ADS1115_CODES = {4: 8000, 5: 16000, 6: 24000, 7: 32000}
+ADS1219_CODES = {ADS1219.CHANNEL_AIN0_AIN1: 0x123456, ADS1219.CHANNEL_AIN2_AIN3: 0x654321}
+
+
+@pytest.fixture
+def bus():
+    bus = FakeI2C(frequency=400000)
+    for address in (0x48, 0x49):
+        bus.add(address, FakeADS1115(dict(ADS1115_CODES)))
+    for address in range(0x40, 0x44):
+        bus.add(address, FakeADS1219(dict(ADS1219_CODES)))
+    return bus
+
+
+def ads1115_conversions(bus):
+    adcs = [ADS1115(gain=1, addr=addr, i2c=bus, data_rate=250) for addr in (0x48, 0x49)]
+    return adcs, [(adc.addr, functools.partial(adc.start_conversion, channel), adc.read_conversion)
+                  for adc in adcs for channel in range(4)]
+
+
+class TestSweep:
+    def test_ads1115(self, bus):
+        adcs, conversions = ads1115_conversions(bus)
+        start = time.monotonic()
+        volts = sweep(conversions)
+        elapsed = time.monotonic() - start
+        assert ([round(v, 3) for v in volts] == [1.0, 2.0, 3.0, 4.0] * 2)
+        # four conversion periods, not eight
+        assert (elapsed < 6 / 250)
+        assert (volts == sweep(conversions))
+
+    def test_ads1219(self, bus):
+        adcs = [ADS1219(i, data_rate=330, i2c=bus) for i in range(1, 9)]
+        conversions = [(adc._address, adc.start_conversion, adc.read_conversion) for adc in adcs]
+        start = time.monotonic()
+        codes = sweep(conversions)
+        elapsed = time.monotonic() - start
+        assert (codes == [ADS1219_CODES[ADS1219.CHANNEL_AIN0_AIN1], ADS1219_CODES[ADS1219.CHANNEL_AIN2_AIN3]] * 4)
+        # two conversions per chip, not eight
+        assert (elapsed < 4 / 330)
+        assert (codes == [adc.read_raw_data() for adc in adcs])
+
+    def test_order(self, bus):
+        adcs, conversions = ads1115_conversions(bus)
+        order = [7, 0, 6, 1]
+        volts = sweep([conversions[idx] for idx in order])
+        assert ([round(v, 3) for v in volts] == [4.0, 1.0, 3.0, 2.0])
+
+    def test_failure_releases_chips(self, bus):
+        adcs, conversions = ads1115_conversions(bus)
+
+        def fail():
+            raise OSError("No I2C device")
+        with pytest.raises(OSError):
+            sweep([conversions[0], (0x4a, fail, fail)])
+        # 0x48 was started and must be free for another thread
+        locked = []
+        thread = threading.Thread(
+            target=lambda: locked.append(get_bus(bus).device_lock(0x48).acquire(timeout=0.1)))
+        thread.start()
+        thread.join()
+        assert (locked == [True])